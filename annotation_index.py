@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+页面批注的空间索引和批量写入
+每页的批注放入均匀网格索引，点击和悬停时只检查鼠标所在格子中的批注；
+可视页面的批注一次批量读取，增删改先在内存中生效，稍后合并为一个事务写入数据库
+"""
+
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# 网格边长（页面坐标，pt）；批注多为一行文字大小，64pt约为几行文字
+DEFAULT_CELL_SIZE = 64
+# 批注修改后延迟写入的时间（毫秒），期间的连续修改合并为一次写入
+DEFAULT_FLUSH_DELAY_MS = 1500
+# 关闭时写入失败的立即重试次数，仍失败则保留待写内容继续定时重试
+CLOSE_FLUSH_ATTEMPTS = 3
+
+Rect = Tuple[float, float, float, float]
+
+
+class GridIndex:
+    """矩形的均匀网格索引"""
+
+    def __init__(self, cell_size: float = DEFAULT_CELL_SIZE):
+        self.cell_size = cell_size
+        self.rects: Dict[int, Rect] = {}
+        self._cells: Dict[Tuple[int, int], Set[int]] = defaultdict(set)
+
+    def __len__(self):
+        return len(self.rects)
+
+    def _cell_range(self, rect: Rect):
+        x0, y0, x1, y1 = rect
+        size = self.cell_size
+        for cx in range(int(x0 // size), int(x1 // size) + 1):
+            for cy in range(int(y0 // size), int(y1 // size) + 1):
+                yield cx, cy
+
+    def insert(self, item_id: int, rect: Rect):
+        x0, y0, x1, y1 = rect
+        rect = (min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1))
+        if item_id in self.rects:
+            self.remove(item_id)
+        self.rects[item_id] = rect
+        for cell in self._cell_range(rect):
+            self._cells[cell].add(item_id)
+
+    def remove(self, item_id: int):
+        rect = self.rects.pop(item_id, None)
+        if rect is None:
+            return
+        for cell in self._cell_range(rect):
+            bucket = self._cells.get(cell)
+            if bucket is not None:
+                bucket.discard(item_id)
+                if not bucket:
+                    del self._cells[cell]
+
+    def hit_test(self, x: float, y: float) -> List[int]:
+        """包含该点的批注，面积小的在前（重叠时优先选中最具体的批注）"""
+        bucket = self._cells.get((int(x // self.cell_size), int(y // self.cell_size)), ())
+        hits = []
+        for item_id in bucket:
+            x0, y0, x1, y1 = self.rects[item_id]
+            if x0 <= x <= x1 and y0 <= y <= y1:
+                hits.append(item_id)
+        hits.sort(key=lambda item_id: _area(self.rects[item_id]))
+        return hits
+
+    def query(self, rect: Rect) -> List[int]:
+        """与矩形相交的批注"""
+        qx0, qy0, qx1, qy1 = rect
+        candidates = set()
+        for cell in self._cell_range(rect):
+            candidates.update(self._cells.get(cell, ()))
+        return [item_id for item_id in candidates
+                if self.rects[item_id][0] <= qx1 and self.rects[item_id][2] >= qx0
+                and self.rects[item_id][1] <= qy1 and self.rects[item_id][3] >= qy0]
+
+
+def _area(rect: Rect) -> float:
+    return (rect[2] - rect[0]) * (rect[3] - rect[1])
+
+
+class AnnotationStore:
+    """一个PDF文件的批注缓存
+
+    新增的批注在写入数据库前使用负数临时ID，写入后替换为数据库ID。
+    """
+
+    def __init__(self, root, annotation_manager, case_id: int, pdf_file_id: int,
+                 user_id: int = None, cell_size: float = DEFAULT_CELL_SIZE,
+                 flush_delay_ms: int = DEFAULT_FLUSH_DELAY_MS):
+        self.root = root
+        self.annotation_manager = annotation_manager
+        self.case_id = case_id
+        self.pdf_file_id = pdf_file_id
+        self.user_id = user_id
+        self.cell_size = cell_size
+        self.flush_delay_ms = flush_delay_ms
+
+        self.annotations: Dict[int, Dict] = {}  # 批注ID -> 批注
+        self.indexes: Dict[int, GridIndex] = {}  # 页序号 -> 网格索引（已加载的页面）
+        self._next_temp_id = -1
+        self._added: Set[int] = set()
+        self._updated: Set[int] = set()
+        self._deleted: Set[int] = set()
+        self._flush_job = None
+
+    # ---------- 读取 ----------
+
+    def load_pages(self, pages: Iterable[int]):
+        """批量读取尚未加载页面的批注（通常为当前可视页面）"""
+        missing = sorted({page for page in pages if page not in self.indexes})
+        if not missing:
+            return
+        by_page = self.annotation_manager.get_page_annotations(self.pdf_file_id, missing)
+        for page in missing:
+            index = GridIndex(self.cell_size)
+            for annotation in by_page.get(page, []):
+                self.annotations[annotation['id']] = annotation
+                index.insert(annotation['id'], _rect_of(annotation))
+            self.indexes[page] = index
+
+    def get_page_annotations(self, page_index: int) -> List[Dict]:
+        """页面的批注（需先加载该页）"""
+        index = self.indexes.get(page_index)
+        return [self.annotations[item_id] for item_id in index.rects] if index else []
+
+    def hit_test(self, page_index: int, x: float, y: float) -> Optional[Dict]:
+        """页面坐标处最上层（面积最小）的批注"""
+        index = self.indexes.get(page_index)
+        if index is None:
+            return None
+        hits = index.hit_test(x, y)
+        return self.annotations[hits[0]] if hits else None
+
+    def query(self, page_index: int, rect: Rect) -> List[Dict]:
+        """与区域相交的批注（框选）"""
+        index = self.indexes.get(page_index)
+        return [self.annotations[item_id] for item_id in index.query(rect)] if index else []
+
+    # ---------- 修改（立即生效，延迟写入） ----------
+
+    def add(self, page_index: int, rect: Rect, color: str = '#FFEB3B', note: str = '') -> Dict:
+        """新增批注"""
+        self.load_pages([page_index])
+        x0, y0, x1, y1 = rect
+        annotation = {
+            'id': self._next_temp_id,
+            'pdf_file_id': self.pdf_file_id,
+            'page_index': page_index,
+            'x0': min(x0, x1), 'y0': min(y0, y1), 'x1': max(x0, x1), 'y1': max(y0, y1),
+            'color': color,
+            'note': note,
+            'created_by': self.user_id
+        }
+        self._next_temp_id -= 1
+        self.annotations[annotation['id']] = annotation
+        self.indexes[page_index].insert(annotation['id'], _rect_of(annotation))
+        self._added.add(annotation['id'])
+        self._schedule_flush()
+        return annotation
+
+    def update(self, annotation_id: int, **fields) -> bool:
+        """修改批注的位置、颜色或备注"""
+        annotation = self.annotations.get(annotation_id)
+        if annotation is None:
+            return False
+        annotation.update({key: value for key, value in fields.items()
+                           if key in ('x0', 'y0', 'x1', 'y1', 'color', 'note')})
+        self.indexes[annotation['page_index']].insert(annotation_id, _rect_of(annotation))
+        if annotation_id not in self._added:
+            self._updated.add(annotation_id)
+        self._schedule_flush()
+        return True
+
+    def remove(self, annotation_id: int) -> bool:
+        """删除批注"""
+        annotation = self.annotations.pop(annotation_id, None)
+        if annotation is None:
+            return False
+        self.indexes[annotation['page_index']].remove(annotation_id)
+        if annotation_id in self._added:
+            # 尚未写入数据库，直接丢弃
+            self._added.discard(annotation_id)
+        else:
+            self._updated.discard(annotation_id)
+            self._deleted.add(annotation_id)
+        self._schedule_flush()
+        return True
+
+    def has_pending_changes(self) -> bool:
+        return bool(self._added or self._updated or self._deleted)
+
+    def flush(self) -> bool:
+        """将积累的修改合并为一个事务写入数据库"""
+        if self._flush_job:
+            self.root.after_cancel(self._flush_job)
+            self._flush_job = None
+        if not self.has_pending_changes():
+            return True
+
+        added_ids = sorted(self._added, reverse=True)  # 按创建顺序
+        new_ids = self.annotation_manager.apply_annotation_changes(
+            self.case_id, self.pdf_file_id,
+            added=[self.annotations[temp_id] for temp_id in added_ids],
+            updated=[self.annotations[annotation_id] for annotation_id in self._updated],
+            deleted_ids=sorted(self._deleted))
+        if new_ids is None:
+            # 写入失败，保留待写内容等待下次重试
+            self._schedule_flush()
+            return False
+
+        for temp_id, new_id in zip(added_ids, new_ids):
+            annotation = self.annotations.pop(temp_id)
+            annotation['id'] = new_id
+            self.annotations[new_id] = annotation
+            index = self.indexes[annotation['page_index']]
+            index.remove(temp_id)
+            index.insert(new_id, _rect_of(annotation))
+        self._added.clear()
+        self._updated.clear()
+        self._deleted.clear()
+        return True
+
+    def close(self) -> bool:
+        """关闭前写入未保存的修改
+
+        写入失败时立即重试；仍失败则返回False，待写内容和定时重试保留，调用方需继续持有该缓存。
+        """
+        for attempt in range(CLOSE_FLUSH_ATTEMPTS):
+            if self.flush():
+                return True
+        print(f"写入批注失败: 文件 {self.pdf_file_id} 有未保存的批注修改，稍后继续重试")
+        return False
+
+    def _schedule_flush(self):
+        if self._flush_job is None:
+            self._flush_job = self.root.after(self.flush_delay_ms, self._flush_from_timer)
+
+    def _flush_from_timer(self):
+        self._flush_job = None
+        self.flush()
+
+
+def _rect_of(annotation: Dict) -> Rect:
+    return annotation['x0'], annotation['y0'], annotation['x1'], annotation['y1']
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+服务模式客户端
+提供与database_config_enhanced中管理器同名同参的远程实现，
+PDFChatApp在配置了服务地址时用它们替换本地管理器
+"""
+
+from typing import Dict, List, Optional
+
+import requests
+
+DEFAULT_TIMEOUT = 30
+
+
+class ApiClient:
+    """服务接口的HTTP客户端（复用keep-alive连接）"""
+
+    def __init__(self, base_url: str, timeout: float = DEFAULT_TIMEOUT):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def request(self, method: str, path: str, params: Dict = None, json_body=None):
+        """发送请求并返回解析后的JSON，失败时抛出异常"""
+        response = self.session.request(method, f"{self.base_url}{path}", params=params,
+                                        json=json_body, timeout=self.timeout)
+        payload = response.json()
+        if response.status_code >= 400:
+            raise RuntimeError(payload.get('error', f"HTTP {response.status_code}"))
+        return payload
+
+    def close(self):
+        self.session.close()
+
+
+class RemoteCaseManager:
+    """远程案件管理器（接口同EnhancedCaseManager）"""
+
+    def __init__(self, client: ApiClient):
+        self.client = client
+
+    def get_all_cases(self) -> List[Dict]:
+        """获取所有案件列表"""
+        try:
+            return self.client.request('GET', '/api/cases')
+        except Exception as e:
+            print(f"获取案件列表失败: {e}")
+            return []
+
+    def get_case_by_id(self, case_id: int) -> Optional[Dict]:
+        """根据ID获取案件详情"""
+        try:
+            return self.client.request('GET', f'/api/cases/{case_id}')
+        except Exception as e:
+            print(f"获取案件详情失败: {e}")
+            return None
+
+    def create_case(self, case_data: Dict) -> Optional[int]:
+        """创建新案件"""
+        try:
+            return self.client.request('POST', '/api/cases', json_body=case_data)['id']
+        except Exception as e:
+            print(f"创建案件失败: {e}")
+            return None
+
+    def update_case(self, case_id: int, case_data: Dict) -> bool:
+        """更新案件信息"""
+        try:
+            return self.client.request('PUT', f'/api/cases/{case_id}', json_body=case_data)['success']
+        except Exception as e:
+            print(f"更新案件失败: {e}")
+            return False
+
+    def delete_case(self, case_id: int) -> bool:
+        """删除案件"""
+        try:
+            return self.client.request('DELETE', f'/api/cases/{case_id}')['success']
+        except Exception as e:
+            print(f"删除案件失败: {e}")
+            return False
+
+
+class RemotePDFFileManager:
+    """远程PDF文件管理器（接口同PDFFileManager）"""
+
+    def __init__(self, client: ApiClient):
+        self.client = client
+
+    def add_pdf_file(self, case_id: int, file_path: str, file_name: str = None,
+                     file_size: int = 0, page_count: int = 0,
+                     content_hash: str = None) -> Optional[int]:
+        """添加PDF文件（由服务端提取进程解析，路径需对服务端可见）"""
+        try:
+            return self.client.request('POST', f'/api/cases/{case_id}/files',
+                                       json_body={'file_path': file_path})['id']
+        except Exception as e:
+            print(f"添加PDF文件记录失败: {e}")
+            return None
+
+    def get_pdf_files_by_case(self, case_id: int) -> List[Dict]:
+        """获取案件的所有PDF文件"""
+        try:
+            return self.client.request('GET', f'/api/cases/{case_id}/files')
+        except Exception as e:
+            print(f"获取PDF文件列表失败: {e}")
+            return []
+
+    def get_pdf_file_by_id(self, file_id: int) -> Optional[Dict]:
+        """根据ID获取PDF文件信息"""
+        try:
+            return self.client.request('GET', f'/api/files/{file_id}')
+        except Exception as e:
+            print(f"获取PDF文件信息失败: {e}")
+            return None
+
+    def get_pdf_file_by_path(self, file_path: str) -> Optional[Dict]:
+        """根据文件路径获取PDF文件信息"""
+        try:
+            return self.client.request('GET', '/api/files', params={'path': file_path})
+        except Exception as e:
+            print(f"获取PDF文件信息失败: {e}")
+            return None
+
+    def update_pdf_file(self, file_id: int, **kwargs) -> bool:
+        """更新PDF文件信息"""
+        try:
+            return self.client.request('PUT', f'/api/files/{file_id}', json_body=kwargs)['success']
+        except Exception as e:
+            print(f"更新PDF文件信息失败: {e}")
+            return False
+
+    def delete_pdf_file(self, file_id: int) -> bool:
+        """删除PDF文件记录"""
+        try:
+            return self.client.request('DELETE', f'/api/files/{file_id}')['success']
+        except Exception as e:
+            print(f"删除PDF文件记录失败: {e}")
+            return False
+
+
+class RemoteDirectoryManager:
+    """远程目录管理器（接口同EnhancedDirectoryManager）"""
+
+    def __init__(self, client: ApiClient):
+        self.client = client
+
+    def save_pdf_directories(self, case_id: int, pdf_file_id: int,
+                             directories: List[Dict]) -> bool:
+        """保存PDF文件的目录结构"""
+        try:
+            return self.client.request('PUT', f'/api/cases/{case_id}/files/{pdf_file_id}/directories',
+                                       json_body=directories)['success']
+        except Exception as e:
+            print(f"保存PDF目录失败: {e}")
+            return False
+
+    def save_pdf_directories_batch(self, case_id: int, directories_by_file: Dict[int, List[Dict]]) -> bool:
+        """在服务器的一个事务中批量保存多个PDF文件的目录结构"""
+        try:
+            body = {str(file_id): directories for file_id, directories in directories_by_file.items()}
+            return self.client.request('PUT', f'/api/cases/{case_id}/directories', json_body=body)['success']
+        except Exception as e:
+            print(f"批量保存PDF目录失败: {e}")
+            return False
+
+    def get_pdf_directories(self, case_id: int, pdf_file_id: int = None) -> List[Dict]:
+        """获取PDF文件的目录结构"""
+        try:
+            params = {'pdf_file_id': pdf_file_id} if pdf_file_id else None
+            return self.client.request('GET', f'/api/cases/{case_id}/directories', params=params)
+        except Exception as e:
+            print(f"获取PDF目录失败: {e}")
+            return []
+
+    def clear_pdf_directories(self, case_id: int, pdf_file_id: int = None) -> bool:
+        """清除PDF文件的目录记录"""
+        try:
+            params = {'pdf_file_id': pdf_file_id} if pdf_file_id else None
+            return self.client.request('DELETE', f'/api/cases/{case_id}/directories',
+                                       params=params)['success']
+        except Exception as e:
+            print(f"清除PDF目录失败: {e}")
+            return False
+
+    def search_directories(self, case_id: int, keyword: str) -> List[Dict]:
+        """搜索目录项"""
+        try:
+            return self.client.request('GET', f'/api/cases/{case_id}/directories/search',
+                                       params={'q': keyword})
+        except Exception as e:
+            print(f"搜索目录失败: {e}")
+            return []
+
+    def get_directory_subtree(self, directory_id: int) -> List[Dict]:
+        """获取目录项及其全部下级"""
+        try:
+            return self.client.request('GET', f'/api/directories/{directory_id}/subtree')
+        except Exception as e:
+            print(f"获取目录子树失败: {e}")
+            return []
+
+    def get_directory_ancestors(self, directory_id: int) -> List[Dict]:
+        """获取目录项的各级上级"""
+        try:
+            return self.client.request('GET', f'/api/directories/{directory_id}/ancestors')
+        except Exception as e:
+            print(f"获取上级目录失败: {e}")
+            return []
+
+    def get_collapsed_outline(self, pdf_file_id: int, expanded_ids=(), max_depth: int = 1) -> List[Dict]:
+        """获取折叠状态下可见的目录"""
+        try:
+            params = {'expanded': ','.join(str(value) for value in expanded_ids), 'max_depth': max_depth}
+            return self.client.request('GET', f'/api/files/{pdf_file_id}/outline', params=params)
+        except Exception as e:
+            print(f"获取折叠目录失败: {e}")
+            return []
+
+    def get_directory_statistics(self, case_id: int) -> Dict:
+        """获取目录统计信息"""
+        try:
+            stats = self.client.request('GET', f'/api/cases/{case_id}/statistics')
+            # JSON对象的键为字符串，还原为整数层级
+            stats['level_counts'] = {int(level): count for level, count in stats['level_counts'].items()}
+            return stats
+        except Exception as e:
+            print(f"获取目录统计信息失败: {e}")
+            return {
+                'total_directories': 0,
+                'level_counts': {},
+                'pdf_file_count': 0
+            }
+
+    def get_cached_directory_statistics(self, case_id: int) -> Dict:
+        """获取目录统计信息（服务器端的统计接口本身即读取缓存的统计）"""
+        return self.get_directory_statistics(case_id)
@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多用户服务模式
+在一个asyncio进程中托管卷宗、PDF文件和目录管理器，对外提供本地JSON HTTP接口。
+所有客户端共享同一个数据库连接池、同一份查询缓存和同一组PDF提取进程
+
+用法:
+    python api_server.py --db lawyer_assistant.db --port 8765 --pool-size 8
+"""
+
+import argparse
+import asyncio
+import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import urlsplit, parse_qs
+
+from database_config_enhanced import (LocalDatabaseManager, EnhancedCaseManager, PDFFileManager,
+                                      EnhancedDirectoryManager)
+from bulk_ingest import extract_pdf, write_extracted_files
+
+DEFAULT_PORT = 8765
+DEFAULT_POOL_SIZE = 8
+DEFAULT_CACHE_TTL = 300
+MAX_BODY_SIZE = 16 * 1024 * 1024
+
+HTTP_REASONS = {200: 'OK', 201: 'Created', 400: 'Bad Request', 404: 'Not Found',
+                405: 'Method Not Allowed', 413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+
+class HTTPError(Exception):
+    """带状态码的请求错误"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class SharedCache:
+    """所有客户端共享的查询结果缓存
+
+    按卷宗分组便于写入时精确失效；同一键的并发请求合并为一次数据库查询。
+    每个卷宗（以及卷宗列表）有一个失效计数，查询期间发生失效时丢弃结果并重新查询，
+    避免把写入前读到的旧值以新的有效期存入缓存或返回给合并等待的请求。
+    """
+
+    # 查询期间反复失效时的最多重新查询次数，超过后返回最后一次结果但不缓存
+    MAX_RELOADS = 2
+
+    def __init__(self, ttl: float = DEFAULT_CACHE_TTL):
+        self.ttl = ttl
+        self._entries: Dict[Tuple, Tuple[float, object]] = {}
+        self._inflight: Dict[Tuple, asyncio.Future] = {}
+        self._generations: Dict[object, int] = {}  # 卷宗ID或'cases' -> 失效次数
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _scope(key: Tuple):
+        """缓存键所属的失效范围：卷宗列表为'cases'，其余为键中的卷宗ID"""
+        return 'cases' if key[0] == 'cases' else key[1]
+
+    async def get_or_load(self, key: Tuple, loader: Callable):
+        entry = self._entries.get(key)
+        if entry and entry[0] > time.monotonic():
+            self.hits += 1
+            return entry[1]
+
+        inflight = self._inflight.get(key)
+        if inflight:
+            self.hits += 1
+            return await asyncio.shield(inflight)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        scope = self._scope(key)
+        try:
+            for _ in range(self.MAX_RELOADS + 1):
+                generation = self._generations.get(scope, 0)
+                value = await loader()
+                if self._generations.get(scope, 0) == generation:
+                    self._entries[key] = (time.monotonic() + self.ttl, value)
+                    break
+            future.set_result(value)
+            return value
+        except Exception as e:
+            future.set_exception(e)
+            # 没有其他等待者时避免"exception never retrieved"警告
+            future.exception()
+            raise
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def invalidate_case(self, case_id: Optional[int] = None):
+        """失效某个卷宗的全部缓存以及卷宗列表（进行中的查询完成后会重新查询）"""
+        for scope in ('cases',) if case_id is None else ('cases', case_id):
+            self._generations[scope] = self._generations.get(scope, 0) + 1
+        for key in list(self._entries):
+            if key[0] == 'cases' or (case_id is not None and key[1:2] == (case_id,)):
+                del self._entries[key]
+
+    def get_statistics(self) -> Dict:
+        return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+class ManagerPool:
+    """数据库连接池：每个工作线程持有一个连接和一组管理器"""
+
+    def __init__(self, db_path: str, pool_size: int):
+        self.db_path = db_path
+        self.pool_size = pool_size
+        self._local = threading.local()
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix='db',
+                                            initializer=self._init_worker)
+        self.queries = 0
+
+    def _init_worker(self):
+        db_manager = LocalDatabaseManager(self.db_path)
+        db_manager.connect()
+        self._local.managers = {
+            'cases': EnhancedCaseManager(db_manager),
+            'files': PDFFileManager(db_manager),
+            'directories': EnhancedDirectoryManager(db_manager)
+        }
+
+    def _call(self, manager: str, method: str, args, kwargs):
+        return getattr(self._local.managers[manager], method)(*args, **kwargs)
+
+    async def call(self, manager: str, method: str, *args, **kwargs):
+        """在连接池线程中调用管理器方法"""
+        self.queries += 1
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._call, manager, method, args, kwargs)
+
+    async def run(self, func: Callable, *args):
+        """在连接池线程中调用 func(managers, *args)；同一线程的管理器共用一个连接，可在一个事务中写入多张表"""
+        self.queries += 1
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, lambda: func(self._local.managers, *args))
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+class CaseApiServer:
+    """卷宗管理JSON接口"""
+
+    def __init__(self, db_path: str, pool_size: int = DEFAULT_POOL_SIZE,
+                 extract_workers: int = 2, cache_ttl: float = DEFAULT_CACHE_TTL):
+        self.pool = ManagerPool(db_path, pool_size)
+        self.cache = SharedCache(cache_ttl)
+        self.extract_executor = ProcessPoolExecutor(max_workers=extract_workers)
+        self.clients = 0
+        self.requests = 0
+        self.routes = [
+            ('GET', r'/api/health$', self.health),
+            ('GET', r'/api/cases$', self.list_cases),
+            ('POST', r'/api/cases$', self.create_case),
+            ('GET', r'/api/cases/(\d+)$', self.get_case),
+            ('PUT', r'/api/cases/(\d+)$', self.update_case),
+            ('DELETE', r'/api/cases/(\d+)$', self.delete_case),
+            ('GET', r'/api/cases/(\d+)/files$', self.list_files),
+            ('POST', r'/api/cases/(\d+)/files$', self.add_file),
+            ('GET', r'/api/cases/(\d+)/directories$', self.get_directories),
+            ('GET', r'/api/cases/(\d+)/directories/search$', self.search_directories),
+            ('GET', r'/api/cases/(\d+)/statistics$', self.get_statistics),
+            ('PUT', r'/api/cases/(\d+)/files/(\d+)/directories$', self.save_directories),
+            ('PUT', r'/api/cases/(\d+)/directories$', self.save_directories_batch),
+            ('DELETE', r'/api/cases/(\d+)/directories$', self.clear_directories),
+            ('GET', r'/api/directories/(\d+)/subtree$', self.get_directory_subtree),
+            ('GET', r'/api/directories/(\d+)/ancestors$', self.get_directory_ancestors),
+            ('GET', r'/api/files/(\d+)/outline$', self.get_collapsed_outline),
+            ('GET', r'/api/files$', self.find_file),
+            ('GET', r'/api/files/(\d+)$', self.get_file),
+            ('PUT', r'/api/files/(\d+)$', self.update_file),
+            ('DELETE', r'/api/files/(\d+)$', self.delete_file),
+        ]
+        self.routes = [(method, re.compile(pattern), handler) for method, pattern, handler in self.routes]
+
+    # ---- 路由处理 ----
+
+    async def health(self, query, body):
+        return {'clients': self.clients, 'requests': self.requests,
+                'db_pool_size': self.pool.pool_size, 'db_queries': self.pool.queries,
+                'cache': self.cache.get_statistics()}
+
+    async def list_cases(self, query, body):
+        return await self.cache.get_or_load(('cases',), lambda: self.pool.call('cases', 'get_all_cases'))
+
+    async def get_case(self, query, body, case_id):
+        case = await self.cache.get_or_load(
+            ('case', case_id), lambda: self.pool.call('cases', 'get_case_by_id', case_id))
+        if case is None:
+            raise HTTPError(404, '卷宗不存在')
+        return case
+
+    async def create_case(self, query, body):
+        case_id = await self.pool.call('cases', 'create_case', body or {})
+        if not case_id:
+            raise HTTPError(500, '创建卷宗失败')
+        self.cache.invalidate_case()
+        return {'id': case_id}
+
+    async def update_case(self, query, body, case_id):
+        success = await self.pool.call('cases', 'update_case', case_id, body or {})
+        self.cache.invalidate_case(case_id)
+        return {'success': success}
+
+    async def delete_case(self, query, body, case_id):
+        success = await self.pool.call('cases', 'delete_case', case_id)
+        self.cache.invalidate_case(case_id)
+        return {'success': success}
+
+    async def list_files(self, query, body, case_id):
+        return await self.cache.get_or_load(
+            ('files', case_id), lambda: self.pool.call('files', 'get_pdf_files_by_case', case_id))
+
+    async def add_file(self, query, body, case_id):
+        """在提取进程中解析PDF，然后在一个事务中登记文件并保存书签目录"""
+        if not body or 'file_path' not in body:
+            raise HTTPError(400, '缺少file_path')
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(self.extract_executor, extract_pdf, body['file_path'])
+        file_ids = await self.pool.run(
+            lambda managers: write_extracted_files(managers['files'], managers['directories'], case_id, [result]))
+        if not file_ids:
+            raise HTTPError(500, '添加PDF文件失败')
+        self.cache.invalidate_case(case_id)
+        return {'id': file_ids[0], 'page_count': result['page_count'],
+                'directories': len(result['directories'])}
+
+    async def get_file(self, query, body, file_id):
+        file_info = await self.pool.call('files', 'get_pdf_file_by_id', file_id)
+        if file_info is None:
+            raise HTTPError(404, 'PDF文件不存在')
+        return file_info
+
+    async def find_file(self, query, body):
+        file_path = query.get('path', [''])[0]
+        if not file_path:
+            raise HTTPError(400, '缺少path')
+        file_info = await self.pool.call('files', 'get_pdf_file_by_path', file_path)
+        if file_info is None:
+            raise HTTPError(404, 'PDF文件不存在')
+        return file_info
+
+    async def update_file(self, query, body, file_id):
+        if not isinstance(body, dict):
+            raise HTTPError(400, '文件信息应为对象')
+        file_info = await self.get_file(query, None, file_id)
+        success = await self.pool.call('files', 'update_pdf_file', file_id, **body)
+        self.cache.invalidate_case(file_info['case_id'])
+        return {'success': success}
+
+    async def delete_file(self, query, body, file_id):
+        file_info = await self.get_file(query, None, file_id)
+        success = await self.pool.call('files', 'delete_pdf_file', file_id)
+        self.cache.invalidate_case(file_info['case_id'])
+        return {'success': success}
+
+    async def get_directories(self, query, body, case_id):
+        pdf_file_id = _int_param(query, 'pdf_file_id')
+        return await self.cache.get_or_load(
+            ('directories', case_id, pdf_file_id),
+            lambda: self.pool.call('directories', 'get_pdf_directories', case_id, pdf_file_id))
+
+    async def search_directories(self, query, body, case_id):
+        keyword = query.get('q', [''])[0]
+        return await self.cache.get_or_load(
+            ('search', case_id, keyword),
+            lambda: self.pool.call('directories', 'search_directories', case_id, keyword))
+
+    async def get_statistics(self, query, body, case_id):
+        return await self.cache.get_or_load(
+            ('statistics', case_id),
+            lambda: self.pool.call('directories', 'get_cached_directory_statistics', case_id))
+
+    async def save_directories(self, query, body, case_id, pdf_file_id):
+        if not isinstance(body, list):
+            raise HTTPError(400, '目录数据应为列表')
+        success = await self.pool.call('directories', 'save_pdf_directories', case_id, pdf_file_id, body)
+        self.cache.invalidate_case(case_id)
+        return {'success': success}
+
+    async def save_directories_batch(self, query, body, case_id):
+        if not isinstance(body, dict) or not all(isinstance(value, list) for value in body.values()):
+            raise HTTPError(400, '目录数据应为 {文件ID: 目录列表}')
+        try:
+            directories_by_file = {int(file_id): directories for file_id, directories in body.items()}
+        except ValueError:
+            raise HTTPError(400, '文件ID应为整数')
+        success = await self.pool.call('directories', 'save_pdf_directories_batch', case_id, directories_by_file)
+        self.cache.invalidate_case(case_id)
+        return {'success': success}
+
+    async def clear_directories(self, query, body, case_id):
+        pdf_file_id = _int_param(query, 'pdf_file_id')
+        success = await self.pool.call('directories', 'clear_pdf_directories', case_id, pdf_file_id)
+        self.cache.invalidate_case(case_id)
+        return {'success': success}
+
+    async def get_directory_subtree(self, query, body, directory_id):
+        return await self.pool.call('directories', 'get_directory_subtree', directory_id)
+
+    async def get_directory_ancestors(self, query, body, directory_id):
+        return await self.pool.call('directories', 'get_directory_ancestors', directory_id)
+
+    async def get_collapsed_outline(self, query, body, pdf_file_id):
+        try:
+            expanded_ids = [int(value) for value in query.get('expanded', [''])[0].split(',') if value]
+        except ValueError:
+            raise HTTPError(400, "参数expanded应为逗号分隔的整数")
+        max_depth = _int_param(query, 'max_depth') or 1
+        return await self.pool.call('directories', 'get_collapsed_outline', pdf_file_id, expanded_ids, max_depth)
+
+    # ---- HTTP协议处理 ----
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """处理一个客户端连接（支持keep-alive）"""
+        self.clients += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode('latin-1').split(' ', 2)
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get('content-length', 0))
+                if length > MAX_BODY_SIZE:
+                    await self._respond(writer, 413, {'error': '请求体过大'}, keep_alive=False)
+                    break
+                raw_body = await reader.readexactly(length) if length else b''
+
+                self.requests += 1
+                status, payload = await self._dispatch(method, target, raw_body)
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            self.clients -= 1
+            writer.close()
+
+    async def _dispatch(self, method: str, target: str, raw_body: bytes):
+        url = urlsplit(target)
+        query = parse_qs(url.query)
+        path_matched = False
+        for route_method, pattern, handler in self.routes:
+            match = pattern.match(url.path)
+            if not match:
+                continue
+            path_matched = True
+            if route_method != method:
+                continue
+            try:
+                body = json.loads(raw_body) if raw_body else None
+                args = [int(group) for group in match.groups()]
+                return 200, await handler(query, body, *args)
+            except HTTPError as e:
+                return e.status, {'error': str(e)}
+            except json.JSONDecodeError:
+                return 400, {'error': '请求体不是有效的JSON'}
+            except Exception as e:
+                print(f"处理请求失败 {method} {url.path}: {e}")
+                return 500, {'error': str(e)}
+        if path_matched:
+            return 405, {'error': '不支持的请求方法'}
+        return 404, {'error': '接口不存在'}
+
+    @staticmethod
+    async def _respond(writer: asyncio.StreamWriter, status: int, payload, keep_alive: bool = True):
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8')
+        head = (f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+                f"Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+    async def serve(self, host: str, port: int):
+        server = await asyncio.start_server(self.handle_client, host, port)
+        print(f"✓ 服务已启动: http://{host}:{port}/api (连接池 {self.pool.pool_size})")
+        async with server:
+            await server.serve_forever()
+
+    def shutdown(self):
+        self.pool.shutdown()
+        self.extract_executor.shutdown(wait=False)
+
+
+def _int_param(query: Dict, name: str) -> Optional[int]:
+    values = query.get(name)
+    if not values or not values[0]:
+        return None
+    try:
+        return int(values[0])
+    except ValueError:
+        raise HTTPError(400, f"参数{name}应为整数")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='律师办案智能助手服务模式')
+    parser.add_argument('--db', default='lawyer_assistant.db', help='数据库文件')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='监听端口')
+    parser.add_argument('--pool-size', type=int, default=DEFAULT_POOL_SIZE, help='数据库连接数')
+    parser.add_argument('--extract-workers', type=int, default=2, help='PDF提取进程数')
+    parser.add_argument('--cache-ttl', type=float, default=DEFAULT_CACHE_TTL, help='缓存有效期（秒）')
+    args = parser.parse_args()
+
+    server = CaseApiServer(args.db, args.pool_size, args.extract_workers, args.cache_ttl)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("\n服务已停止")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
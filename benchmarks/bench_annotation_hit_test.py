@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批注命中检测延迟测量
+在一页上放置大量批注，对比逐个检查与网格索引的点击命中耗时，并测量批量写入和按页读取耗时
+
+用法: python benchmarks/bench_annotation_hit_test.py [--annotations 5000] [--clicks 20000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from annotation_index import GridIndex
+from database_config_enhanced import (LocalDatabaseManager, EnhancedCaseManager, PDFFileManager,
+                                      AnnotationManager)
+
+# A4页面尺寸（pt）
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842
+
+
+def random_annotations(count, rng):
+    """模拟文字高亮：宽度不一、高度约一行的矩形，少量大范围框选"""
+    annotations = []
+    for _ in range(count):
+        if rng.random() < 0.05:
+            width, height = rng.uniform(100, 400), rng.uniform(50, 300)
+        else:
+            width, height = rng.uniform(20, 200), rng.uniform(10, 16)
+        x0 = rng.uniform(0, PAGE_WIDTH - width)
+        y0 = rng.uniform(0, PAGE_HEIGHT - height)
+        annotations.append({'page_index': 0, 'x0': x0, 'y0': y0, 'x1': x0 + width, 'y1': y0 + height,
+                            'color': '#FFEB3B', 'note': ''})
+    return annotations
+
+
+def linear_hit_test(rects, x, y):
+    hits = [item_id for item_id, (x0, y0, x1, y1) in rects.items() if x0 <= x <= x1 and y0 <= y <= y1]
+    hits.sort(key=lambda item_id: (rects[item_id][2] - rects[item_id][0]) * (rects[item_id][3] - rects[item_id][1]))
+    return hits
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def measure(hit_test, points):
+    latencies = []
+    for x, y in points:
+        started = time.perf_counter()
+        hit_test(x, y)
+        latencies.append((time.perf_counter() - started) * 1e6)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description='批注命中检测延迟测量')
+    parser.add_argument('--annotations', type=int, default=5000)
+    parser.add_argument('--clicks', type=int, default=20000)
+    args = parser.parse_args()
+
+    rng = random.Random(41)
+    annotations = random_annotations(args.annotations, rng)
+    points = [(rng.uniform(0, PAGE_WIDTH), rng.uniform(0, PAGE_HEIGHT)) for _ in range(args.clicks)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = LocalDatabaseManager(os.path.join(tmp, 'bench.db'))
+        db.connect()
+        case_id = EnhancedCaseManager(db).create_case({'case_name': '批注测试'})
+        file_id = PDFFileManager(db).add_pdf_file(case_id, os.path.join(tmp, 'a.pdf'), 'a.pdf', 0, 1,
+                                                  content_hash='bench')
+        manager = AnnotationManager(db)
+
+        started = time.perf_counter()
+        manager.apply_annotation_changes(case_id, file_id, added=annotations)
+        write_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        loaded = manager.get_page_annotations(file_id, [0, 1, 2])[0]
+        read_time = time.perf_counter() - started
+        db.disconnect()
+
+    started = time.perf_counter()
+    index = GridIndex()
+    for annotation in loaded:
+        index.insert(annotation['id'], (annotation['x0'], annotation['y0'], annotation['x1'], annotation['y1']))
+    build_time = time.perf_counter() - started
+
+    for x, y in points[:200]:
+        assert index.hit_test(x, y) == linear_hit_test(index.rects, x, y)
+
+    linear = measure(lambda x, y: linear_hit_test(index.rects, x, y), points)
+    grid = measure(index.hit_test, points)
+
+    print(f"单页批注数: {len(loaded)}, 点击次数: {len(points)}")
+    print(f"批量写入: {write_time * 1000:.1f} ms（一个事务）, 读取3页: {read_time * 1000:.1f} ms, "
+          f"建索引: {build_time * 1000:.1f} ms")
+    for name, latencies in (('逐个检查', linear), ('网格索引', grid)):
+        print(f"{name}: p50 {percentile(latencies, 0.5):.1f} µs, p99 {percentile(latencies, 0.99):.1f} µs, "
+              f"max {max(latencies):.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
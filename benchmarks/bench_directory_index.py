@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+目录即时检索延迟测量
+生成指定条数的目录标题，测量建索引耗时以及逐字输入时每次查询的延迟，并与LIKE查询对比
+
+用法: python benchmarks/bench_directory_index.py [--entries 10000]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from directory_index import DirectoryIndex
+
+DOCUMENT_TYPES = ['起诉状', '答辩状', '证据目录', '质证意见', '代理词', '判决书', '裁定书', '询问笔录',
+                  '鉴定意见', '授权委托书', '送达回证', '庭审笔录', '上诉状', '调解书', '合同']
+PARTIES = ['张三', '李四', '王五', '赵六', '某某科技有限公司', '某某银行股份有限公司', '某市人民政府']
+QUERIES = ['起诉状', '张三', '证据', '某某科技', '鉴定意见书', '第12条', 'A-1', '庭审笔录（第二次）']
+
+
+def generate_entries(count, rng):
+    pdf_directories = []
+    case_directories = []
+    for n in range(count):
+        title = f"{rng.choice(PARTIES)}{rng.choice(DOCUMENT_TYPES)}"
+        if rng.random() < 0.3:
+            title += f"第{rng.randint(1, 300)}条"
+        if rng.random() < 0.8:
+            pdf_directories.append({'id': n, 'pdf_file_id': n // 200, 'title': title,
+                                    'page': rng.randint(1, 500), 'level': rng.randint(1, 3)})
+        else:
+            case_directories.append({'sequence_number': f"A-{n}", 'file_name': title,
+                                     'page_number': str(rng.randint(1, 500)), 'end_page': ''})
+    return pdf_directories, case_directories
+
+
+def keystroke_prefixes(query):
+    return [query[:length] for length in range(1, len(query) + 1)]
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='目录即时检索延迟测量')
+    parser.add_argument('--entries', type=int, default=10000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    pdf_directories, case_directories = generate_entries(args.entries, rng)
+
+    index = DirectoryIndex(1)
+    started = time.perf_counter()
+    index.build(pdf_directories, case_directories)
+    build_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    index.replace_pdf_file(0, pdf_directories[:150])
+    update_time = time.perf_counter() - started
+
+    connection = sqlite3.connect(':memory:')
+    connection.execute("CREATE TABLE pdf_directories (case_id INTEGER, title TEXT, page_number INTEGER, level INTEGER)")
+    connection.executemany("INSERT INTO pdf_directories VALUES (1, ?, ?, ?)",
+                           [(d['title'], d['page'], d['level']) for d in pdf_directories])
+    connection.execute("CREATE INDEX idx_case_page ON pdf_directories (case_id, page_number, level)")
+
+    index_latencies, like_latencies = [], []
+    for query in QUERIES:
+        for prefix in keystroke_prefixes(query):
+            started = time.perf_counter()
+            index.search(prefix)
+            index_latencies.append((time.perf_counter() - started) * 1000)
+
+            started = time.perf_counter()
+            connection.execute("""
+                SELECT title, page_number, level FROM pdf_directories
+                WHERE case_id = 1 AND title LIKE ? ORDER BY page_number, level
+            """, (f"%{prefix}%",)).fetchall()
+            like_latencies.append((time.perf_counter() - started) * 1000)
+
+    print(f"目录条数: {len(index)}")
+    print(f"建索引: {build_time * 1000:.1f} ms, 替换一个文件的150条目录: {update_time * 1000:.2f} ms")
+    for name, latencies in (('内存索引', index_latencies), ('LIKE查询(内存SQLite)', like_latencies)):
+        print(f"{name}: p50 {percentile(latencies, 0.5):.3f} ms, p95 {percentile(latencies, 0.95):.3f} ms, "
+              f"max {max(latencies):.3f} ms（{len(latencies)} 次按键）")
+    print("示例: " + ', '.join(f"{item['title']}" for item in index.search('张三起诉', limit=3)))
+
+
+if __name__ == "__main__":
+    main()
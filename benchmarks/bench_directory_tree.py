@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+层级目录查询耗时测量
+生成深层书签目录（默认5000项、最深12级），对比按物化路径的子树、上级和折叠大纲查询与
+读取整个文件目录后在Python中重建树的做法，并核对两者结果一致
+
+用法: python benchmarks/bench_directory_tree.py [--nodes 5000] [--max-depth 12]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database_config_enhanced import (LocalDatabaseManager, EnhancedCaseManager, PDFFileManager,
+                                      EnhancedDirectoryManager)
+
+TITLES = ['证据材料', '起诉状', '答辩状', '质证意见', '鉴定意见', '询问笔录', '合同', '附件', '判决书']
+
+
+def random_outline(count, max_depth, rng):
+    """书签顺序的(标题, 层级)：每项可在上一项的层级上加深一级或回到任意较浅层级"""
+    entries = []
+    level = 1
+    for n in range(count):
+        choice = rng.random()
+        if choice < 0.45 and level < max_depth:
+            level += 1
+        elif choice < 0.75:
+            level = rng.randint(1, level)
+        entries.append({'title': f"{rng.choice(TITLES)}{n}", 'page': n // 3 + 1, 'level': level})
+    return entries
+
+
+def python_tree(directories):
+    """基线：按书签顺序和层级在Python中重建树，返回 {id: (父id, [子id])}"""
+    tree = {}
+    stack = []
+    for directory in sorted(directories, key=lambda d: d['path']):
+        while stack and stack[-1][1] >= directory['depth']:
+            stack.pop()
+        parent = stack[-1][0] if stack else None
+        tree[directory['id']] = (parent, [])
+        if parent is not None:
+            tree[parent][1].append(directory['id'])
+        stack.append((directory['id'], directory['depth']))
+    return tree
+
+
+def python_subtree(tree, node_id):
+    result = []
+    pending = [node_id]
+    while pending:
+        current = pending.pop()
+        result.append(current)
+        pending.extend(reversed(tree[current][1]))
+    return result
+
+
+def python_ancestors(tree, node_id):
+    result = []
+    parent = tree[node_id][0]
+    while parent is not None:
+        result.append(parent)
+        parent = tree[parent][0]
+    return list(reversed(result))
+
+
+def timed(func, repeat):
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    return latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.95)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='层级目录查询耗时测量')
+    parser.add_argument('--nodes', type=int, default=5000)
+    parser.add_argument('--max-depth', type=int, default=12)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(46)
+    outline = random_outline(args.nodes, args.max_depth, rng)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = LocalDatabaseManager(os.path.join(tmp, 'bench.db'))
+        db.connect()
+        case_id = EnhancedCaseManager(db).create_case({'case_name': '目录测试'})
+        files = PDFFileManager(db)
+        file_id = files.add_pdf_file(case_id, os.path.join(tmp, 'a.pdf'), 'a.pdf', 0, 2000, content_hash='a')
+        # 同卷宗另一文件的目录，使查询需要按文件区分
+        other_id = files.add_pdf_file(case_id, os.path.join(tmp, 'b.pdf'), 'b.pdf', 0, 2000, content_hash='b')
+        manager = EnhancedDirectoryManager(db)
+
+        started = time.perf_counter()
+        manager.save_pdf_directories(case_id, file_id, outline)
+        save_time = time.perf_counter() - started
+        manager.save_pdf_directories(case_id, other_id, random_outline(args.nodes, args.max_depth, rng))
+
+        directories = manager.get_pdf_directories(case_id, file_id)
+        tree = python_tree(directories)
+        top_levels = [d for d in directories if d['depth'] == 1]
+        # 子树选取规模较大的一级目录，上级选取最深的目录
+        subtree_root = max(top_levels, key=lambda d: len(python_subtree(tree, d['id'])))['id']
+        deepest = max(directories, key=lambda d: d['depth'])['id']
+        expanded = [subtree_root] + tree[subtree_root][1][:3]
+
+        assert [d['id'] for d in manager.get_directory_subtree(subtree_root)] == python_subtree(tree, subtree_root)
+        assert [d['id'] for d in manager.get_directory_ancestors(deepest)] == python_ancestors(tree, deepest)
+        visible = {d['id'] for d in top_levels}
+        for node_id in expanded:
+            visible.update(tree[node_id][1])
+        outline_ids = [d['id'] for d in manager.get_collapsed_outline(file_id, expanded)]
+        assert set(outline_ids) == visible and len(outline_ids) == len(visible)
+
+        def rebuild_then(query):
+            return lambda: query(python_tree(manager.get_pdf_directories(case_id, file_id)))
+
+        cases = [
+            ('子树', lambda: manager.get_directory_subtree(subtree_root),
+             rebuild_then(lambda t: python_subtree(t, subtree_root))),
+            ('上级', lambda: manager.get_directory_ancestors(deepest),
+             rebuild_then(lambda t: python_ancestors(t, deepest))),
+            ('折叠大纲', lambda: manager.get_collapsed_outline(file_id, expanded),
+             rebuild_then(lambda t: [n for n in t if t[n][0] is None or t[n][0] in expanded])),
+        ]
+
+        print(f"目录项: {len(directories)}（最深 {max(d['depth'] for d in directories)} 级），"
+              f"保存含路径计算: {save_time * 1000:.1f} ms")
+        print(f"子树规模: {len(python_subtree(tree, subtree_root))} 项，最深目录的上级: "
+              f"{len(python_ancestors(tree, deepest))} 项，折叠大纲: {len(visible)} 项")
+        print(f"{'查询':<10} {'路径p50ms':>10} {'路径p95ms':>10} {'重建树p50ms':>12} {'重建树p95ms':>12}")
+        for name, by_path, by_rebuild in cases:
+            path_p50, path_p95 = timed(by_path, args.repeat)
+            rebuild_p50, rebuild_p95 = timed(by_rebuild, max(args.repeat // 10, 5))
+            print(f"{name:<10} {path_p50:>10.3f} {path_p95:>10.3f} {rebuild_p50:>12.2f} {rebuild_p95:>12.2f}")
+        db.disconnect()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+渐变按钮悬停开销测量
+对比原实现（每次悬停重绘整个画布）与缓存图片实现，统计每次悬停新建的画布元素数
+
+用法: python benchmarks/bench_gradient_button.py [--buttons 20] [--hovers 200]
+"""
+
+import argparse
+import os
+import sys
+import time
+import tkinter as tk
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gradient_button import create_gradient_button
+
+
+def create_legacy_gradient_button(parent, text, command, width=60, height=45):
+    """原实现：<Enter>/<Leave>时删除全部元素并逐条重绘"""
+    canvas = tk.Canvas(parent, width=width, height=height,
+                       highlightthickness=0, bd=0, bg='#f8f9fa')
+
+    def draw(body, bottom, start_r, start_g, fade, font_size):
+        canvas.delete("all")
+        radius = 8
+        canvas.create_rectangle(radius, 0, width-radius, height, fill=body, outline=body)
+        canvas.create_rectangle(0, radius, width, height-radius, fill=body, outline=body)
+        canvas.create_oval(0, 0, radius*2, radius*2, fill=body, outline=body)
+        canvas.create_oval(width-radius*2, 0, width, radius*2, fill=body, outline=body)
+        canvas.create_oval(0, height-radius*2, radius*2, height, fill=bottom, outline=bottom)
+        canvas.create_oval(width-radius*2, height-radius*2, width, height, fill=bottom, outline=bottom)
+        for i in range(height//2):
+            alpha = i / (height//2)
+            r = int(start_r - alpha * fade)
+            g = int(start_g - alpha * fade)
+            canvas.create_line(radius, i, width-radius, i, fill=f"#{r:02x}{g:02x}00", width=1)
+        canvas.create_text(width//2, height//2, text=text,
+                           font=('Segoe UI Emoji', font_size), fill='white', anchor='center')
+
+    draw('#FF8C00', '#E67E00', 255, 140, 20, 20)
+    canvas.bind('<Button-1>', lambda event: command())
+    canvas.bind('<Enter>', lambda event: draw('#FF7F00', '#CC6600', 255, 127, 15, 22))
+    canvas.bind('<Leave>', lambda event: draw('#FF8C00', '#E67E00', 255, 140, 20, 20))
+    return canvas
+
+
+def next_item_id(canvas):
+    """画布元素ID单调递增，用探针元素读取当前计数"""
+    probe = canvas.create_line(0, 0, 0, 0)
+    canvas.delete(probe)
+    return probe
+
+
+def measure(root, factory, buttons, hovers):
+    frame = tk.Frame(root)
+    frame.pack()
+    canvases = [factory(frame, '📄', lambda: None) for _ in range(buttons)]
+    for canvas in canvases:
+        canvas.pack(side=tk.LEFT)
+    root.update()
+
+    created = 0
+    start = time.perf_counter()
+    for n in range(hovers):
+        canvas = canvases[n % buttons]
+        before = next_item_id(canvas)
+        canvas.event_generate('<Enter>')
+        canvas.event_generate('<Leave>')
+        root.update_idletasks()
+        # 减去探针自身占用的1个ID
+        created += next_item_id(canvas) - before - 1
+    elapsed = time.perf_counter() - start
+
+    frame.destroy()
+    # 每次悬停 = 一次进入 + 一次离开
+    return created / hovers, elapsed / hovers * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='渐变按钮悬停开销测量')
+    parser.add_argument('--buttons', type=int, default=20, help='工具栏按钮数量')
+    parser.add_argument('--hovers', type=int, default=200, help='悬停次数')
+    args = parser.parse_args()
+
+    root = tk.Tk()
+    root.withdraw()
+
+    for name, factory in (('原实现', create_legacy_gradient_button),
+                          ('缓存图片', create_gradient_button)):
+        items, ms = measure(root, factory, args.buttons, args.hovers)
+        print(f"{name}: 每次悬停新建画布元素 {items:.1f} 个, 耗时 {ms:.3f} ms")
+
+    root.destroy()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+表格目录提取耗时测量
+生成带框线卷内目录表的模拟卷宗（封面、若干页目录表、正文页，正文中夹有不含目录表头的表格），
+对比"候选页筛选 + 只对候选页提取表格"与对全部页面提取表格的每份文件耗时，并核对两者结果一致
+
+用法: python benchmarks/bench_table_toc.py [--pages 200] [--entries 60] [--docs 3]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import fitz  # PyMuPDF
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from table_toc import find_candidate_pages, extract_tables, tables_to_directories
+
+TITLES = ['起诉状', '证据目录', '身份证明', '授权委托书', '答辩状', '质证意见', '鉴定意见书', '询问笔录',
+          '借款合同及补充协议', '银行转账凭证', '庭审笔录', '判决书']
+FONT = 'china-s'
+ROWS_PER_PAGE = 25
+# 目录表的列: (表头, 宽度)
+COLUMNS = (('序号', 50), ('文件名称', 300), ('页号', 80), ('备注', 70))
+
+
+def draw_table(page, top, header, rows):
+    """用线段绘制带框线的表格并写入单元格文字"""
+    left, row_height = 50, 24
+    widths = [width for _, width in COLUMNS]
+    all_rows = [header] + rows
+    bottom = top + row_height * len(all_rows)
+    right = left + sum(widths)
+    for n in range(len(all_rows) + 1):
+        y = top + n * row_height
+        page.draw_line((left, y), (right, y))
+    x = left
+    for width in widths + [0]:
+        page.draw_line((x, top), (x, bottom))
+        x += width
+    for n, row in enumerate(all_rows):
+        x = left
+        for value, width in zip(row, widths):
+            page.insert_text((x + 4, top + n * row_height + 16), value, fontname=FONT, fontsize=10)
+            x += width
+
+
+def build_dossier(path, page_count, entry_count, seed):
+    """封面 + 目录表页 + 正文页；正文每隔若干页有一张无目录表头的表格"""
+    toc_pages = -(-entry_count // ROWS_PER_PAGE)
+    body_start = 2 + toc_pages
+    starts = sorted({body_start + (n * (page_count - body_start)) // entry_count for n in range(entry_count)})
+    doc = fitz.open()
+    cover = doc.new_page()
+    cover.insert_text((200, 300), '卷  宗', fontname=FONT, fontsize=36)
+    rows = []
+    for n, start in enumerate(starts):
+        end = (starts[n + 1] - 1) if n + 1 < len(starts) else page_count
+        page_range = str(start) if end == start else f"{start}-{end}"
+        rows.append([str(n + 1), f"{TITLES[(n + seed) % len(TITLES)]}{n + 1}", page_range, ''])
+    for n in range(toc_pages):
+        page = doc.new_page()
+        if n == 0:
+            page.insert_text((250, 60), '卷内目录', fontname=FONT, fontsize=18)
+        draw_table(page, 80, [name for name, _ in COLUMNS], rows[n * ROWS_PER_PAGE:(n + 1) * ROWS_PER_PAGE])
+    for n in range(doc.page_count, page_count):
+        page = doc.new_page()
+        for line in range(30):
+            page.insert_text((50, 60 + line * 24), f"正文第{n + 1}页第{line + 1}行：当事人陈述与证据说明。",
+                             fontname=FONT, fontsize=11)
+        if n % 15 == 0:
+            draw_table(page, 500, ['日期', '金额', '收款方', '摘要'],
+                       [[f"2024-01-{d:02d}", f"{d * 1000}", '某公司', '转账'] for d in range(1, 6)])
+    doc.save(path)
+    doc.close()
+    return entry_count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='表格目录提取耗时测量')
+    parser.add_argument('--pages', type=int, default=200)
+    parser.add_argument('--entries', type=int, default=60)
+    parser.add_argument('--docs', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for n in range(args.docs):
+            path = os.path.join(tmp, f"dossier_{n}.pdf")
+            build_dossier(path, args.pages, args.entries, n)
+            paths.append(path)
+
+        print(f"{args.docs} 份文件，每份 {args.pages} 页，目录 {args.entries} 项")
+        print(f"{'文件':<16} {'候选页':>8} {'筛选ms':>9} {'候选提取ms':>11} {'两步合计ms':>11} "
+              f"{'全量提取ms':>11} {'加速':>6}")
+        totals = [0.0, 0.0]
+        for path in paths:
+            started = time.perf_counter()
+            candidates = find_candidate_pages(path)
+            scan_time = time.perf_counter() - started
+            targeted = tables_to_directories(extract_tables(path, candidates), args.pages)
+            targeted_time = time.perf_counter() - started
+
+            started = time.perf_counter()
+            full = tables_to_directories(extract_tables(path), args.pages)
+            full_time = time.perf_counter() - started
+
+            assert len(targeted) == args.entries, (len(targeted), args.entries)
+            assert targeted == full, '候选页提取与全量提取结果不一致'
+            totals[0] += targeted_time
+            totals[1] += full_time
+            print(f"{os.path.basename(path):<16} {len(candidates):>8} {scan_time * 1000:>9.1f} "
+                  f"{(targeted_time - scan_time) * 1000:>11.1f} {targeted_time * 1000:>11.1f} "
+                  f"{full_time * 1000:>11.1f} {full_time / targeted_time:>5.1f}x")
+        print(f"平均每份: 两步 {totals[0] / args.docs * 1000:.1f} ms，全量 {totals[1] / args.docs * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分块渲染调度测量
+用记录空闲回调的模拟画布驱动 TiledPageViewer（无需显示器，图块只做真实的PyMuPDF渲染，
+不转换为Tk图片），测量缩放和翻页后视口内图块全部渲染完成所需的空闲回调次数和耗时，
+并核对在渲染排队期间缩放、翻页后新视图的图块都能渲染完成
+
+用法: python benchmarks/bench_tile_renderer.py [--pages 5] [--width 1000] [--height 800]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import fitz  # PyMuPDF
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pdf_tile_renderer
+from pdf_tile_renderer import TiledPageViewer, TileCache
+from pdf_document_pool import PDFDocumentPool
+
+
+class FakeCanvas:
+    """只实现查看器用到的Canvas接口，空闲回调排队后由 drain() 依次执行"""
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.idle = []  # [(回调ID, 回调)]
+        self._next_id = 0
+
+    def _new_id(self):
+        self._next_id += 1
+        return self._next_id
+
+    def after_idle(self, callback):
+        job = f"after#{self._new_id()}"
+        self.idle.append((job, callback))
+        return job
+
+    def after_cancel(self, job):
+        self.idle = [(j, c) for j, c in self.idle if j != job]
+
+    def drain(self):
+        """执行空闲回调直到队列为空，返回执行次数"""
+        count = 0
+        while self.idle:
+            _, callback = self.idle.pop(0)
+            callback()
+            count += 1
+        return count
+
+    def bind(self, sequence=None, func=None, add=None):
+        return f"bind#{self._new_id()}" if func else ''
+
+    def deletecommand(self, name):
+        pass
+
+    def create_image(self, *args, **kwargs):
+        return self._new_id()
+
+    def create_rectangle(self, *args, **kwargs):
+        return self._new_id()
+
+    def itemconfigure(self, *args, **kwargs):
+        pass
+
+    def configure(self, **kwargs):
+        pass
+
+    def delete(self, *args):
+        pass
+
+    def tag_raise(self, *args):
+        pass
+
+    def canvasx(self, x):
+        return x
+
+    def canvasy(self, y):
+        return y
+
+    def xview_moveto(self, fraction):
+        pass
+
+    def yview_moveto(self, fraction):
+        pass
+
+    def winfo_width(self):
+        return self.width
+
+    def winfo_height(self):
+        return self.height
+
+
+def build_document(path, page_count):
+    doc = fitz.open()
+    for n in range(page_count):
+        page = doc.new_page()
+        for line in range(40):
+            page.insert_text((50, 40 + line * 19), f"Page {n + 1} line {line + 1}: evidence and statements.",
+                             fontsize=11)
+    doc.save(path)
+    doc.close()
+
+
+def visible_tiles(viewer):
+    return set(viewer._visible_tiles(*viewer.page_size()))
+
+
+def assert_rendered(viewer, label):
+    missing = [tile for tile in visible_tiles(viewer) if viewer.tile_cache.get(viewer._cache_key(*tile)) is None]
+    assert not missing, f"{label}: {len(missing)} 个可视图块停留在占位图"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='分块渲染调度测量')
+    parser.add_argument('--pages', type=int, default=5)
+    parser.add_argument('--width', type=int, default=1000)
+    parser.add_argument('--height', type=int, default=800)
+    args = parser.parse_args()
+
+    # 无显示器时不创建Tk图片：图块渲染仍走PyMuPDF，只跳过转换
+    pdf_tile_renderer.pixmap_to_photo = lambda pixmap: pixmap.size
+    TiledPageViewer._placeholder = lambda self, col, row: None
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'dossier.pdf')
+        build_document(path, args.pages)
+        canvas = FakeCanvas(args.width, args.height)
+        viewer = TiledPageViewer(canvas, path, zoom=1.0, document_pool=PDFDocumentPool(),
+                                 tile_cache=TileCache(max_tiles=4096))
+
+        started = time.perf_counter()
+        callbacks = canvas.drain()
+        assert_rendered(viewer, '首次显示')
+        print(f"首次显示: {len(visible_tiles(viewer))} 个图块，{callbacks} 次空闲回调，"
+              f"{(time.perf_counter() - started) * 1000:.1f} ms")
+
+        # 渲染排队期间缩放、翻页，旧视图的回调作废后新视图仍须继续渲染
+        for label, change in (('排队中放大', lambda: viewer.set_zoom(2.0)),
+                              ('排队中翻页', lambda: viewer.set_page(1)),
+                              ('排队中缩小', lambda: viewer.set_zoom(0.5)),
+                              ('排队中连续翻页并放大', lambda: (viewer.set_page(2), viewer.set_zoom(3.0)))):
+            viewer.tile_cache.clear()
+            viewer.set_page(viewer.page_index)  # 重新排入当前页的渲染
+            assert canvas.idle, '应有排队中的渲染回调'
+            change()
+            started = time.perf_counter()
+            callbacks = canvas.drain()
+            assert_rendered(viewer, label)
+            print(f"{label}: 缩放 {viewer.zoom}，第 {viewer.page_index + 1} 页，"
+                  f"{len(visible_tiles(viewer))} 个图块，{callbacks} 次空闲回调，"
+                  f"{(time.perf_counter() - started) * 1000:.1f} ms")
+
+        viewer.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+服务模式负载测试
+模拟多个客户端并发访问api_server，逐级提高并发数，报告各级的请求延迟和吞吐
+
+用法:
+    python api_server.py --db lawyer_assistant.db &
+    python benchmarks/load_test_api.py --url http://127.0.0.1:8765 --levels 1,5,10,20,30 --seed-pdf sample.pdf
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api_client import ApiClient
+
+
+def seed_case(url: str, pdf_path: str, directories: int = 500) -> int:
+    """创建一个带文件和目录的测试卷宗（pdf_path需对服务端可见）"""
+    client = ApiClient(url)
+    case_id = client.request('POST', '/api/cases', json_body={'case_name': '负载测试卷宗'})['id']
+    for _ in range(2):
+        pdf_file_id = client.request('POST', f'/api/cases/{case_id}/files',
+                                     json_body={'file_path': pdf_path})['id']
+        entries = [{'title': f'证据材料{n}', 'page': n, 'level': 1 + n % 3} for n in range(directories)]
+        client.request('PUT', f'/api/cases/{case_id}/files/{pdf_file_id}/directories', json_body=entries)
+    client.close()
+    return case_id
+
+
+def client_session(url: str, case_ids, deadline: float, latencies, errors, lock):
+    """单个客户端：按阅卷操作的比例循环请求"""
+    client = ApiClient(url)
+    operations = [
+        (3, lambda case_id: ('GET', '/api/cases', None)),
+        (2, lambda case_id: ('GET', f'/api/cases/{case_id}', None)),
+        (3, lambda case_id: ('GET', f'/api/cases/{case_id}/files', None)),
+        (5, lambda case_id: ('GET', f'/api/cases/{case_id}/directories', None)),
+        (2, lambda case_id: ('GET', f'/api/cases/{case_id}/directories/search',
+                             {'q': f'材料{random.randint(1, 99)}'})),
+        (1, lambda case_id: ('GET', f'/api/cases/{case_id}/statistics', None)),
+    ]
+    weights = [weight for weight, _ in operations]
+
+    local_latencies = []
+    local_errors = 0
+    while time.monotonic() < deadline:
+        _, build = random.choices(operations, weights)[0]
+        method, path, params = build(random.choice(case_ids))
+        started = time.perf_counter()
+        try:
+            client.request(method, path, params=params)
+            local_latencies.append(time.perf_counter() - started)
+        except Exception:
+            local_errors += 1
+    client.close()
+
+    with lock:
+        latencies.extend(local_latencies)
+        errors[0] += local_errors
+
+
+def percentile(values, p: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_level(url: str, case_ids, concurrency: int, duration: float):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+    threads = [threading.Thread(target=client_session,
+                                args=(url, case_ids, deadline, latencies, errors, lock))
+               for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    ms = [value * 1000 for value in latencies]
+    print(f"{concurrency:>6} {len(ms) / duration:>10.1f} "
+          f"{percentile(ms, 50):>8.2f} {percentile(ms, 95):>8.2f} {percentile(ms, 99):>8.2f} "
+          f"{(statistics.mean(ms) if ms else 0):>8.2f} {errors[0]:>6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='服务模式负载测试')
+    parser.add_argument('--url', default='http://127.0.0.1:8765', help='服务地址')
+    parser.add_argument('--levels', default='1,5,10,20,30', help='逐级并发客户端数')
+    parser.add_argument('--duration', type=float, default=10, help='每级持续秒数')
+    parser.add_argument('--case-ids', default='', help='测试使用的卷宗ID（逗号分隔）')
+    parser.add_argument('--seed-pdf', help='用该PDF先创建测试卷宗')
+    args = parser.parse_args()
+
+    case_ids = [int(value) for value in args.case_ids.split(',') if value]
+    if args.seed_pdf:
+        case_ids.append(seed_case(args.url, os.path.abspath(args.seed_pdf)))
+    if not case_ids:
+        parser.error('需要 --case-ids 或 --seed-pdf')
+
+    print(f"{'并发':>6} {'请求/秒':>10} {'p50ms':>8} {'p95ms':>8} {'p99ms':>8} {'均值ms':>8} {'错误':>6}")
+    for level in [int(value) for value in args.levels.split(',')]:
+        run_level(args.url, case_ids, level, args.duration)
+
+    health = ApiClient(args.url).request('GET', '/api/health')
+    print(f"服务端: 数据库查询 {health['db_queries']} 次, 缓存 {health['cache']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据库层并发负载和长时间运行测试
+模拟多名律师同时使用桌面端：每个虚拟用户按会话循环执行 连接、登录、创建和验证会话、卷宗列表、打开卷宗、
+读取目录、搜索目录、（偶尔）保存目录、登出，直接调用 DatabaseManager、UserManager、CaseManager 和
+DirectoryManager。可用多线程或多进程运行，结束后按操作报告 p50/p95/p99 延迟、吞吐、错误数和
+打开的连接数，并按时间段报告吞吐和 p95 的变化（长时间运行时观察性能是否随时间劣化）
+
+用法:
+    python benchmarks/load_test_db.py --users 50 --duration 300 --host 127.0.0.1 --password ***
+    python benchmarks/load_test_db.py --users 50 --processes 5 --duration 3600 --interval 60 --persistent
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database_config import DatabaseConfig, DatabaseManager, UserManager, CaseManager, DirectoryManager
+
+USERNAME_PREFIX = 'loadtest_'
+PASSWORD = 'loadtest-password'
+CASE_NAME_PREFIX = '负载测试卷宗'
+SEARCH_TERMS = ['起诉', '证据', '判决', '笔录', '鉴定', '合同', '1', '附件']
+DOCUMENT_TYPES = ['起诉状', '答辩状', '证据目录', '质证意见', '代理词', '判决书', '询问笔录', '鉴定意见']
+
+# 报告中的操作顺序
+OPERATIONS = ['connect', 'login', 'create_session', 'validate_session', 'list_cases', 'open_case',
+              'load_directories', 'search', 'save_directory', 'logout']
+
+
+def directory_rows(count: int, rng: random.Random):
+    return [{'sequence_number': str(n + 1),
+             'file_name': f"{rng.choice(DOCUMENT_TYPES)}{n + 1}",
+             'page_number': str(n * 3 + 1),
+             'end_page': str(n * 3 + 3)} for n in range(count)]
+
+
+def seed(users: int, cases_per_user: int, directories: int):
+    """创建测试用户和卷宗（已存在的用户复用）"""
+    db = DatabaseManager()
+    if not db.connect():
+        raise SystemExit("无法连接数据库")
+    rng = random.Random(45)
+    case_manager = CaseManager(db)
+    directory_manager = DirectoryManager(db)
+    password_hash = UserManager.hash_password(PASSWORD)
+    created = 0
+    for n in range(users):
+        username = f"{USERNAME_PREFIX}{n}"
+        existing = db.execute_query("SELECT id FROM users WHERE username = %s", (username,))
+        if existing:
+            continue
+        user_id = db.execute_insert("""
+            INSERT INTO users (username, password, full_name, role, status)
+            VALUES (%s, %s, %s, 'user', 'active')
+        """, (username, password_hash, f"测试律师{n}"))
+        for c in range(cases_per_user):
+            case_id = case_manager.create_case(f"{CASE_NAME_PREFIX}{n}-{c}", f"(2024)测{n}-{c}号", '', user_id)
+            directory_manager.save_directory(case_id, directory_rows(directories, rng))
+        created += 1
+    db.disconnect()
+    print(f"测试数据: 新建 {created} 个用户，每人 {cases_per_user} 个卷宗、每卷宗 {directories} 条目录")
+
+
+def cleanup():
+    """删除测试用户及其卷宗"""
+    db = DatabaseManager()
+    if not db.connect():
+        raise SystemExit("无法连接数据库")
+    like = USERNAME_PREFIX + '%'
+    db.execute_update("""
+        DELETE cd FROM case_directories cd JOIN cases c ON cd.case_id = c.id
+        JOIN users u ON c.created_by = u.id WHERE u.username LIKE %s
+    """, (like,))
+    db.execute_update("DELETE c FROM cases c JOIN users u ON c.created_by = u.id WHERE u.username LIKE %s",
+                      (like,))
+    removed = db.execute_update("DELETE FROM users WHERE username LIKE %s", (like,))
+    db.disconnect()
+    print(f"已删除 {removed} 个测试用户")
+
+
+class VirtualUser:
+    """一个虚拟用户：按会话循环操作，记录 (开始时间偏移, 操作, 耗时, 是否成功)"""
+
+    def __init__(self, index: int, started: float, deadline: float, persistent: bool,
+                 think_ms: float, save_ratio: float):
+        self.username = f"{USERNAME_PREFIX}{index}"
+        self.started = started
+        self.deadline = deadline
+        self.persistent = persistent
+        self.think_ms = think_ms
+        self.save_ratio = save_ratio
+        self.rng = random.Random(index)
+        self.samples = []
+        self.connections = 0
+        self.db = None
+
+    def timed(self, operation: str, call, is_ok=lambda result: result is not None):
+        began = time.perf_counter()
+        try:
+            result = call()
+            ok = is_ok(result)
+        except Exception as e:
+            # 连接断开等未被管理器捕获的异常
+            result, ok = None, False
+            print(f"{self.username} {operation} 异常: {e}")
+        self.samples.append((began - self.started, operation, time.perf_counter() - began, ok))
+        if self.think_ms:
+            time.sleep(self.rng.uniform(0, self.think_ms * 2) / 1000)
+        return result if ok else None
+
+    def run(self):
+        while time.perf_counter() < self.deadline:
+            if self.db is None:
+                db = DatabaseManager()
+                if not self.timed('connect', db.connect, is_ok=bool):
+                    time.sleep(0.5)
+                    continue
+                self.db = db
+                self.connections += 1
+            self.session()
+            if not self.persistent:
+                self.db.disconnect()
+                self.db = None
+        if self.db:
+            self.db.disconnect()
+
+    def session(self):
+        users = UserManager(self.db)
+        cases = CaseManager(self.db)
+        directories = DirectoryManager(self.db)
+
+        user = self.timed('login', lambda: users.authenticate_user(self.username, PASSWORD))
+        if not user:
+            return
+        token = self.timed('create_session', lambda: users.create_session(user['id']))
+        if not token:
+            return
+        for _ in range(self.rng.randint(1, 4)):
+            if time.perf_counter() >= self.deadline:
+                break
+            self.timed('validate_session', lambda: users.validate_session(token))
+            case_list = self.timed('list_cases', lambda: cases.get_user_cases(user['id']))
+            if not case_list:
+                continue
+            case_id = self.rng.choice(case_list)['id']
+            self.timed('open_case', lambda: cases.get_case_by_id(case_id, user['id']))
+            rows = self.timed('load_directories', lambda: directories.get_case_directories(case_id))
+            for _ in range(self.rng.randint(1, 3)):
+                keyword = self.rng.choice(SEARCH_TERMS)
+                self.timed('search', lambda: directories.search_directories(case_id, keyword))
+            if rows and self.rng.random() < self.save_ratio:
+                self.timed('save_directory', lambda: directories.save_directory(case_id, rows),
+                           is_ok=lambda count: count == len(rows))
+        self.timed('logout', lambda: users.logout_user(token), is_ok=lambda result: result is True)
+
+
+def run_users(user_indexes, duration: float, ramp: float, persistent: bool, think_ms: float,
+              save_ratio: float, db_config: dict):
+    """在当前进程中用线程运行一组虚拟用户，返回 (样本, 打开的连接数)"""
+    DatabaseConfig.DB_CONFIG.update(db_config)
+    started = time.perf_counter()
+    deadline = started + duration
+    virtual_users = []
+    threads = []
+    for position, index in enumerate(user_indexes):
+        user = VirtualUser(index, started, deadline, persistent, think_ms, save_ratio)
+        delay = ramp * position / max(len(user_indexes), 1)
+        thread = threading.Thread(target=lambda u=user, d=delay: (time.sleep(d), u.run()),
+                                  name=f"vu-{index}", daemon=True)
+        virtual_users.append(user)
+        threads.append(thread)
+        thread.start()
+    for thread in threads:
+        thread.join()
+    samples = [sample for user in virtual_users for sample in user.samples]
+    return samples, sum(user.connections for user in virtual_users)
+
+
+def _process_entry(args, queue):
+    queue.put(run_users(*args))
+
+
+class ServerMonitor(threading.Thread):
+    """定期读取服务端的连接数（Threads_connected）"""
+
+    def __init__(self, interval: float = 1.0):
+        super().__init__(name='server-monitor', daemon=True)
+        self.interval = interval
+        self.samples = []
+        self.max_used = None
+        self._stop_event = threading.Event()
+        self.db = DatabaseManager()
+
+    def status(self, name: str):
+        rows = self.db.execute_query("SHOW GLOBAL STATUS LIKE %s", (name,))
+        return int(rows[0]['Value']) if rows else None
+
+    def run(self):
+        if not self.db.connect():
+            return
+        while not self._stop_event.wait(self.interval):
+            value = self.status('Threads_connected')
+            if value is not None:
+                self.samples.append(value)
+        self.max_used = self.status('Max_used_connections')
+        self.db.disconnect()
+
+    def stop(self):
+        self._stop_event.set()
+        self.join(self.interval * 3)
+
+
+def percentile(values, p: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def report(samples, connections: int, duration: float, interval: float, monitor: ServerMonitor):
+    by_operation = {}
+    for offset, operation, elapsed, ok in samples:
+        by_operation.setdefault(operation, []).append((elapsed * 1000, ok))
+
+    print(f"\n{'操作':<18} {'次数':>8} {'次/秒':>8} {'p50ms':>8} {'p95ms':>8} {'p99ms':>8} "
+          f"{'最大ms':>8} {'错误':>6}")
+    for operation in OPERATIONS:
+        rows = by_operation.get(operation)
+        if not rows:
+            continue
+        ms = [elapsed for elapsed, ok in rows if ok]
+        errors = sum(1 for _, ok in rows if not ok)
+        print(f"{operation:<18} {len(rows):>8} {len(rows) / duration:>8.1f} {percentile(ms, 50):>8.2f} "
+              f"{percentile(ms, 95):>8.2f} {percentile(ms, 99):>8.2f} {(max(ms) if ms else 0):>8.1f} "
+              f"{errors:>6}")
+
+    total_errors = sum(1 for sample in samples if not sample[3])
+    print(f"\n总计: {len(samples)} 次操作，{len(samples) / duration:.1f} 次/秒，错误 {total_errors} 次")
+    print(f"客户端打开连接: {connections} 个（connect 操作 {len(by_operation.get('connect', []))} 次）")
+    if monitor.samples:
+        print(f"服务端连接数: 平均 {statistics.mean(monitor.samples):.1f}，峰值 {max(monitor.samples)}，"
+              f"Max_used_connections {monitor.max_used}")
+
+    # 按时间段观察吞吐和延迟是否随运行时间劣化
+    if interval and duration > interval:
+        print(f"\n{'时间段(秒)':<14} {'次/秒':>8} {'p95ms':>8} {'错误':>6}")
+        buckets = {}
+        for offset, _, elapsed, ok in samples:
+            buckets.setdefault(int(offset // interval), []).append((elapsed * 1000, ok))
+        for bucket in sorted(buckets):
+            rows = buckets[bucket]
+            ms = [elapsed for elapsed, ok in rows if ok]
+            label = f"{bucket * interval:.0f}-{(bucket + 1) * interval:.0f}"
+            print(f"{label:<14} {len(rows) / interval:>8.1f} {percentile(ms, 95):>8.2f} "
+                  f"{sum(1 for _, ok in rows if not ok):>6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='数据库层并发负载和长时间运行测试')
+    parser.add_argument('--users', type=int, default=50, help='并发虚拟用户数')
+    parser.add_argument('--processes', type=int, default=1, help='分布到多少个进程（每个进程内为线程）')
+    parser.add_argument('--duration', type=float, default=60, help='运行秒数')
+    parser.add_argument('--ramp', type=float, default=5, help='在多少秒内逐个启动虚拟用户')
+    parser.add_argument('--think-ms', type=float, default=50, help='操作之间的平均停顿（毫秒）')
+    parser.add_argument('--save-ratio', type=float, default=0.1, help='打开卷宗后保存目录的比例')
+    parser.add_argument('--persistent', action='store_true', help='虚拟用户在会话之间保持连接')
+    parser.add_argument('--interval', type=float, default=0, help='按该秒数分段报告（长时间运行）')
+    parser.add_argument('--cases-per-user', type=int, default=5)
+    parser.add_argument('--directories', type=int, default=200, help='每个测试卷宗的目录条数')
+    parser.add_argument('--cleanup', action='store_true', help='只删除测试数据后退出')
+    parser.add_argument('--host')
+    parser.add_argument('--port', type=int)
+    parser.add_argument('--user')
+    parser.add_argument('--password')
+    parser.add_argument('--database')
+    args = parser.parse_args()
+
+    db_config = {key: value for key, value in (('host', args.host), ('port', args.port), ('user', args.user),
+                                               ('password', args.password), ('database', args.database))
+                 if value is not None}
+    DatabaseConfig.DB_CONFIG.update(db_config)
+
+    if args.cleanup:
+        cleanup()
+        return
+    seed(args.users, args.cases_per_user, args.directories)
+
+    monitor = ServerMonitor()
+    monitor.start()
+    print(f"{args.users} 个虚拟用户，{args.processes} 个进程，运行 {args.duration:.0f} 秒"
+          f"（{'保持连接' if args.persistent else '每个会话重新连接'}）")
+
+    indexes = list(range(args.users))
+    run_args = (args.duration, args.ramp, args.persistent, args.think_ms, args.save_ratio, db_config)
+    wall_started = time.perf_counter()
+    if args.processes <= 1:
+        samples, connections = run_users(indexes, *run_args)
+    else:
+        queue = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=_process_entry,
+                                             args=((indexes[n::args.processes],) + run_args, queue))
+                     for n in range(args.processes)]
+        for process in processes:
+            process.start()
+        samples, connections = [], 0
+        for _ in processes:
+            process_samples, process_connections = queue.get()
+            samples.extend(process_samples)
+            connections += process_connections
+        for process in processes:
+            process.join()
+    wall_time = time.perf_counter() - wall_started
+    monitor.stop()
+
+    report(samples, connections, wall_time, args.interval, monitor)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量导入卷宗（无界面）
+将目录树中的PDF按卷宗导入数据库：根目录下的每个子目录为一个卷宗，其中（含子目录）的PDF为卷宗文件。
+提取在多进程中并行执行，数据库按批写入，并记录检查点，中断后重新运行会从上次停止的位置继续
+
+用法:
+    python bulk_ingest.py D:/卷宗归档 --db lawyer_assistant.db --workers 8 --batch-size 50
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Tuple
+
+from database_config_enhanced import (LocalDatabaseManager, EnhancedCaseManager, PDFFileManager,
+                                      EnhancedDirectoryManager, compute_file_hash)
+
+CHECKPOINT_NAME = '.ingest_checkpoint.json'
+
+
+def extract_pdf(file_path: str) -> Dict:
+    """工作进程：计算内容哈希、页数和书签目录"""
+    import fitz  # PyMuPDF，在工作进程中导入
+
+    started = time.perf_counter()
+    content_hash = compute_file_hash(file_path)
+    with fitz.open(file_path) as doc:
+        page_count = doc.page_count
+        directories = [{'title': title, 'page': page, 'level': level}
+                       for level, title, page in doc.get_toc(simple=True)]
+
+    return {
+        'file_path': file_path,
+        'file_name': os.path.basename(file_path),
+        'file_size': os.path.getsize(file_path),
+        'page_count': page_count,
+        'content_hash': content_hash,
+        'directories': directories,
+        'extract_time': time.perf_counter() - started
+    }
+
+
+def discover_dossiers(root: str) -> List[Tuple[str, List[str]]]:
+    """按卷宗收集PDF：[(卷宗名称, [PDF路径])]，根目录下直接存放的PDF归入以根目录命名的卷宗"""
+    dossiers = []
+    loose_files = []
+
+    for entry in sorted(os.scandir(root), key=lambda e: e.name):
+        if entry.is_dir() and not entry.name.startswith('.'):
+            files = []
+            for dirpath, dirnames, filenames in os.walk(entry.path):
+                dirnames.sort()
+                files.extend(os.path.join(dirpath, name) for name in sorted(filenames)
+                             if name.lower().endswith('.pdf'))
+            if files:
+                dossiers.append((entry.name, files))
+        elif entry.is_file() and entry.name.lower().endswith('.pdf'):
+            loose_files.append(entry.path)
+
+    if loose_files:
+        dossiers.append((os.path.basename(os.path.normpath(root)), loose_files))
+    return dossiers
+
+
+def write_extracted_files(pdf_file_manager, directory_manager, case_id: int, batch: List[Dict]) -> List[int]:
+    """将一批 extract_pdf 结果（文件记录及其书签目录）在同一个事务中写入
+
+    两个管理器须使用同一个数据库连接；返回与batch顺序一致的文件ID，失败时整批回滚并返回空列表。
+    """
+    file_ids = pdf_file_manager.add_pdf_files(case_id, batch, commit=False)
+    saved = bool(file_ids)
+    if saved:
+        directories_by_file = {file_id: result['directories']
+                               for file_id, result in zip(file_ids, batch) if result['directories']}
+        if directories_by_file:
+            # 目录写入失败时连同本批文件记录一起回滚
+            saved = directory_manager.save_pdf_directories_batch(case_id, directories_by_file)
+        else:
+            pdf_file_manager.db_manager.connection.commit()
+    if not saved:
+        pdf_file_manager.db_manager.connection.rollback()
+        return []
+    return file_ids
+
+
+class IngestCheckpoint:
+    """导入检查点：已建卷宗的ID和已写入数据库的文件
+
+    检查点逐行追加JSON记录（{"case": 卷宗名, "id": 卷宗ID} 或 {"files": [本批文件]}），每批只追加
+    本批的文件，不重写整个检查点；加载时合并重写为紧凑形式，中断时未写完的末行随之丢弃。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.case_ids: Dict[str, int] = {}
+        self.done_files = set()
+        if os.path.exists(path):
+            self._load()
+            self._compact()
+
+    def add_case(self, case_name: str, case_id: int):
+        self.case_ids[case_name] = case_id
+        self._append({'case': case_name, 'id': case_id})
+
+    def add_files(self, file_paths: List[str]):
+        new_paths = [path for path in file_paths if path not in self.done_files]
+        if new_paths:
+            self.done_files.update(new_paths)
+            self._append({'files': new_paths})
+
+    def _load(self):
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # 中断时写了一半的行
+                    continue
+                if 'case_ids' in record or 'done_files' in record:
+                    # 旧版整体写入的检查点
+                    self.case_ids.update(record.get('case_ids', {}))
+                    self.done_files.update(record.get('done_files', []))
+                elif 'case' in record:
+                    self.case_ids[record['case']] = record['id']
+                else:
+                    self.done_files.update(record.get('files', []))
+
+    def _compact(self):
+        """原子重写为每个卷宗一行、全部文件一行"""
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for case_name, case_id in self.case_ids.items():
+                f.write(json.dumps({'case': case_name, 'id': case_id}, ensure_ascii=False) + '\n')
+            if self.done_files:
+                f.write(json.dumps({'files': sorted(self.done_files)}, ensure_ascii=False) + '\n')
+        os.replace(tmp_path, self.path)
+
+    def _append(self, record: Dict):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class BulkIngester:
+    """批量导入执行器"""
+
+    def __init__(self, db_manager, checkpoint: IngestCheckpoint, workers: int, batch_size: int):
+        self.case_manager = EnhancedCaseManager(db_manager)
+        self.pdf_file_manager = PDFFileManager(db_manager)
+        self.directory_manager = EnhancedDirectoryManager(db_manager)
+        self.checkpoint = checkpoint
+        self.workers = workers
+        self.batch_size = batch_size
+
+        self.stats = {'files': 0, 'pages': 0, 'failed': 0, 'skipped': 0,
+                      'db_time': 0.0, 'extract_time': 0.0}
+
+    def run(self, root: str):
+        dossiers = discover_dossiers(root)
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            for case_name, files in dossiers:
+                self._ingest_dossier(executor, case_name, files)
+
+    def _ingest_dossier(self, executor, case_name: str, files: List[str]):
+        pending = [path for path in files if path not in self.checkpoint.done_files]
+        self.stats['skipped'] += len(files) - len(pending)
+        if not pending:
+            return
+
+        case_id = self.checkpoint.case_ids.get(case_name)
+        if case_id is None:
+            started = time.perf_counter()
+            case_id = self.case_manager.create_case({'case_name': case_name,
+                                                     'description': '批量导入'})
+            self.stats['db_time'] += time.perf_counter() - started
+            if not case_id:
+                print(f"✗ 创建卷宗失败: {case_name}")
+                return
+            self.checkpoint.add_case(case_name, case_id)
+        else:
+            # 上次中断在数据库提交之后、检查点保存之前时，已写入的文件不再重复导入
+            imported = {f['file_path'] for f in self.pdf_file_manager.get_pdf_files_by_case(case_id)}
+            already = [path for path in pending if path in imported]
+            if already:
+                self.checkpoint.add_files(already)
+                self.stats['skipped'] += len(already)
+                pending = [path for path in pending if path not in imported]
+                if not pending:
+                    return
+
+        print(f"📁 {case_name}: {len(pending)} 个文件")
+        futures = {executor.submit(extract_pdf, path): path for path in pending}
+        batch = []
+        for future in as_completed(futures):
+            try:
+                batch.append(future.result())
+            except Exception as e:
+                self.stats['failed'] += 1
+                print(f"✗ 提取失败 {futures[future]}: {e}")
+                continue
+            if len(batch) >= self.batch_size:
+                self._write_batch(case_id, batch)
+                batch = []
+        if batch:
+            self._write_batch(case_id, batch)
+
+    def _write_batch(self, case_id: int, batch: List[Dict]):
+        """一批文件及其目录在同一个事务中写入，成功后更新检查点；失败时整批回滚，下次运行重试"""
+        started = time.perf_counter()
+        file_ids = write_extracted_files(self.pdf_file_manager, self.directory_manager, case_id, batch)
+        self.stats['db_time'] += time.perf_counter() - started
+        if not file_ids:
+            self.stats['failed'] += len(batch)
+            return
+
+        for result in batch:
+            self.stats['files'] += 1
+            self.stats['pages'] += result['page_count']
+            self.stats['extract_time'] += result['extract_time']
+        self.checkpoint.add_files([result['file_path'] for result in batch])
+
+    def report(self, elapsed: float) -> str:
+        minutes = max(elapsed / 60, 1e-9)
+        stats = self.stats
+        return '\n'.join([
+            "===== 导入完成 =====",
+            f"文件: {stats['files']} 个（跳过已导入 {stats['skipped']}，失败 {stats['failed']}）",
+            f"页数: {stats['pages']}",
+            f"总耗时: {elapsed:.1f} 秒",
+            f"吞吐: {stats['files'] / minutes:.1f} 文件/分钟, {stats['pages'] / minutes:.1f} 页/分钟",
+            f"数据库写入: {stats['db_time']:.1f} 秒 ({stats['db_time'] / max(elapsed, 1e-9):.0%} 墙钟时间)",
+            f"提取: 累计 {stats['extract_time']:.1f} 秒（{self.workers} 个工作进程并行）",
+        ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='批量导入卷宗PDF')
+    parser.add_argument('root', help='卷宗目录树的根目录')
+    parser.add_argument('--db', default='lawyer_assistant.db', help='本地数据库文件')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4, help='提取进程数')
+    parser.add_argument('--batch-size', type=int, default=50, help='每批写入的文件数')
+    parser.add_argument('--checkpoint', help='检查点文件（默认位于根目录下）')
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.root):
+        print(f"目录不存在: {args.root}")
+        sys.exit(1)
+
+    db_manager = LocalDatabaseManager(args.db)
+    if not db_manager.connect():
+        sys.exit(1)
+
+    checkpoint = IngestCheckpoint(args.checkpoint or os.path.join(args.root, CHECKPOINT_NAME))
+    ingester = BulkIngester(db_manager, checkpoint, args.workers, args.batch_size)
+
+    started = time.perf_counter()
+    try:
+        ingester.run(args.root)
+    except KeyboardInterrupt:
+        print("\n⚠️ 已中断，重新运行将从检查点继续")
+    finally:
+        print(ingester.report(time.perf_counter() - started))
+        db_manager.disconnect()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地缓存目录
+渲染缓存、缩略图等按卷宗存放在统一的缓存根目录下，便于清理和统计占用空间
+"""
+
+import os
+import shutil
+
+# 缓存根目录，可通过环境变量覆盖
+CACHE_ROOT = os.environ.get('LAWYER_ASSISTANT_CACHE',
+                            os.path.join(os.path.expanduser('~'), '.lawyer_assistant', 'cache'))
+
+
+def case_cache_dir(case_id) -> str:
+    """卷宗的本地缓存目录"""
+    return os.path.join(CACHE_ROOT, 'cases', str(case_id))
+
+
+def directory_size(path: str) -> int:
+    """统计目录占用的字节数"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def remove_directory(path: str) -> int:
+    """删除目录并返回释放的字节数"""
+    if not path or not os.path.isdir(path):
+        return 0
+    size = directory_size(path)
+    shutil.rmtree(path, ignore_errors=True)
+    return size
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+不活跃卷宗的冷存储归档
+超过指定天数未更新（按 updated_at）的卷宗：PDF文件打包为压缩归档，删除本地渲染缓存，
+目录和批注行移入归档表，不再占用热表和索引。打开已归档卷宗时按文件逐个恢复：
+首次访问某个文件时才解压（原文件仍在时直接使用）并移回其目录和批注
+
+用法:
+    python case_archive.py --db lawyer_assistant.db --days 365
+    python case_archive.py --db lawyer_assistant.db --days 365 --remove-originals
+"""
+
+import argparse
+import os
+import time
+import zipfile
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from cache_paths import CACHE_ROOT, case_cache_dir, remove_directory
+from database_config_enhanced import record_case_change, refresh_directory_stats
+
+# 归档根目录，可通过环境变量覆盖
+ARCHIVE_ROOT = os.environ.get('LAWYER_ASSISTANT_ARCHIVE',
+                              os.path.join(os.path.dirname(CACHE_ROOT), 'archive'))
+# 默认归档未更新超过该天数的卷宗
+DEFAULT_INACTIVE_DAYS = 365
+
+# 归档时在热表和归档表之间移动的行（表名, 归档表名, 列）
+MOVED_TABLES = (
+    ('pdf_directories', 'archived_pdf_directories',
+     'id, case_id, pdf_file_id, title, page_number, level, parent_id, path, depth, created_at'),
+    ('pdf_annotations', 'archived_pdf_annotations',
+     'id, case_id, pdf_file_id, page_index, x0, y0, x1, y1, color, note, created_by, created_at, updated_at'),
+)
+
+
+def case_archive_path(case_id: int, archive_root: str = ARCHIVE_ROOT) -> str:
+    """卷宗归档文件路径"""
+    return os.path.join(archive_root, f"case_{case_id}.zip")
+
+
+def case_restore_dir(case_id: int, archive_root: str = ARCHIVE_ROOT) -> str:
+    """已删除原文件的归档文件解压恢复到的目录"""
+    return os.path.join(archive_root, 'restored', str(case_id))
+
+
+def remove_case_archive(case_id: int, archive_root: str = ARCHIVE_ROOT) -> int:
+    """删除卷宗的归档文件和恢复目录（卷宗被物理删除时），返回释放的字节数"""
+    freed = remove_directory(case_restore_dir(case_id, archive_root))
+    archive_path = case_archive_path(case_id, archive_root)
+    try:
+        if os.path.exists(archive_path):
+            size = os.path.getsize(archive_path)
+            os.remove(archive_path)
+            freed += size
+    except OSError as e:
+        print(f"删除卷宗归档失败: {archive_path}: {e}")
+    return freed
+
+
+class CaseArchiver:
+    """卷宗归档和按文件恢复
+
+    db_manager 为已连接的 LocalDatabaseManager（与增强版管理器相同的连接）。
+    """
+
+    def __init__(self, db_manager, archive_root: str = ARCHIVE_ROOT):
+        self.db_manager = db_manager
+        self.archive_root = archive_root
+        self.rehydrations: List[Dict] = []  # 每次恢复：{pdf_file_id, seconds, extracted}
+
+    # ---------- 归档 ----------
+
+    def find_inactive_cases(self, inactive_days: int = DEFAULT_INACTIVE_DAYS) -> List[int]:
+        """超过指定天数未更新且尚未归档的卷宗"""
+        cutoff = (datetime.now() - timedelta(days=inactive_days)).strftime('%Y-%m-%d %H:%M:%S')
+        try:
+            cursor = self.db_manager.cursor
+            cursor.execute("""
+                SELECT id FROM cases
+                WHERE updated_at < ? AND archived_at IS NULL AND status = 'active'
+                ORDER BY updated_at
+            """, (cutoff,))
+            return [row[0] for row in cursor.fetchall()]
+        except Exception as e:
+            print(f"查找不活跃卷宗失败: {e}")
+            return []
+
+    def archive_inactive(self, inactive_days: int = DEFAULT_INACTIVE_DAYS,
+                         remove_originals: bool = False, max_cases: int = None) -> Dict:
+        """归档所有不活跃卷宗，返回汇总报告"""
+        report = {'cases': 0, 'files': 0, 'rows_moved': 0, 'original_bytes': 0, 'archive_bytes': 0,
+                  'removed_file_bytes': 0, 'cache_bytes': 0, 'elapsed': 0.0}
+        started = time.perf_counter()
+        for case_id in self.find_inactive_cases(inactive_days)[:max_cases]:
+            case_report = self.archive_case(case_id, remove_originals)
+            if case_report is None:
+                continue
+            report['cases'] += 1
+            for key in ('files', 'rows_moved', 'original_bytes', 'archive_bytes', 'removed_file_bytes',
+                        'cache_bytes'):
+                report[key] += case_report[key]
+        report['elapsed'] = time.perf_counter() - started
+        return report
+
+    def archive_case(self, case_id: int, remove_originals: bool = False) -> Optional[Dict]:
+        """归档一个卷宗
+
+        文件先完整写入归档再修改数据库，数据库提交后才删除原文件和缓存；
+        remove_originals 为 False 时保留原文件（文件由用户管理时），只回收缓存和热表空间。
+        """
+        report = {'files': 0, 'rows_moved': 0, 'original_bytes': 0, 'archive_bytes': 0,
+                  'removed_file_bytes': 0, 'cache_bytes': 0}
+        try:
+            cursor = self.db_manager.cursor
+            cursor.execute("SELECT archived_at FROM cases WHERE id = ?", (case_id,))
+            row = cursor.fetchone()
+            if not row or row[0] is not None:
+                # 不存在或已归档（部分文件已恢复时不重新打包，避免覆盖归档中的其余文件）
+                return None
+            cursor.execute("""
+                SELECT id, file_path, file_name FROM pdf_files
+                WHERE case_id = ? AND archive_path IS NULL
+                ORDER BY id
+            """, (case_id,))
+            files = cursor.fetchall()
+        except Exception as e:
+            print(f"读取卷宗文件失败: {e}")
+            return None
+
+        os.makedirs(self.archive_root, exist_ok=True)
+        archive_path = case_archive_path(case_id, self.archive_root)
+        part_path = archive_path + '.part'
+        members = {}
+        try:
+            with zipfile.ZipFile(part_path, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=6) as archive:
+                for file_id, file_path, file_name in files:
+                    if not os.path.exists(file_path):
+                        # 仍标记为已归档，恢复时移回其目录和批注
+                        print(f"归档时文件不存在，未打包: {file_path}")
+                        members[file_id] = (file_path, None)
+                        continue
+                    member = f"{file_id}_{file_name or os.path.basename(file_path)}"
+                    archive.write(file_path, member)
+                    members[file_id] = (file_path, member)
+                    report['original_bytes'] += os.path.getsize(file_path)
+            os.replace(part_path, archive_path)
+        except Exception as e:
+            print(f"打包卷宗文件失败: {e}")
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            return None
+
+        try:
+            now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            for table, archive_table, columns in MOVED_TABLES:
+                cursor.execute(f"""
+                    INSERT INTO {archive_table} ({columns})
+                    SELECT {columns} FROM {table} WHERE case_id = ?
+                """, (case_id,))
+                report['rows_moved'] += cursor.rowcount
+                cursor.execute(f"DELETE FROM {table} WHERE case_id = ?", (case_id,))
+            # 目录统计只汇总热表中的目录
+            refresh_directory_stats(cursor, case_id)
+            cursor.executemany("""
+                UPDATE pdf_files SET archive_path = ?, archive_member = ? WHERE id = ?
+            """, [(archive_path, member, file_id) for file_id, (_, member) in members.items()])
+            cursor.execute("UPDATE cases SET archived_at = ? WHERE id = ?", (now, case_id))
+            record_case_change(cursor, case_id, 'cases', case_id, 'archive')
+            self.db_manager.connection.commit()
+        except Exception as e:
+            print(f"归档卷宗失败: {e}")
+            self.db_manager.connection.rollback()
+            return None
+
+        report['files'] = sum(1 for _, member in members.values() if member)
+        report['archive_bytes'] = os.path.getsize(archive_path)
+        report['cache_bytes'] = remove_directory(case_cache_dir(case_id))
+        if remove_originals:
+            for file_path, member in members.values():
+                if member is None or self._is_referenced_elsewhere(file_path):
+                    continue
+                try:
+                    size = os.path.getsize(file_path)
+                    os.remove(file_path)
+                    report['removed_file_bytes'] += size
+                except OSError as e:
+                    print(f"删除已归档的原文件失败: {file_path}: {e}")
+        return report
+
+    def _is_referenced_elsewhere(self, file_path: str) -> bool:
+        """其他未归档的文件记录仍使用该路径时不删除原文件"""
+        cursor = self.db_manager.cursor
+        cursor.execute("""
+            SELECT 1 FROM pdf_files WHERE file_path = ? AND archive_path IS NULL LIMIT 1
+        """, (file_path,))
+        return cursor.fetchone() is not None
+
+    # ---------- 恢复 ----------
+
+    def rehydrate_file(self, pdf_file_id: int) -> Optional[str]:
+        """恢复一个已归档文件，返回可打开的文件路径（未归档时直接返回原路径）"""
+        started = time.perf_counter()
+        try:
+            cursor = self.db_manager.cursor
+            cursor.execute("""
+                SELECT case_id, file_path, archive_path, archive_member FROM pdf_files WHERE id = ?
+            """, (pdf_file_id,))
+            row = cursor.fetchone()
+        except Exception as e:
+            print(f"读取归档文件信息失败: {e}")
+            return None
+        if not row:
+            return None
+        case_id, file_path, archive_path, member = row
+        if archive_path is None:
+            return file_path
+
+        extracted = False
+        try:
+            if member and not os.path.exists(file_path):
+                # 原文件已删除，解压到恢复目录
+                restore_dir = case_restore_dir(case_id, self.archive_root)
+                os.makedirs(restore_dir, exist_ok=True)
+                with zipfile.ZipFile(archive_path) as archive:
+                    file_path = archive.extract(member, restore_dir)
+                extracted = True
+        except Exception as e:
+            print(f"解压归档文件失败: {e}")
+            return None
+
+        try:
+            now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            for table, archive_table, columns in MOVED_TABLES:
+                cursor.execute(f"""
+                    INSERT INTO {table} ({columns})
+                    SELECT {columns} FROM {archive_table} WHERE pdf_file_id = ?
+                """, (pdf_file_id,))
+                cursor.execute(f"DELETE FROM {archive_table} WHERE pdf_file_id = ?", (pdf_file_id,))
+            refresh_directory_stats(cursor, case_id, pdf_file_id)
+            cursor.execute("""
+                UPDATE pdf_files SET file_path = ?, archive_path = NULL, archive_member = NULL WHERE id = ?
+            """, (file_path, pdf_file_id))
+
+            cursor.execute("""
+                SELECT 1 FROM pdf_files WHERE case_id = ? AND archive_path IS NOT NULL LIMIT 1
+            """, (case_id,))
+            case_restored = cursor.fetchone() is None
+            # 恢复视为一次访问，避免下次归档立即再次归档
+            if case_restored:
+                cursor.execute("UPDATE cases SET archived_at = NULL, updated_at = ? WHERE id = ?",
+                               (now, case_id))
+            else:
+                cursor.execute("UPDATE cases SET updated_at = ? WHERE id = ?", (now, case_id))
+            record_case_change(cursor, case_id, 'pdf_directories', pdf_file_id)
+            self.db_manager.connection.commit()
+        except Exception as e:
+            print(f"恢复归档文件失败: {e}")
+            self.db_manager.connection.rollback()
+            return None
+
+        if case_restored and os.path.exists(archive_path):
+            os.remove(archive_path)
+        self.rehydrations.append({'pdf_file_id': pdf_file_id, 'extracted': extracted,
+                                  'seconds': time.perf_counter() - started})
+        return file_path
+
+    def get_rehydration_report(self) -> Dict:
+        """恢复耗时统计"""
+        latencies = sorted(item['seconds'] for item in self.rehydrations)
+        if not latencies:
+            return {'files': 0, 'extracted': 0, 'p50_ms': 0.0, 'max_ms': 0.0}
+        return {
+            'files': len(latencies),
+            'extracted': sum(1 for item in self.rehydrations if item['extracted']),
+            'p50_ms': latencies[len(latencies) // 2] * 1000,
+            'max_ms': latencies[-1] * 1000
+        }
+
+
+def format_archive_report(report: Dict) -> str:
+    """归档报告：磁盘占用按 删除的原文件 + 缓存 - 新增的归档文件 计算净变化"""
+    mb = 1024 * 1024
+    net = report['removed_file_bytes'] + report['cache_bytes'] - report['archive_bytes']
+    ratio = report['archive_bytes'] / report['original_bytes'] if report['original_bytes'] else 0
+    if net >= 0:
+        disk = f"磁盘净回收 {net / mb:.1f} MB"
+    else:
+        # 保留原文件时归档是额外的一份副本
+        disk = f"磁盘净增加 {-net / mb:.1f} MB（未删除原文件，归档为额外副本）"
+    return (f"归档 {report['cases']} 个卷宗、{report['files']} 个文件，移出热表 {report['rows_moved']} 行；"
+            f"归档大小 {report['archive_bytes'] / mb:.1f} MB（原文件的 {ratio:.0%}），"
+            f"删除原文件 {report['removed_file_bytes'] / mb:.1f} MB，清理缓存 {report['cache_bytes'] / mb:.1f} MB，"
+            f"{disk}，耗时 {report['elapsed']:.1f} 秒")
+
+
+def main():
+    from database_config_enhanced import LocalDatabaseManager
+
+    parser = argparse.ArgumentParser(description='归档不活跃卷宗')
+    parser.add_argument('--db', default='lawyer_assistant.db', help='SQLite数据库路径')
+    parser.add_argument('--days', type=int, default=DEFAULT_INACTIVE_DAYS, help='未更新超过该天数的卷宗')
+    parser.add_argument('--max-cases', type=int, help='本次最多归档的卷宗数')
+    parser.add_argument('--remove-originals', action='store_true', help='归档后删除原PDF文件')
+    parser.add_argument('--archive-root', default=ARCHIVE_ROOT, help='归档文件目录')
+    args = parser.parse_args()
+
+    db_manager = LocalDatabaseManager(args.db)
+    if not db_manager.connect():
+        return 1
+    try:
+        archiver = CaseArchiver(db_manager, args.archive_root)
+        report = archiver.archive_inactive(args.days, args.remove_originals, args.max_cases)
+        print(format_archive_report(report))
+        # 释放移出行占用的数据库页
+        db_manager.connection.execute("VACUUM")
+    finally:
+        db_manager.disconnect()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
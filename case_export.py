@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+卷宗合并导出
+按目录顺序将卷宗内各PDF的页面合并为一个PDF（用于向法院提交），书签按目录层级生成。
+页面通过PyMuPDF按页复制，不重新渲染；页码段按批拆分复制，每复制一批页面就增量保存到磁盘并
+重新打开输出文件，内存占用与卷宗总页数和单个文件的页数无关
+
+用法:
+    python case_export.py 12 卷宗合并.pdf --db lawyer_assistant.db
+"""
+
+import argparse
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import fitz  # PyMuPDF
+
+# 每复制多少页增量保存一次
+DEFAULT_CHUNK_PAGES = 300
+
+
+def export_order(pdf_files: List[Dict]) -> List[Dict]:
+    """文件的导出顺序：按上传时间，同一时间（批量导入）按文件ID"""
+    return sorted(pdf_files, key=lambda f: (str(f.get('upload_time') or ''), f['id']))
+
+
+def build_export_plan(pdf_files: List[Dict], directories: List[Dict]) -> List[Dict]:
+    """根据文件和目录生成导出计划
+
+    pdf_files 按导出顺序排列（页数取自 page_count）；directories 为 get_pdf_directories 的结果，
+    page 从1开始。每个文件按其一级目录切分为若干页码段（page_number..end_page，end_page 为下一个
+    同级或更高级目录的前一页），目录之前的页面并入第一段，没有目录的文件整体导出。
+    """
+    by_file: Dict[int, List[Dict]] = {}
+    for directory in directories:
+        by_file.setdefault(directory.get('pdf_file_id'), []).append(directory)
+
+    plan = []
+    for file_info in pdf_files:
+        page_count = file_info.get('page_count') or 0
+        entries = sorted(by_file.get(file_info['id'], []),
+                         key=lambda d: (d.get('page') or 1, d.get('level') or 1))
+        entries = [dict(entry, page=max(entry.get('page') or 1, 1)) for entry in entries]
+        if page_count:
+            entries = [dict(entry, page=min(entry['page'], page_count)) for entry in entries]
+
+        # 每个目录的结束页：之后第一个层级不低于它的目录的前一页
+        for position, entry in enumerate(entries):
+            end_page = page_count or None
+            for following in entries[position + 1:]:
+                if (following.get('level') or 1) <= (entry.get('level') or 1):
+                    end_page = max(following['page'] - 1, entry['page'])
+                    break
+            entry['end_page'] = end_page
+
+        top_level = min((entry.get('level') or 1 for entry in entries), default=1)
+        ranges = []
+        for entry in entries:
+            if (entry.get('level') or 1) != top_level:
+                continue
+            if not ranges:
+                ranges.append((1, entry['end_page']))
+            elif entry['page'] == ranges[-1][1] + 1:
+                # 相邻段合并为一次复制
+                ranges[-1] = (ranges[-1][0], entry['end_page'])
+            elif entry['page'] > ranges[-1][1]:
+                ranges.append((entry['page'], entry['end_page']))
+        if not ranges:
+            # 页数未知（为0）时复制到源文件末页
+            ranges = [(1, page_count or None)]
+
+        plan.append({
+            'pdf_file_id': file_info['id'],
+            'file_path': file_info['file_path'],
+            'file_name': file_info.get('file_name') or os.path.basename(file_info['file_path']),
+            'page_count': page_count,
+            'ranges': ranges,
+            'directories': entries
+        })
+    return plan
+
+
+class CaseBundleExporter:
+    """按导出计划流式写出合并PDF
+
+    on_progress(done_pages, total_pages, file_name) 在导出线程中调用，界面需自行转到主线程。
+    """
+
+    def __init__(self, plan: List[Dict], output_path: str, chunk_pages: int = DEFAULT_CHUNK_PAGES,
+                 on_progress: Optional[Callable] = None, title: str = None):
+        self.plan = plan
+        self.output_path = output_path
+        self.chunk_pages = chunk_pages
+        self.on_progress = on_progress
+        self.title = title
+        # 页数未知的段按导出时的实际页数补入总数
+        self.total_pages = sum(end - start + 1 for item in plan for start, end in item['ranges'] if end)
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        """取消导出（当前一批页面复制完后停止，不保留半成品）"""
+        self._cancel_event.set()
+
+    def export(self) -> Dict:
+        """执行导出，返回统计信息；失败或取消时 success 为 False"""
+        started = time.perf_counter()
+        part_path = self.output_path + '.part'
+        report = {'success': False, 'output_path': self.output_path, 'files': 0, 'pages': 0,
+                  'bookmarks': 0, 'skipped_files': [], 'elapsed': 0.0, 'output_size': 0}
+        toc = []
+        output = fitz.open()
+        written_once = False
+        pending_pages = 0
+
+        try:
+            for item in self.plan:
+                if self._cancel_event.is_set():
+                    break
+                if not item['ranges']:
+                    continue
+                try:
+                    source = fitz.open(item['file_path'])
+                except Exception as e:
+                    print(f"打开文件失败，已跳过: {item['file_path']}: {e}")
+                    report['skipped_files'].append(item['file_name'])
+                    continue
+
+                with source:
+                    # 源文件页码 -> 输出页码（均从1开始），用于书签定位
+                    page_map = {}
+                    file_start = output.page_count + 1
+                    for start, end in item['ranges']:
+                        if end is None:
+                            end = source.page_count
+                            self.total_pages += max(end - start + 1, 0)
+                        end = min(end, source.page_count)
+                        if start > end:
+                            continue
+                        # 按批拆分后再复制，单个大文件也不会整体读入内存
+                        slice_start = start
+                        while slice_start <= end and not self._cancel_event.is_set():
+                            slice_end = min(end, slice_start + max(self.chunk_pages - pending_pages, 1) - 1)
+                            first_output_page = output.page_count + 1
+                            output.insert_pdf(source, from_page=slice_start - 1, to_page=slice_end - 1)
+                            for offset in range(slice_end - slice_start + 1):
+                                page_map[slice_start + offset] = first_output_page + offset
+                            copied = slice_end - slice_start + 1
+                            report['pages'] += copied
+                            pending_pages += copied
+                            if self.on_progress:
+                                self.on_progress(report['pages'], self.total_pages, item['file_name'])
+                            if pending_pages >= self.chunk_pages:
+                                output, written_once = self._save_chunk(output, part_path, written_once)
+                                pending_pages = 0
+                            slice_start = slice_end + 1
+
+                if not page_map:
+                    continue
+                report['files'] += 1
+                toc.extend(_bookmarks_for(item, page_map, file_start))
+
+            if self._cancel_event.is_set():
+                print("卷宗导出已取消")
+                return report
+
+            output.set_toc(toc)
+            if self.title:
+                output.set_metadata(dict(output.metadata or {}, title=self.title))
+            output, written_once = self._save_chunk(output, part_path, written_once)
+            output.close()
+            output = None
+            os.replace(part_path, self.output_path)
+
+            report.update(success=True, bookmarks=len(toc),
+                          output_size=os.path.getsize(self.output_path))
+            return report
+
+        except Exception as e:
+            print(f"导出卷宗失败: {e}")
+            return report
+        finally:
+            if output is not None:
+                output.close()
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            report['elapsed'] = time.perf_counter() - started
+
+    @staticmethod
+    def _save_chunk(output, part_path: str, written_once: bool):
+        """将已复制的页面写入磁盘并重新打开，释放内存中的页面对象"""
+        if written_once:
+            output.saveIncr()
+        else:
+            output.save(part_path)
+        output.close()
+        return fitz.open(part_path), True
+
+
+def _bookmarks_for(item: Dict, page_map: Dict[int, int], file_start: int) -> List[List]:
+    """文件书签为一级，文件内目录依次降一级；层级不连续时收紧为上一级+1（PyMuPDF要求）"""
+    bookmarks = [[1, item['file_name'], file_start]]
+    previous_level = 1
+    base_level = min((entry.get('level') or 1 for entry in item['directories']), default=1)
+    for entry in item['directories']:
+        output_page = page_map.get(entry['page'])
+        if output_page is None:
+            continue
+        level = min((entry.get('level') or 1) - base_level + 2, previous_level + 1)
+        bookmarks.append([level, entry.get('title') or '', output_page])
+        previous_level = level
+    return bookmarks
+
+
+def export_case_bundle(pdf_file_manager, directory_manager, case_id: int, output_path: str,
+                       chunk_pages: int = DEFAULT_CHUNK_PAGES, on_progress: Callable = None,
+                       title: str = None, archiver=None) -> Dict:
+    """导出卷宗：文件按上传顺序，文件内按目录顺序
+
+    archiver 为 CaseArchiver 时先恢复已归档的文件（目录记录移回热表后才能生成书签）。
+    """
+    pdf_files = export_order(pdf_file_manager.get_pdf_files_by_case(case_id))
+    if archiver:
+        for file_info in pdf_files:
+            if file_info.get('archived'):
+                file_info['file_path'] = archiver.rehydrate_file(file_info['id']) or file_info['file_path']
+    directories = directory_manager.get_pdf_directories(case_id)
+    plan = build_export_plan(pdf_files, directories)
+    return CaseBundleExporter(plan, output_path, chunk_pages=chunk_pages,
+                              on_progress=on_progress, title=title).export()
+
+
+def main():
+    from case_archive import CaseArchiver
+    from database_config_enhanced import LocalDatabaseManager, PDFFileManager, EnhancedDirectoryManager
+
+    parser = argparse.ArgumentParser(description='按目录顺序将卷宗合并导出为一个PDF')
+    parser.add_argument('case_id', type=int, help='卷宗ID')
+    parser.add_argument('output', help='输出PDF路径')
+    parser.add_argument('--db', default='lawyer_assistant.db', help='SQLite数据库路径')
+    parser.add_argument('--chunk-pages', type=int, default=DEFAULT_CHUNK_PAGES,
+                        help='每复制多少页增量保存一次')
+    args = parser.parse_args()
+
+    db_manager = LocalDatabaseManager(args.db)
+    if not db_manager.connect():
+        return 1
+
+    last_printed = [0.0]
+
+    def print_progress(done, total, file_name):
+        now = time.perf_counter()
+        if now - last_printed[0] >= 1 or done == total:
+            last_printed[0] = now
+            print(f"\r已复制 {done}/{total} 页  {file_name}", end='', flush=True)
+
+    try:
+        report = export_case_bundle(PDFFileManager(db_manager), EnhancedDirectoryManager(db_manager),
+                                    args.case_id, args.output, chunk_pages=args.chunk_pages,
+                                    on_progress=print_progress, archiver=CaseArchiver(db_manager))
+    finally:
+        db_manager.disconnect()
+
+    print()
+    if not report['success']:
+        return 1
+    print(f"导出完成: {report['files']} 个文件，{report['pages']} 页，{report['bookmarks']} 个书签，"
+          f"{report['output_size'] / 1024 / 1024:.1f} MB，耗时 {report['elapsed']:.1f} 秒")
+    if report['skipped_files']:
+        print("跳过的文件: " + ', '.join(report['skipped_files']))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
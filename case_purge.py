@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+已删除卷宗的后台清理
+CaseManager.delete_case只做软删除（status='deleted'），本任务在后台分批物理删除这些卷宗的
+目录、文件记录、本地缓存和归档文件，每批单独提交以避免长时间持有锁，并报告回收的行数和字节数；
+同时清理过期的变更日志，避免change_log无限增长
+"""
+
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List
+
+from cache_paths import case_cache_dir, remove_directory
+from case_archive import ARCHIVE_ROOT, remove_case_archive
+
+# 每批删除的行数
+DEFAULT_CHUNK_SIZE = 500
+# 批次之间的停顿（秒），让前台查询有机会获得锁
+DEFAULT_CHUNK_PAUSE = 0.05
+# 后台任务默认间隔（秒）
+DEFAULT_INTERVAL = 6 * 3600
+# 变更日志保留天数（客户端只需要离线期间的变更，版本号保存在case_versions中不受影响）
+DEFAULT_CHANGE_LOG_DAYS = 30
+
+# 按依赖顺序删除的子表
+CHILD_TABLES = ('pdf_annotations', 'pdf_directories', 'archived_pdf_annotations', 'archived_pdf_directories',
+                'pdf_directory_stats', 'pdf_files', 'case_directories', 'change_log', 'case_versions')
+
+
+def remove_case_storage(case_id: int, archive_root: str = ARCHIVE_ROOT) -> int:
+    """删除卷宗的本地缓存、归档文件和解压恢复的文件，返回释放的字节数"""
+    return remove_directory(case_cache_dir(case_id)) + remove_case_archive(case_id, archive_root)
+
+
+class CasePurgeJob:
+    """分批清理软删除卷宗
+
+    db_factory() 返回已连接的数据库管理器（DatabaseManager或LocalDatabaseManager），
+    任务在自己的线程中使用独立连接。
+    """
+
+    def __init__(self, db_factory: Callable, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 chunk_pause: float = DEFAULT_CHUNK_PAUSE, archive_root: str = ARCHIVE_ROOT,
+                 change_log_days: int = DEFAULT_CHANGE_LOG_DAYS):
+        self.db_factory = db_factory
+        self.archive_root = archive_root
+        self.change_log_days = change_log_days
+        self.chunk_size = chunk_size
+        self.chunk_pause = chunk_pause
+        self.last_report = None
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self, interval: float = DEFAULT_INTERVAL, initial_delay: float = 60):
+        """启动后台定期清理"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval, initial_delay),
+                                        name='case-purge', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5):
+        """停止后台清理（当前批次完成后退出）"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def purge_once(self, max_cases: int = None) -> Dict:
+        """清理一轮，返回回收报告"""
+        report = {
+            'cases': 0,
+            'rows': {table: 0 for table in CHILD_TABLES + ('cases',)},
+            'expired_changes': 0,
+            'cache_bytes': 0,
+            'db_bytes': 0,
+            'elapsed': 0.0
+        }
+        started = time.perf_counter()
+
+        db = self.db_factory()
+        if db is None or db.connection is None:
+            print("清理已删除卷宗失败: 无法连接数据库")
+            return report
+
+        try:
+            purger = _ChunkedPurger(db.connection, self.chunk_size, self.chunk_pause, self._stop_event)
+            free_before = purger.free_bytes()
+            blob_candidates = set()
+
+            for case_id in purger.deleted_case_ids(max_cases):
+                if self._stop_event.is_set():
+                    break
+                blob_candidates.update(purger.case_content_hashes(case_id))
+                for table in CHILD_TABLES:
+                    report['rows'][table] += purger.delete_rows(table, 'case_id', case_id)
+                if self._stop_event.is_set():
+                    # 子表未清理完，保留卷宗记录等待下次继续
+                    break
+                report['rows']['cases'] += purger.delete_rows('cases', 'id', case_id)
+                report['cache_bytes'] += remove_case_storage(case_id, self.archive_root)
+                report['cases'] += 1
+
+            # 不再被任何文件引用的共享内容及其缩略图
+            for content_hash, thumbnail_dir in purger.orphan_blobs(blob_candidates):
+                report['cache_bytes'] += remove_directory(thumbnail_dir)
+                purger.delete_rows('pdf_page_fingerprints', 'content_hash', content_hash)
+                purger.delete_rows('pdf_table_toc', 'content_hash', content_hash)
+                purger.delete_rows('pdf_blobs', 'content_hash', content_hash)
+
+            if not self._stop_event.is_set():
+                cutoff = (datetime.now() - timedelta(days=self.change_log_days)).strftime('%Y-%m-%d %H:%M:%S')
+                report['expired_changes'] = purger.delete_expired_changes(cutoff)
+
+            report['db_bytes'] = max(0, purger.free_bytes() - free_before)
+
+        except Exception as e:
+            print(f"清理已删除卷宗失败: {e}")
+            db.connection.rollback()
+        finally:
+            db.disconnect()
+
+        report['elapsed'] = time.perf_counter() - started
+        self.last_report = report
+        if report['cases']:
+            print(f"✓ 已清理 {report['cases']} 个已删除卷宗，删除 {sum(report['rows'].values())} 行，"
+                  f"释放缓存和归档 {report['cache_bytes'] / 1024 / 1024:.1f} MB")
+        if report['expired_changes']:
+            print(f"✓ 已清理 {report['expired_changes']} 条过期变更日志")
+        return report
+
+    def _run(self, interval: float, initial_delay: float):
+        if self._stop_event.wait(initial_delay):
+            return
+        while not self._stop_event.is_set():
+            self.purge_once()
+            if self._stop_event.wait(interval):
+                return
+
+
+class _ChunkedPurger:
+    """按批删除行，兼容SQLite和MySQL"""
+
+    def __init__(self, connection, chunk_size: int, chunk_pause: float, stop_event: threading.Event):
+        self.connection = connection
+        self.chunk_size = chunk_size
+        self.chunk_pause = chunk_pause
+        self.stop_event = stop_event
+        self.is_sqlite = isinstance(connection, sqlite3.Connection)
+        self.placeholder = '?' if self.is_sqlite else '%s'
+
+    def _query(self, sql: str, params=()) -> List:
+        cursor = self.connection.cursor()
+        cursor.execute(sql.replace('?', self.placeholder), params)
+        rows = cursor.fetchall()
+        cursor.close()
+        return rows
+
+    def deleted_case_ids(self, limit: int = None) -> List[int]:
+        sql = "SELECT id FROM cases WHERE status = 'deleted' ORDER BY id"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        return [row[0] for row in self._query(sql)]
+
+    def case_content_hashes(self, case_id: int) -> List[str]:
+        rows = self._query("""
+            SELECT DISTINCT content_hash FROM pdf_files
+            WHERE case_id = ? AND content_hash IS NOT NULL
+        """, (case_id,))
+        return [row[0] for row in rows]
+
+    def orphan_blobs(self, content_hashes) -> List:
+        orphans = []
+        for content_hash in content_hashes:
+            rows = self._query("SELECT 1 FROM pdf_files WHERE content_hash = ? LIMIT 1", (content_hash,))
+            if not rows:
+                blob = self._query("SELECT thumbnail_dir FROM pdf_blobs WHERE content_hash = ?", (content_hash,))
+                orphans.append((content_hash, blob[0][0] if blob else None))
+        return orphans
+
+    def delete_rows(self, table: str, column: str, value) -> int:
+        """分批删除 table 中 column = value 的行，每批单独提交"""
+        return self._delete_chunked(table, f"{column} = ?", value)
+
+    def delete_expired_changes(self, cutoff: str) -> int:
+        """分批删除 cutoff 之前的变更日志（按 idx_change_log_time 范围查找）"""
+        return self._delete_chunked('change_log', "changed_at < ?", cutoff)
+
+    def _delete_chunked(self, table: str, condition: str, value) -> int:
+        condition = condition.replace('?', self.placeholder)
+        if self.is_sqlite:
+            sql = f"""
+                DELETE FROM {table} WHERE rowid IN (
+                    SELECT rowid FROM {table} WHERE {condition} LIMIT {self.chunk_size}
+                )
+            """
+        else:
+            sql = f"DELETE FROM {table} WHERE {condition} LIMIT {self.chunk_size}"
+
+        total = 0
+        while True:
+            cursor = self.connection.cursor()
+            cursor.execute(sql, (value,))
+            deleted = cursor.rowcount
+            cursor.close()
+            self.connection.commit()
+            total += max(deleted, 0)
+            if deleted < self.chunk_size or self.stop_event.is_set():
+                return total
+            time.sleep(self.chunk_pause)
+
+    def free_bytes(self) -> int:
+        """数据库内可复用的空闲空间（仅SQLite可统计）"""
+        if not self.is_sqlite:
+            return 0
+        page_size = self._query("PRAGMA page_size")[0][0]
+        free_pages = self._query("PRAGMA freelist_count")[0][0]
+        return page_size * free_pages
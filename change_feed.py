@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+卷宗变更订阅
+客户端定期按"上次看到的版本号"查询change_log，只取回变更过的记录，
+并通知订阅者精确失效对应的缓存，而不是整体重新加载。
+变更日志由 database_config_enhanced 中的管理器在写入的同一事务中记录，轮询读取同一个数据库；
+database_config 中的管理器（卷宗目录 case_directories 等）不记录变更
+"""
+
+from collections import defaultdict
+from typing import Callable, Dict, List, Set
+
+# 默认轮询间隔（毫秒）
+DEFAULT_POLL_INTERVAL_MS = 3000
+
+
+class ChangeFeedPoller:
+    """基于Tk事件循环的变更轮询器
+
+    订阅者签名: callback(case_id, row_key, operation)；
+    row_key为None表示该表在卷宗范围内整体变更（例如清空整个卷宗的目录）。
+    """
+
+    def __init__(self, root, change_feed_manager, interval_ms: int = DEFAULT_POLL_INTERVAL_MS):
+        self.root = root
+        self.change_feed_manager = change_feed_manager
+        self.interval_ms = interval_ms
+        self.versions: Dict[int, int] = {}  # 关注的卷宗 -> 已看到的版本号
+        self._own_versions: Dict[int, Set[int]] = defaultdict(set)  # 本客户端写入、尚未轮询到的版本号
+        self._subscribers: Dict[str, List[Callable]] = defaultdict(list)
+        self._poll_job = None
+
+    def subscribe(self, table_name: str, callback: Callable):
+        """订阅某张表的变更"""
+        self._subscribers[table_name].append(callback)
+
+    def watch(self, case_id: int, version: int = None):
+        """开始关注卷宗变更（默认从当前版本开始，不回放历史）"""
+        if version is None:
+            version = self.change_feed_manager.get_case_version(case_id)
+        self.versions[case_id] = version
+        self._schedule()
+
+    def unwatch(self, case_id: int):
+        """停止关注卷宗"""
+        self.versions.pop(case_id, None)
+        self._own_versions.pop(case_id, None)
+
+    def mark_seen(self, case_id: int, version: int):
+        """本客户端自己的写入无需再处理
+
+        紧接已看到版本的写入直接推进版本号；中间夹有其他客户端的变更时先记下，
+        轮询时跳过这些版本，其他客户端的变更照常通知。
+        """
+        if case_id not in self.versions or version is None or version <= self.versions[case_id]:
+            return
+        if version == self.versions[case_id] + 1:
+            self.versions[case_id] = version
+        else:
+            self._own_versions[case_id].add(version)
+
+    def stop(self):
+        """停止轮询"""
+        if self._poll_job:
+            self.root.after_cancel(self._poll_job)
+            self._poll_job = None
+
+    def poll_now(self) -> int:
+        """立即检查一次变更，返回处理的变更条数"""
+        handled = 0
+        for case_id, version in list(self.versions.items()):
+            changes = self.change_feed_manager.get_changes_since(case_id, version)
+            if not changes:
+                continue
+            own_versions = self._own_versions.get(case_id, set())
+            # 同一记录的多次变更只通知一次
+            latest = {}
+            for change in changes:
+                if change['version'] not in own_versions:
+                    latest[(change['table_name'], change['row_key'])] = change
+            for (table_name, row_key), change in latest.items():
+                for callback in self._subscribers.get(table_name, []):
+                    try:
+                        callback(case_id, row_key, change['operation'])
+                    except Exception as e:
+                        print(f"处理卷宗变更失败: {e}")
+            if case_id in self.versions:
+                self.versions[case_id] = changes[-1]['version']
+                if own_versions:
+                    self._own_versions[case_id] = {v for v in own_versions if v > changes[-1]['version']}
+            handled += len(changes)
+        return handled
+
+    def _schedule(self):
+        if self._poll_job is None and self.versions:
+            self._poll_job = self.root.after(self.interval_ms, self._poll)
+
+    def _poll(self):
+        self._poll_job = None
+        self.poll_now()
+        self._schedule()
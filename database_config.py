@@ -4,6 +4,7 @@ from mysql.connector import Error
 import hashlib
 import secrets
 from datetime import datetime, timedelta
+from database_schema import apply_migrations, get_schema_version, SCHEMA_VERSION, BACKEND_MYSQL
 
 class DatabaseConfig:
     """数据库配置类"""
@@ -45,8 +46,18 @@ class DatabaseManager:
     def connect(self):
         """连接数据库"""
         self.connection = DatabaseConfig.get_connection()
+        if self.connection is not None:
+            self.ensure_schema()
         return self.connection is not None
     
+    def ensure_schema(self):
+        """确保数据库结构和索引为最新版本"""
+        try:
+            if get_schema_version(self.connection, BACKEND_MYSQL) < SCHEMA_VERSION:
+                apply_migrations(self.connection, BACKEND_MYSQL)
+        except Error as e:
+            print(f"数据库结构检查错误: {e}")
+    
     def disconnect(self):
         """断开数据库连接"""
         if self.connection:
@@ -96,8 +107,9 @@ class DatabaseManager:
 class UserManager:
     """用户管理类"""
     
-    def __init__(self, db_manager):
+    def __init__(self, db_manager, write_behind=None):
         self.db = db_manager
+        self.write_behind = write_behind  # 可选的后写队列（WriteBehindQueue），用于非关键写入
     
     @staticmethod
     def hash_password(password):
@@ -127,10 +139,24 @@ class UserManager:
         return None
     
     def update_last_login(self, user_id):
-        """更新最后登录时间"""
+        """更新最后登录时间（配置了后写队列时异步写入）"""
+        if self.write_behind:
+            self.write_behind.record_login(user_id)
+            return
         query = "UPDATE users SET last_login = %s WHERE id = %s"
         self.db.execute_update(query, (datetime.now(), user_id))
     
+    def log_operation(self, user_id, action, target_type=None, target_id=None, details=None):
+        """记录操作日志（配置了后写队列时异步写入）"""
+        if self.write_behind:
+            self.write_behind.log_operation(user_id, action, target_type, target_id, details)
+            return
+        query = """
+            INSERT INTO operation_logs (user_id, action, target_type, target_id, details, created_at)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """
+        self.db.execute_insert(query, (user_id, action, target_type, target_id, details, datetime.now()))
+    
     def create_session(self, user_id):
         """创建用户会话"""
         token = self.generate_session_token()
@@ -1,14 +1,107 @@
 import sqlite3
 import os
-from datetime import datetime
+import hashlib
+from datetime import datetime, timedelta
 import json
 from typing import List, Dict, Optional, Tuple
 
+from database_schema import (apply_migrations, BACKEND_SQLITE, outline_paths, outline_path_upper,
+                             outline_ancestor_paths)
+
+# 流式计算文件哈希时每次读取的字节数
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def compute_file_hash(file_path: str, chunk_size: int = HASH_CHUNK_SIZE) -> Optional[str]:
+    """流式读取文件并计算内容哈希（SHA-256），避免一次性读入大文件"""
+    try:
+        hasher = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                hasher.update(chunk)
+        return hasher.hexdigest()
+        
+    except Exception as e:
+        print(f"计算文件哈希失败: {e}")
+        return None
+
+def refresh_directory_stats(cursor, case_id: int, pdf_file_id: int = None):
+    """重算目录统计汇总（不提交事务，与目录写入处于同一事务中）
+    
+    指定pdf_file_id时只重算该文件，否则重算整个卷宗。
+    """
+    if pdf_file_id is not None:
+        cursor.execute("""
+            DELETE FROM pdf_directory_stats WHERE case_id = ? AND pdf_file_id = ?
+        """, (case_id, pdf_file_id))
+        cursor.execute("""
+            INSERT INTO pdf_directory_stats (case_id, pdf_file_id, level, entry_count)
+            SELECT case_id, pdf_file_id, level, COUNT(*)
+            FROM pdf_directories
+            WHERE case_id = ? AND pdf_file_id = ?
+            GROUP BY case_id, pdf_file_id, level
+        """, (case_id, pdf_file_id))
+    else:
+        cursor.execute("DELETE FROM pdf_directory_stats WHERE case_id = ?", (case_id,))
+        cursor.execute("""
+            INSERT INTO pdf_directory_stats (case_id, pdf_file_id, level, entry_count)
+            SELECT case_id, pdf_file_id, level, COUNT(*)
+            FROM pdf_directories
+            WHERE case_id = ?
+            GROUP BY case_id, pdf_file_id, level
+        """, (case_id,))
+
+def record_case_change(cursor, case_id: int, table_name: str, row_key: int = None,
+                       operation: str = 'update') -> int:
+    """递增卷宗版本并写入变更日志（不提交事务，与数据写入处于同一事务中）"""
+    cursor.execute("INSERT OR IGNORE INTO case_versions (case_id, version) VALUES (?, 0)", (case_id,))
+    cursor.execute("UPDATE case_versions SET version = version + 1 WHERE case_id = ?", (case_id,))
+    cursor.execute("SELECT version FROM case_versions WHERE case_id = ?", (case_id,))
+    version = cursor.fetchone()[0]
+    cursor.execute("""
+        INSERT INTO change_log (case_id, version, table_name, row_key, operation, changed_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, (case_id, version, table_name, row_key, operation,
+          datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+    return version
+
+class LocalDatabaseManager:
+    """本地SQLite数据库管理器，供增强版管理器使用"""
+    
+    def __init__(self, db_path: str = 'lawyer_assistant.db'):
+        self.db_path = db_path
+        self.connection = None
+        self.cursor = None
+    
+    def connect(self) -> bool:
+        """连接数据库并执行未应用的结构迁移"""
+        try:
+            self.connection = sqlite3.connect(self.db_path)
+            self.connection.execute("PRAGMA foreign_keys = ON")
+            apply_migrations(self.connection, BACKEND_SQLITE)
+            self.cursor = self.connection.cursor()
+            return True
+            
+        except Exception as e:
+            print(f"本地数据库连接错误: {e}")
+            self.connection = None
+            return False
+    
+    def disconnect(self):
+        """断开数据库连接"""
+        if self.connection:
+            self.connection.close()
+            self.connection = None
+            self.cursor = None
+
 class EnhancedCaseManager:
     """增强版案件管理器"""
     
     def __init__(self, db_manager):
         self.db_manager = db_manager
+        self._cascaded_tables = None  # 随卷宗级联删除的子表（首次删除时检测）
+        self.last_change_version = None  # 最近一次写入后的卷宗版本号
+        self.last_delete_report = None  # 最近一次删除卷宗回收的行数和字节数
         
     def get_all_cases(self) -> List[Dict]:
         """获取所有案件列表"""
@@ -17,7 +110,7 @@ class EnhancedCaseManager:
             cursor.execute("""
                 SELECT id, case_name, case_number, case_type, 
                        client_name, opposing_party, case_status, 
-                       created_at, updated_at, description
+                       created_at, updated_at, description, archived_at
                 FROM cases 
                 ORDER BY updated_at DESC
             """)
@@ -34,7 +127,8 @@ class EnhancedCaseManager:
                     'case_status': row[6],
                     'created_at': row[7],
                     'updated_at': row[8],
-                    'description': row[9]
+                    'description': row[9],
+                    'archived_at': row[10]
                 }
                 cases.append(case)
             
@@ -51,7 +145,7 @@ class EnhancedCaseManager:
             cursor.execute("""
                 SELECT id, case_name, case_number, case_type, 
                        client_name, opposing_party, case_status, 
-                       created_at, updated_at, description
+                       created_at, updated_at, description, archived_at
                 FROM cases 
                 WHERE id = ?
             """, (case_id,))
@@ -68,7 +162,8 @@ class EnhancedCaseManager:
                     'case_status': row[6],
                     'created_at': row[7],
                     'updated_at': row[8],
-                    'description': row[9]
+                    'description': row[9],
+                    'archived_at': row[10]
                 }
             return None
             
@@ -130,36 +225,77 @@ class EnhancedCaseManager:
                 case_data.get('description', ''),
                 case_id
             ))
+            updated = cursor.rowcount > 0
+            
+            if updated:
+                self.last_change_version = record_case_change(cursor, case_id, 'cases', case_id)
             
             self.db_manager.connection.commit()
-            return cursor.rowcount > 0
+            return updated
             
         except Exception as e:
             print(f"更新案件失败: {e}")
             self.db_manager.connection.rollback()
             return False
     
-    def delete_case(self, case_id: int) -> bool:
-        """删除案件"""
+    def _cascading_tables(self, tables) -> set:
+        """tables 中通过ON DELETE CASCADE随卷宗删除的表（外键未启用时为空）"""
+        if self._cascaded_tables is None:
+            cursor = self.db_manager.cursor
+            cursor.execute("PRAGMA foreign_keys")
+            row = cursor.fetchone()
+            cascaded = set()
+            if row and row[0]:
+                for table in tables:
+                    cursor.execute(f"PRAGMA foreign_key_list({table})")
+                    # (id, seq, table, from, to, on_update, on_delete, match)
+                    if any(fk[2] == 'cases' and fk[6] == 'CASCADE' for fk in cursor.fetchall()):
+                        cascaded.add(table)
+            self._cascaded_tables = cascaded
+        return self._cascaded_tables
+    
+    def delete_case(self, case_id: int, remove_storage: bool = True) -> bool:
+        """删除案件及其全部关联数据
+        
+        子表与后台清理任务相同（case_purge.CHILD_TABLES）：外键级联可用的表由数据库随卷宗记录删除
+        （只统计行数），其余子表逐表删除，全部在一个事务中完成。提交后删除本地缓存和归档文件，
+        回收的行数和字节数记录在 last_delete_report 中。
+        """
+        from case_purge import CHILD_TABLES, remove_case_storage
+        
+        report = {'rows': {}, 'cache_bytes': 0}
         try:
             cursor = self.db_manager.cursor
+            cascaded = self._cascading_tables(CHILD_TABLES)
             
-            # 先删除相关的PDF文件记录
-            cursor.execute("DELETE FROM pdf_files WHERE case_id = ?", (case_id,))
-            
-            # 删除相关的目录记录
-            cursor.execute("DELETE FROM pdf_directories WHERE case_id = ?", (case_id,))
+            for table in CHILD_TABLES:
+                if table in cascaded:
+                    cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE case_id = ?", (case_id,))
+                    report['rows'][table] = cursor.fetchone()[0]
+                else:
+                    cursor.execute(f"DELETE FROM {table} WHERE case_id = ?", (case_id,))
+                    report['rows'][table] = max(cursor.rowcount, 0)
             
             # 删除案件记录
             cursor.execute("DELETE FROM cases WHERE id = ?", (case_id,))
+            deleted = cursor.rowcount > 0
+            report['rows']['cases'] = max(cursor.rowcount, 0)
             
             self.db_manager.connection.commit()
-            return cursor.rowcount > 0
             
         except Exception as e:
             print(f"删除案件失败: {e}")
             self.db_manager.connection.rollback()
             return False
+        
+        if not deleted:
+            return False
+        if remove_storage:
+            report['cache_bytes'] = remove_case_storage(case_id)
+        self.last_delete_report = report
+        print(f"✓ 已删除卷宗 {case_id}，删除 {sum(report['rows'].values())} 行，"
+              f"释放缓存和归档 {report['cache_bytes'] / 1024 / 1024:.1f} MB")
+        return True
 
 class PDFFileManager:
     """PDF文件管理器"""
@@ -168,26 +304,229 @@ class PDFFileManager:
         self.db_manager = db_manager
     
     def add_pdf_file(self, case_id: int, file_path: str, file_name: str, 
-                     file_size: int = 0, page_count: int = 0) -> Optional[int]:
-        """添加PDF文件记录"""
+                     file_size: int = 0, page_count: int = 0,
+                     content_hash: str = None) -> Optional[int]:
+        """添加PDF文件记录
+        
+        按内容哈希登记到pdf_blobs，相同内容的文件沿用已知的页数，并直接复用已有的目录记录。
+        pdf_blobs中的文本、OCR和缩略图字段由提取方通过update_pdf_blob写入后按内容共享。
+        """
         try:
-            cursor = self.db_manager.cursor
-            now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            file_id = self._insert_pdf_file(case_id, file_path, file_name,
+                                            file_size, page_count, content_hash)
+            self.db_manager.connection.commit()
+            return file_id
+            
+        except Exception as e:
+            print(f"添加PDF文件记录失败: {e}")
+            self.db_manager.connection.rollback()
+            return None
+    
+    def add_pdf_files(self, case_id: int, files: List[Dict], commit: bool = True) -> List[int]:
+        """批量添加PDF文件记录，整批在一个事务中提交
+        
+        files中每项包含file_path、file_name，可选file_size、page_count、content_hash；
+        返回与files顺序一致的文件ID列表，失败时整批回滚并返回空列表。
+        commit为False时不提交，由调用方随后续写入（如目录）一起提交或回滚。
+        """
+        try:
+            file_ids = []
+            for file_info in files:
+                file_ids.append(self._insert_pdf_file(
+                    case_id,
+                    file_info['file_path'],
+                    file_info.get('file_name') or os.path.basename(file_info['file_path']),
+                    file_info.get('file_size', 0),
+                    file_info.get('page_count', 0),
+                    file_info.get('content_hash')
+                ))
+            
+            if commit:
+                self.db_manager.connection.commit()
+            return file_ids
             
+        except Exception as e:
+            print(f"批量添加PDF文件记录失败: {e}")
+            self.db_manager.connection.rollback()
+            return []
+    
+    def _insert_pdf_file(self, case_id: int, file_path: str, file_name: str,
+                         file_size: int, page_count: int, content_hash: Optional[str]) -> int:
+        """插入文件记录并登记共享内容（不提交事务）"""
+        if content_hash is None and os.path.exists(file_path):
+            content_hash = compute_file_hash(file_path)
+        if not file_size and os.path.exists(file_path):
+            file_size = os.path.getsize(file_path)
+        
+        cursor = self.db_manager.cursor
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        
+        if content_hash:
+            blob = self.get_pdf_blob(content_hash)
+            if blob:
+                # 已有相同内容，沿用已知的页数
+                page_count = page_count or blob['page_count']
+            else:
+                cursor.execute("""
+                    INSERT INTO pdf_blobs (
+                        content_hash, file_size, page_count, created_at, updated_at
+                    ) VALUES (?, ?, ?, ?, ?)
+                """, (content_hash, file_size, page_count, now, now))
+        
+        cursor.execute("""
+            INSERT INTO pdf_files (
+                case_id, file_path, file_name, file_size, 
+                page_count, upload_time, content_hash
+            ) VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (case_id, file_path, file_name, file_size, page_count, now, content_hash))
+        file_id = cursor.lastrowid
+        
+        if content_hash:
+            self._reuse_shared_directories(case_id, file_id, content_hash)
+        
+        return file_id
+    
+    def _reuse_shared_directories(self, case_id: int, file_id: int, content_hash: str) -> int:
+        """从相同内容的已有文件复制目录记录（不提交事务）"""
+        cursor = self.db_manager.cursor
+        cursor.execute("""
+            SELECT f.id FROM pdf_files f
+            WHERE f.content_hash = ? AND f.id != ?
+              AND EXISTS (SELECT 1 FROM pdf_directories d WHERE d.pdf_file_id = f.id)
+            ORDER BY f.id
+            LIMIT 1
+        """, (content_hash, file_id))
+        row = cursor.fetchone()
+        if not row:
+            return 0
+        
+        cursor.execute("""
+            SELECT id, title, page_number, level, parent_id, path, depth
+            FROM pdf_directories
+            WHERE pdf_file_id = ?
+            ORDER BY id
+        """, (row[0],))
+        source_rows = cursor.fetchall()
+        
+        # 先插入全部记录，再将parent_id映射到新插入的记录（父项可能排在子项之后），
+        # 无法映射的置空，不指向其他文件的记录；物化路径在文件内，直接沿用
+        id_map = {}
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        for source_id, title, page_number, level, parent_id, path, depth in source_rows:
             cursor.execute("""
-                INSERT INTO pdf_files (
-                    case_id, file_path, file_name, file_size, 
-                    page_count, upload_time
-                ) VALUES (?, ?, ?, ?, ?, ?)
-            """, (case_id, file_path, file_name, file_size, page_count, now))
+                INSERT INTO pdf_directories (
+                    case_id, pdf_file_id, title, page_number, 
+                    level, parent_id, path, depth, created_at
+                ) VALUES (?, ?, ?, ?, ?, NULL, ?, ?, ?)
+            """, (case_id, file_id, title, page_number, level, path, depth, now))
+            id_map[source_id] = cursor.lastrowid
+        cursor.executemany("UPDATE pdf_directories SET parent_id = ? WHERE id = ?",
+                           [(id_map[parent_id], id_map[source_id])
+                            for source_id, _, _, _, parent_id, _, _ in source_rows if parent_id in id_map])
+        
+        refresh_directory_stats(cursor, case_id, file_id)
+        record_case_change(cursor, case_id, 'pdf_directories', file_id)
+        return len(source_rows)
+    
+    def get_pdf_blob(self, content_hash: str) -> Optional[Dict]:
+        """根据内容哈希获取共享的PDF内容信息"""
+        try:
+            cursor = self.db_manager.cursor
+            cursor.execute("""
+                SELECT content_hash, file_size, page_count, extracted_text,
+                       ocr_text, thumbnail_dir, created_at, updated_at
+                FROM pdf_blobs
+                WHERE content_hash = ?
+            """, (content_hash,))
+            
+            row = cursor.fetchone()
+            if row:
+                return {
+                    'content_hash': row[0],
+                    'file_size': row[1],
+                    'page_count': row[2],
+                    'extracted_text': row[3],
+                    'ocr_text': row[4],
+                    'thumbnail_dir': row[5],
+                    'created_at': row[6],
+                    'updated_at': row[7]
+                }
+            return None
+            
+        except Exception as e:
+            print(f"获取PDF内容信息失败: {e}")
+            return None
+    
+    def get_pdf_blob_by_file_id(self, file_id: int) -> Optional[Dict]:
+        """获取PDF文件记录对应的共享内容信息"""
+        file_info = self.get_pdf_file_by_id(file_id)
+        if file_info and file_info.get('content_hash'):
+            return self.get_pdf_blob(file_info['content_hash'])
+        return None
+    
+    def update_pdf_blob(self, content_hash: str, **kwargs) -> bool:
+        """更新共享内容的提取结果，所有相同内容的文件记录立即可见"""
+        try:
+            cursor = self.db_manager.cursor
+            
+            update_fields = []
+            values = []
+            
+            for field, value in kwargs.items():
+                if field in ['page_count', 'extracted_text', 'ocr_text', 'thumbnail_dir']:
+                    update_fields.append(f"{field} = ?")
+                    values.append(value)
+            
+            if not update_fields:
+                return False
+            
+            update_fields.append("updated_at = ?")
+            values.append(datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+            values.append(content_hash)
+            
+            cursor.execute(f"""
+                UPDATE pdf_blobs SET {', '.join(update_fields)}
+                WHERE content_hash = ?
+            """, values)
             
             self.db_manager.connection.commit()
-            return cursor.lastrowid
+            return cursor.rowcount > 0
             
         except Exception as e:
-            print(f"添加PDF文件记录失败: {e}")
+            print(f"更新PDF内容信息失败: {e}")
             self.db_manager.connection.rollback()
-            return None
+            return False
+    
+    def get_pdf_files_by_hash(self, content_hash: str) -> List[Dict]:
+        """获取共享同一内容的所有PDF文件记录"""
+        try:
+            cursor = self.db_manager.cursor
+            cursor.execute("""
+                SELECT id, case_id, file_path, file_name, file_size, 
+                       page_count, upload_time
+                FROM pdf_files 
+                WHERE content_hash = ?
+                ORDER BY id
+            """, (content_hash,))
+            
+            files = []
+            for row in cursor.fetchall():
+                files.append({
+                    'id': row[0],
+                    'case_id': row[1],
+                    'file_path': row[2],
+                    'file_name': row[3],
+                    'file_size': row[4],
+                    'page_count': row[5],
+                    'upload_time': row[6],
+                    'content_hash': content_hash
+                })
+            
+            return files
+            
+        except Exception as e:
+            print(f"根据内容哈希获取PDF文件失败: {e}")
+            return []
     
     def get_pdf_files_by_case(self, case_id: int) -> List[Dict]:
         """获取案件的所有PDF文件"""
@@ -195,7 +534,7 @@ class PDFFileManager:
             cursor = self.db_manager.cursor
             cursor.execute("""
                 SELECT id, file_path, file_name, file_size, 
-                       page_count, upload_time
+                       page_count, upload_time, content_hash, archive_path
                 FROM pdf_files 
                 WHERE case_id = ?
                 ORDER BY upload_time DESC
@@ -209,7 +548,9 @@ class PDFFileManager:
                     'file_name': row[2],
                     'file_size': row[3],
                     'page_count': row[4],
-                    'upload_time': row[5]
+                    'upload_time': row[5],
+                    'content_hash': row[6],
+                    'archived': row[7] is not None  # 已归档，首次打开时解压恢复
                 }
                 files.append(file_info)
             
@@ -225,7 +566,7 @@ class PDFFileManager:
             cursor = self.db_manager.cursor
             cursor.execute("""
                 SELECT id, case_id, file_path, file_name, file_size, 
-                       page_count, upload_time
+                       page_count, upload_time, content_hash
                 FROM pdf_files 
                 WHERE id = ?
             """, (file_id,))
@@ -239,7 +580,8 @@ class PDFFileManager:
                     'file_name': row[3],
                     'file_size': row[4],
                     'page_count': row[5],
-                    'upload_time': row[6]
+                    'upload_time': row[6],
+                    'content_hash': row[7]
                 }
             return None
             
@@ -284,8 +626,9 @@ class PDFFileManager:
         try:
             cursor = self.db_manager.cursor
             
-            # 先删除相关的目录记录
+            # 先删除相关的目录记录和统计
             cursor.execute("DELETE FROM pdf_directories WHERE pdf_file_id = ?", (file_id,))
+            cursor.execute("DELETE FROM pdf_directory_stats WHERE pdf_file_id = ?", (file_id,))
             
             # 删除PDF文件记录
             cursor.execute("DELETE FROM pdf_files WHERE id = ?", (file_id,))
@@ -304,7 +647,7 @@ class PDFFileManager:
             cursor = self.db_manager.cursor
             cursor.execute("""
                 SELECT id, case_id, file_path, file_name, file_size, 
-                       page_count, upload_time
+                       page_count, upload_time, content_hash
                 FROM pdf_files 
                 WHERE file_path = ?
             """, (file_path,))
@@ -318,7 +661,8 @@ class PDFFileManager:
                     'file_name': row[3],
                     'file_size': row[4],
                     'page_count': row[5],
-                    'upload_time': row[6]
+                    'upload_time': row[6],
+                    'content_hash': row[7]
                 }
             return None
             
@@ -331,44 +675,70 @@ class EnhancedDirectoryManager:
     
     def __init__(self, db_manager):
         self.db_manager = db_manager
+        self.last_change_version = None  # 最近一次写入后的卷宗版本号
     
     def save_pdf_directories(self, case_id: int, pdf_file_id: int, 
                            directories: List[Dict]) -> bool:
         """保存PDF文件的目录结构"""
         try:
-            cursor = self.db_manager.cursor
+            self._replace_pdf_directories(case_id, pdf_file_id, directories)
             
-            # 先删除该PDF文件的现有目录记录
-            cursor.execute("""
-                DELETE FROM pdf_directories 
-                WHERE case_id = ? AND pdf_file_id = ?
-            """, (case_id, pdf_file_id))
+            self.db_manager.connection.commit()
+            return True
             
-            # 插入新的目录记录
-            for directory in directories:
-                cursor.execute("""
-                    INSERT INTO pdf_directories (
-                        case_id, pdf_file_id, title, page_number, 
-                        level, parent_id, created_at
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    case_id,
-                    pdf_file_id,
-                    directory.get('title', ''),
-                    directory.get('page', 0),
-                    directory.get('level', 1),
-                    directory.get('parent_id'),
-                    datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                ))
+        except Exception as e:
+            print(f"保存PDF目录失败: {e}")
+            self.db_manager.connection.rollback()
+            return False
+    
+    def save_pdf_directories_batch(self, case_id: int,
+                                   directories_by_file: Dict[int, List[Dict]]) -> bool:
+        """批量保存多个PDF文件的目录结构，整批在一个事务中提交"""
+        try:
+            for pdf_file_id, directories in directories_by_file.items():
+                self._replace_pdf_directories(case_id, pdf_file_id, directories)
             
             self.db_manager.connection.commit()
             return True
             
         except Exception as e:
-            print(f"保存PDF目录失败: {e}")
+            print(f"批量保存PDF目录失败: {e}")
             self.db_manager.connection.rollback()
             return False
     
+    def _replace_pdf_directories(self, case_id: int, pdf_file_id: int, directories: List[Dict]):
+        """替换文件的目录记录并刷新统计（不提交事务）"""
+        cursor = self.db_manager.cursor
+        
+        # 先删除该PDF文件的现有目录记录
+        cursor.execute("""
+            DELETE FROM pdf_directories 
+            WHERE case_id = ? AND pdf_file_id = ?
+        """, (case_id, pdf_file_id))
+        
+        # 插入新的目录记录（按传入顺序即书签顺序计算物化路径）
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        paths = outline_paths(directory.get('level', 1) for directory in directories)
+        cursor.executemany("""
+            INSERT INTO pdf_directories (
+                case_id, pdf_file_id, title, page_number, 
+                level, parent_id, path, depth, created_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, [(
+            case_id,
+            pdf_file_id,
+            directory.get('title', ''),
+            directory.get('page', 0),
+            directory.get('level', 1),
+            directory.get('parent_id'),
+            path,
+            depth,
+            now
+        ) for directory, (path, depth) in zip(directories, paths)])
+        
+        refresh_directory_stats(cursor, case_id, pdf_file_id)
+        self.last_change_version = record_case_change(cursor, case_id, 'pdf_directories', pdf_file_id)
+    
     def get_pdf_directories(self, case_id: int, pdf_file_id: int = None) -> List[Dict]:
         """获取PDF文件的目录结构"""
         try:
@@ -377,7 +747,7 @@ class EnhancedDirectoryManager:
             if pdf_file_id:
                 # 获取特定PDF文件的目录
                 cursor.execute("""
-                    SELECT id, title, page_number, level, parent_id
+                    SELECT id, title, page_number, level, parent_id, pdf_file_id, path, depth
                     FROM pdf_directories 
                     WHERE case_id = ? AND pdf_file_id = ?
                     ORDER BY page_number, level
@@ -385,7 +755,7 @@ class EnhancedDirectoryManager:
             else:
                 # 获取案件的所有目录
                 cursor.execute("""
-                    SELECT id, title, page_number, level, parent_id
+                    SELECT id, title, page_number, level, parent_id, pdf_file_id, path, depth
                     FROM pdf_directories 
                     WHERE case_id = ?
                     ORDER BY page_number, level
@@ -398,7 +768,10 @@ class EnhancedDirectoryManager:
                     'title': row[1],
                     'page': row[2],
                     'level': row[3],
-                    'parent_id': row[4]
+                    'parent_id': row[4],
+                    'pdf_file_id': row[5],
+                    'path': row[6],
+                    'depth': row[7]
                 }
                 directories.append(directory)
             
@@ -408,6 +781,127 @@ class EnhancedDirectoryManager:
             print(f"获取PDF目录失败: {e}")
             return []
     
+    # 层级查询返回的列
+    TREE_COLUMNS = "d.id, d.title, d.page_number, d.level, d.parent_id, d.pdf_file_id, d.path, d.depth"
+    
+    @staticmethod
+    def _tree_directory(row) -> Dict:
+        return {
+            'id': row[0],
+            'title': row[1],
+            'page': row[2],
+            'level': row[3],
+            'parent_id': row[4],
+            'pdf_file_id': row[5],
+            'path': row[6],
+            'depth': row[7]
+        }
+    
+    def get_directory_subtree(self, directory_id: int) -> List[Dict]:
+        """获取目录项及其全部下级（先序顺序），按物化路径做一次区间扫描"""
+        try:
+            cursor = self.db_manager.cursor
+            cursor.execute(f"""
+                SELECT {self.TREE_COLUMNS}
+                FROM pdf_directories n
+                JOIN pdf_directories d
+                  ON d.pdf_file_id = n.pdf_file_id
+                 AND d.path >= n.path
+                 AND d.path < substr(n.path, 1, length(n.path) - 1) || '0'
+                WHERE n.id = ?
+                ORDER BY d.path
+            """, (directory_id,))
+            
+            return [self._tree_directory(row) for row in cursor.fetchall()]
+            
+        except Exception as e:
+            print(f"获取目录子树失败: {e}")
+            return []
+    
+    def get_directory_ancestors(self, directory_id: int) -> List[Dict]:
+        """获取目录项的各级上级（由浅到深，不含自身），用于面包屑导航"""
+        try:
+            cursor = self.db_manager.cursor
+            cursor.execute("""
+                SELECT pdf_file_id, path FROM pdf_directories WHERE id = ?
+            """, (directory_id,))
+            row = cursor.fetchone()
+            if not row or not row[1]:
+                return []
+            
+            ancestor_paths = outline_ancestor_paths(row[1])
+            if not ancestor_paths:
+                return []
+            placeholders = ', '.join('?' for _ in ancestor_paths)
+            cursor.execute(f"""
+                SELECT {self.TREE_COLUMNS}
+                FROM pdf_directories d
+                WHERE d.pdf_file_id = ? AND d.path IN ({placeholders})
+                ORDER BY d.path
+            """, (row[0], *ancestor_paths))
+            
+            return [self._tree_directory(row) for row in cursor.fetchall()]
+            
+        except Exception as e:
+            print(f"获取上级目录失败: {e}")
+            return []
+    
+    def get_collapsed_outline(self, pdf_file_id: int, expanded_ids=(), max_depth: int = 1) -> List[Dict]:
+        """获取折叠状态下可见的目录（先序顺序）
+        
+        显示深度不超过 max_depth 的目录，以及展开节点（其上级也都可见）的直接下级；
+        每项的 has_children 表示是否有下级可供展开。
+        """
+        try:
+            cursor = self.db_manager.cursor
+            expanded = []
+            if expanded_ids:
+                expanded_ids = list(expanded_ids)
+                placeholders = ', '.join('?' for _ in expanded_ids)
+                cursor.execute(f"""
+                    SELECT path, depth FROM pdf_directories
+                    WHERE id IN ({placeholders}) AND pdf_file_id = ?
+                """, (*expanded_ids, pdf_file_id))
+                expanded = [(path, depth) for path, depth in cursor.fetchall() if path]
+            
+            # 上级被折叠的展开节点不可见，其下级也不显示
+            expanded_paths = {path for path, _ in expanded}
+            visible_expanded = [
+                (path, depth) for path, depth in expanded
+                if all(ancestor in expanded_paths
+                       for ancestor in outline_ancestor_paths(path)[max(max_depth - 1, 0):])
+                and depth >= max_depth
+            ]
+            
+            conditions = ["(d.pdf_file_id = ? AND d.depth <= ?)"]
+            params = [pdf_file_id, max_depth]
+            for path, depth in visible_expanded:
+                conditions.append("(d.pdf_file_id = ? AND d.depth = ? AND d.path > ? AND d.path < ?)")
+                params += [pdf_file_id, depth + 1, path, outline_path_upper(path)]
+            
+            cursor.execute(f"""
+                SELECT {self.TREE_COLUMNS},
+                       EXISTS (
+                           SELECT 1 FROM pdf_directories c
+                           WHERE c.pdf_file_id = d.pdf_file_id AND c.depth = d.depth + 1
+                             AND c.path > d.path AND c.path < substr(d.path, 1, length(d.path) - 1) || '0'
+                       ) AS has_children
+                FROM pdf_directories d
+                WHERE {' OR '.join(conditions)}
+                ORDER BY d.path
+            """, params)
+            
+            outline = []
+            for row in cursor.fetchall():
+                directory = self._tree_directory(row)
+                directory['has_children'] = bool(row[8])
+                outline.append(directory)
+            return outline
+            
+        except Exception as e:
+            print(f"获取折叠目录失败: {e}")
+            return []
+    
     def clear_pdf_directories(self, case_id: int, pdf_file_id: int = None) -> bool:
         """清除PDF文件的目录记录"""
         try:
@@ -426,6 +920,9 @@ class EnhancedDirectoryManager:
                     WHERE case_id = ?
                 """, (case_id,))
             
+            refresh_directory_stats(cursor, case_id, pdf_file_id)
+            record_case_change(cursor, case_id, 'pdf_directories', pdf_file_id, 'delete')
+            
             self.db_manager.connection.commit()
             return True
             
@@ -462,48 +959,393 @@ class EnhancedDirectoryManager:
             print(f"搜索目录失败: {e}")
             return []
     
+    @staticmethod
+    def _fold_directory_statistics(rows) -> Dict:
+        """将(pdf_file_id, level, 数量)行汇总为统计结果"""
+        total_count = 0
+        level_counts = {}
+        pdf_file_ids = set()
+        
+        for pdf_file_id, level, count in rows:
+            total_count += count
+            level_counts[level] = level_counts.get(level, 0) + count
+            pdf_file_ids.add(pdf_file_id)
+        
+        return {
+            'total_directories': total_count,
+            'level_counts': dict(sorted(level_counts.items())),
+            'pdf_file_count': len(pdf_file_ids)
+        }
+    
     def get_directory_statistics(self, case_id: int) -> Dict:
-        """获取目录统计信息"""
+        """获取目录统计信息（一次按索引分组扫描得到总数、各级数量和文件数）"""
         try:
             cursor = self.db_manager.cursor
-            
-            # 获取总目录数
             cursor.execute("""
-                SELECT COUNT(*) FROM pdf_directories WHERE case_id = ?
-            """, (case_id,))
-            total_count = cursor.fetchone()[0]
-            
-            # 获取各级目录数量
-            cursor.execute("""
-                SELECT level, COUNT(*) 
-                FROM pdf_directories 
-                WHERE case_id = ? 
-                GROUP BY level
-                ORDER BY level
+                SELECT pdf_file_id, level, COUNT(*)
+                FROM pdf_directories
+                WHERE case_id = ?
+                GROUP BY pdf_file_id, level
             """, (case_id,))
             
-            level_counts = {}
-            for row in cursor.fetchall():
-                level_counts[row[0]] = row[1]
+            return self._fold_directory_statistics(cursor.fetchall())
             
-            # 获取PDF文件数量
+        except Exception as e:
+            print(f"获取目录统计信息失败: {e}")
+            return {
+                'total_directories': 0,
+                'level_counts': {},
+                'pdf_file_count': 0
+            }
+    
+    def get_cached_directory_statistics(self, case_id: int) -> Dict:
+        """从统计汇总表读取目录统计信息（随目录保存增量维护）"""
+        try:
+            cursor = self.db_manager.cursor
             cursor.execute("""
-                SELECT COUNT(DISTINCT pdf_file_id) 
-                FROM pdf_directories 
+                SELECT pdf_file_id, level, entry_count
+                FROM pdf_directory_stats
                 WHERE case_id = ?
             """, (case_id,))
-            pdf_file_count = cursor.fetchone()[0]
             
-            return {
-                'total_directories': total_count,
-                'level_counts': level_counts,
-                'pdf_file_count': pdf_file_count
-            }
+            return self._fold_directory_statistics(cursor.fetchall())
             
         except Exception as e:
-            print(f"获取目录统计信息失败: {e}")
+            print(f"获取目录统计汇总失败: {e}")
             return {
                 'total_directories': 0,
                 'level_counts': {},
                 'pdf_file_count': 0
             }
+    
+    def get_all_directory_statistics(self) -> Dict[int, Dict]:
+        """一次读取所有卷宗的目录统计信息 {case_id: 统计}"""
+        try:
+            cursor = self.db_manager.cursor
+            cursor.execute("""
+                SELECT case_id, pdf_file_id, level, entry_count
+                FROM pdf_directory_stats
+                ORDER BY case_id
+            """)
+            
+            rows_by_case = {}
+            for case_id, pdf_file_id, level, count in cursor.fetchall():
+                rows_by_case.setdefault(case_id, []).append((pdf_file_id, level, count))
+            
+            return {case_id: self._fold_directory_statistics(rows)
+                    for case_id, rows in rows_by_case.items()}
+            
+        except Exception as e:
+            print(f"获取全部目录统计汇总失败: {e}")
+            return {}
+
+
+class ChangeFeedManager:
+    """卷宗变更日志查询"""
+    
+    def __init__(self, db_manager):
+        self.db_manager = db_manager
+    
+    def get_case_version(self, case_id: int) -> int:
+        """获取卷宗当前版本号"""
+        try:
+            cursor = self.db_manager.cursor
+            cursor.execute("SELECT version FROM case_versions WHERE case_id = ?", (case_id,))
+            row = cursor.fetchone()
+            return row[0] if row else 0
+            
+        except Exception as e:
+            print(f"获取卷宗版本失败: {e}")
+            return 0
+    
+    def get_changes_since(self, case_id: int, version: int, limit: int = 500) -> List[Dict]:
+        """获取卷宗在指定版本之后的变更"""
+        try:
+            cursor = self.db_manager.cursor
+            cursor.execute("""
+                SELECT version, table_name, row_key, operation, changed_at
+                FROM change_log
+                WHERE case_id = ? AND version > ?
+                ORDER BY version
+                LIMIT ?
+            """, (case_id, version, limit))
+            
+            changes = []
+            for row in cursor.fetchall():
+                changes.append({
+                    'case_id': case_id,
+                    'version': row[0],
+                    'table_name': row[1],
+                    'row_key': row[2],
+                    'operation': row[3],
+                    'changed_at': row[4]
+                })
+            
+            return changes
+            
+        except Exception as e:
+            print(f"获取卷宗变更失败: {e}")
+            return []
+    
+    def prune_change_log(self, keep_days: int = 30) -> int:
+        """清理过期的变更日志（卷宗版本号保留，不影响客户端增量同步）"""
+        try:
+            cursor = self.db_manager.cursor
+            cutoff = (datetime.now() - timedelta(days=keep_days)).strftime('%Y-%m-%d %H:%M:%S')
+            cursor.execute("DELETE FROM change_log WHERE changed_at < ?", (cutoff,))
+            
+            self.db_manager.connection.commit()
+            return cursor.rowcount
+            
+        except Exception as e:
+            print(f"清理变更日志失败: {e}")
+            self.db_manager.connection.rollback()
+            return 0
+
+
+class PageFingerprintManager:
+    """页面指纹管理器（按内容哈希共享，相同内容的文件只计算一次）"""
+    
+    def __init__(self, db_manager):
+        self.db_manager = db_manager
+    
+    def has_page_fingerprints(self, content_hash: str) -> bool:
+        """内容是否已计算过页面指纹"""
+        try:
+            cursor = self.db_manager.cursor
+            cursor.execute("SELECT fingerprinted_at FROM pdf_blobs WHERE content_hash = ?", (content_hash,))
+            row = cursor.fetchone()
+            return bool(row and row[0])
+            
+        except Exception as e:
+            print(f"检查页面指纹失败: {e}")
+            return False
+    
+    def save_page_fingerprints(self, content_hash: str, pages: List[Dict]) -> bool:
+        """保存内容的页面指纹（替换已有结果）"""
+        try:
+            cursor = self.db_manager.cursor
+            now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            
+            cursor.execute("DELETE FROM pdf_page_fingerprints WHERE content_hash = ?", (content_hash,))
+            cursor.executemany("""
+                INSERT INTO pdf_page_fingerprints (
+                    content_hash, page_index, ahash, dhash, ink_ratio, is_blank, duplicate_of
+                ) VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, [(content_hash, page['page_index'], page['ahash'], page['dhash'],
+                   page['ink_ratio'], int(page['is_blank']), page['duplicate_of'])
+                  for page in pages])
+            cursor.execute("UPDATE pdf_blobs SET fingerprinted_at = ? WHERE content_hash = ?",
+                           (now, content_hash))
+            
+            self.db_manager.connection.commit()
+            return True
+            
+        except Exception as e:
+            print(f"保存页面指纹失败: {e}")
+            self.db_manager.connection.rollback()
+            return False
+    
+    def get_page_fingerprints(self, content_hash: str) -> List[Dict]:
+        """获取内容的页面指纹"""
+        try:
+            cursor = self.db_manager.cursor
+            cursor.execute("""
+                SELECT page_index, ahash, dhash, ink_ratio, is_blank, duplicate_of
+                FROM pdf_page_fingerprints
+                WHERE content_hash = ?
+                ORDER BY page_index
+            """, (content_hash,))
+            
+            pages = []
+            for row in cursor.fetchall():
+                pages.append({
+                    'page_index': row[0],
+                    'ahash': row[1],
+                    'dhash': row[2],
+                    'ink_ratio': row[3],
+                    'is_blank': bool(row[4]),
+                    'duplicate_of': row[5]
+                })
+            
+            return pages
+            
+        except Exception as e:
+            print(f"获取页面指纹失败: {e}")
+            return []
+    
+    def get_skippable_pages(self, content_hash: str) -> Dict:
+        """获取可跳过的页面: {'blank': {页序号}, 'duplicates': {页序号: 原始页序号}}"""
+        try:
+            cursor = self.db_manager.cursor
+            cursor.execute("""
+                SELECT page_index, is_blank, duplicate_of
+                FROM pdf_page_fingerprints
+                WHERE content_hash = ? AND (is_blank = 1 OR duplicate_of IS NOT NULL)
+            """, (content_hash,))
+            
+            skippable = {'blank': set(), 'duplicates': {}}
+            for page_index, is_blank, duplicate_of in cursor.fetchall():
+                if is_blank:
+                    skippable['blank'].add(page_index)
+                else:
+                    skippable['duplicates'][page_index] = duplicate_of
+            
+            return skippable
+            
+        except Exception as e:
+            print(f"获取可跳过页面失败: {e}")
+            return {'blank': set(), 'duplicates': {}}
+
+
+class TableTocManager:
+    """表格式目录缓存管理器（按内容哈希共享，相同内容的文件只提取一次）"""
+    
+    def __init__(self, db_manager):
+        self.db_manager = db_manager
+    
+    def has_table_toc(self, content_hash: str) -> bool:
+        """内容是否已提取过表格目录（包括没有表格目录的文件）"""
+        try:
+            cursor = self.db_manager.cursor
+            cursor.execute("SELECT table_toc_at FROM pdf_blobs WHERE content_hash = ?", (content_hash,))
+            row = cursor.fetchone()
+            return bool(row and row[0])
+            
+        except Exception as e:
+            print(f"检查表格目录失败: {e}")
+            return False
+    
+    def save_table_toc(self, content_hash: str, entries: List[Dict]) -> bool:
+        """保存内容的表格目录提取结果（替换已有结果）"""
+        try:
+            cursor = self.db_manager.cursor
+            now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            
+            cursor.execute("DELETE FROM pdf_table_toc WHERE content_hash = ?", (content_hash,))
+            cursor.executemany("""
+                INSERT INTO pdf_table_toc (
+                    content_hash, row_index, sequence_number, file_name, page_number, end_page
+                ) VALUES (?, ?, ?, ?, ?, ?)
+            """, [(content_hash, index, entry.get('sequence_number', ''), entry.get('file_name', ''),
+                   entry.get('page_number', ''), entry.get('end_page', ''))
+                  for index, entry in enumerate(entries)])
+            cursor.execute("UPDATE pdf_blobs SET table_toc_at = ? WHERE content_hash = ?", (now, content_hash))
+            
+            self.db_manager.connection.commit()
+            return True
+            
+        except Exception as e:
+            print(f"保存表格目录失败: {e}")
+            self.db_manager.connection.rollback()
+            return False
+    
+    def get_table_toc(self, content_hash: str) -> List[Dict]:
+        """获取内容的表格目录（save_directory 的目录行）"""
+        try:
+            cursor = self.db_manager.cursor
+            cursor.execute("""
+                SELECT sequence_number, file_name, page_number, end_page
+                FROM pdf_table_toc
+                WHERE content_hash = ?
+                ORDER BY row_index
+            """, (content_hash,))
+            
+            return [{
+                'sequence_number': row[0],
+                'file_name': row[1],
+                'page_number': row[2],
+                'end_page': row[3]
+            } for row in cursor.fetchall()]
+            
+        except Exception as e:
+            print(f"获取表格目录失败: {e}")
+            return []
+
+
+class AnnotationManager:
+    """页面批注管理器"""
+    
+    # 可更新的批注字段
+    FIELDS = ('x0', 'y0', 'x1', 'y1', 'color', 'note')
+    
+    def __init__(self, db_manager):
+        self.db_manager = db_manager
+    
+    def get_page_annotations(self, pdf_file_id: int, pages: List[int]) -> Dict[int, List[Dict]]:
+        """一次读取多个页面的批注，返回 {页序号: [批注]}（无批注的页面为空列表）"""
+        annotations = {page: [] for page in pages}
+        if not pages:
+            return annotations
+        try:
+            cursor = self.db_manager.cursor
+            placeholders = ', '.join('?' for _ in pages)
+            cursor.execute(f"""
+                SELECT id, page_index, x0, y0, x1, y1, color, note, created_by, updated_at
+                FROM pdf_annotations
+                WHERE pdf_file_id = ? AND page_index IN ({placeholders})
+                ORDER BY page_index, id
+            """, (pdf_file_id, *pages))
+            
+            for row in cursor.fetchall():
+                annotations[row[1]].append({
+                    'id': row[0],
+                    'pdf_file_id': pdf_file_id,
+                    'page_index': row[1],
+                    'x0': row[2],
+                    'y0': row[3],
+                    'x1': row[4],
+                    'y1': row[5],
+                    'color': row[6],
+                    'note': row[7],
+                    'created_by': row[8],
+                    'updated_at': row[9]
+                })
+            
+            return annotations
+            
+        except Exception as e:
+            print(f"获取页面批注失败: {e}")
+            return annotations
+    
+    def apply_annotation_changes(self, case_id: int, pdf_file_id: int, added: List[Dict] = (),
+                                 updated: List[Dict] = (), deleted_ids: List[int] = ()) -> Optional[List[int]]:
+        """在一个事务中批量写入新增、修改和删除的批注，返回新增批注的ID（顺序同added）"""
+        try:
+            cursor = self.db_manager.cursor
+            now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            
+            new_ids = []
+            for annotation in added:
+                cursor.execute("""
+                    INSERT INTO pdf_annotations (
+                        case_id, pdf_file_id, page_index, x0, y0, x1, y1,
+                        color, note, created_by, created_at, updated_at
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (case_id, pdf_file_id, annotation['page_index'],
+                      annotation['x0'], annotation['y0'], annotation['x1'], annotation['y1'],
+                      annotation.get('color'), annotation.get('note'),
+                      annotation.get('created_by'), now, now))
+                new_ids.append(cursor.lastrowid)
+            
+            for annotation in updated:
+                fields = [field for field in self.FIELDS if field in annotation]
+                if not fields:
+                    continue
+                cursor.execute(f"""
+                    UPDATE pdf_annotations SET {', '.join(f"{field} = ?" for field in fields)}, updated_at = ?
+                    WHERE id = ?
+                """, (*(annotation[field] for field in fields), now, annotation['id']))
+            
+            if deleted_ids:
+                cursor.executemany("DELETE FROM pdf_annotations WHERE id = ?",
+                                   [(annotation_id,) for annotation_id in deleted_ids])
+            
+            record_case_change(cursor, case_id, 'pdf_annotations', pdf_file_id)
+            self.db_manager.connection.commit()
+            return new_ids
+            
+        except Exception as e:
+            print(f"保存页面批注失败: {e}")
+            self.db_manager.connection.rollback()
+            return None
@@ -0,0 +1,689 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据库结构与版本迁移
+同时支持MySQL（database_config中的管理器）和SQLite（database_config_enhanced中的管理器），
+按版本号依次执行迁移，并提供查询计划检查，确保所有管理器查询都命中索引
+
+用法:
+    python database_schema.py --db lawyer_assistant.db     # 迁移本地SQLite数据库
+    python database_schema.py --check-plans                # 检查所有管理器查询的执行计划
+"""
+
+import argparse
+import re
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+from typing import Callable, List, Tuple
+
+BACKEND_SQLITE = 'sqlite'
+BACKEND_MYSQL = 'mysql'
+
+# 各后端的列类型
+COLUMN_TYPES = {
+    BACKEND_SQLITE: {
+        'pk': 'INTEGER PRIMARY KEY AUTOINCREMENT',
+        'int': 'INTEGER',
+        'key': 'TEXT',
+        'path': 'TEXT',
+        'title': 'TEXT',
+        'text': 'TEXT',
+        'datetime': 'TEXT',
+        'real': 'REAL',
+        'table_options': ''
+    },
+    BACKEND_MYSQL: {
+        'pk': 'INT AUTO_INCREMENT PRIMARY KEY',
+        'int': 'INT',
+        'key': 'VARCHAR(100)',
+        'path': 'VARCHAR(512)',
+        'title': 'VARCHAR(500)',
+        'text': 'LONGTEXT',
+        'datetime': 'DATETIME',
+        'real': 'DOUBLE',
+        'table_options': ' ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci'
+    }
+}
+
+
+# 目录物化路径：每级为固定宽度的36进制兄弟序号加分隔符，如 '0000/0002/'，
+# 按路径排序即为目录的先序顺序，子树为以该路径开头的连续区间
+OUTLINE_SEGMENT_WIDTH = 4
+OUTLINE_SEPARATOR = '/'
+_OUTLINE_DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+
+
+def _outline_segment(ordinal: int) -> str:
+    digits = ''
+    for _ in range(OUTLINE_SEGMENT_WIDTH):
+        ordinal, remainder = divmod(ordinal, 36)
+        digits = _OUTLINE_DIGITS[remainder] + digits
+    return digits + OUTLINE_SEPARATOR
+
+
+def outline_paths(levels) -> List[Tuple[str, int]]:
+    """按目录顺序和层级计算每项的 (物化路径, 深度)
+
+    层级跳级（如1级后直接出现3级）时按上一项的下一级处理，与书签的显示方式一致。
+    """
+    result = []
+    segments: List[str] = []
+    next_ordinals = [0]  # next_ordinals[d]：当前深度d节点下一个子节点的序号（d=0为根）
+    for level in levels:
+        depth = min(max(int(level or 1), 1), len(segments) + 1)
+        del segments[depth - 1:]
+        del next_ordinals[depth:]
+        segments.append(_outline_segment(next_ordinals[depth - 1]))
+        next_ordinals[depth - 1] += 1
+        next_ordinals.append(0)
+        result.append((''.join(segments), depth))
+    return result
+
+
+def outline_path_upper(path: str) -> str:
+    """子树区间的上界（不含）：分隔符小于所有序号字符，末尾分隔符换成'0'即大于所有后代路径"""
+    return path[:-1] + _OUTLINE_DIGITS[0]
+
+
+def outline_ancestor_paths(path: str) -> List[str]:
+    """各级祖先的路径（由浅到深，不含自身）"""
+    step = OUTLINE_SEGMENT_WIDTH + 1
+    return [path[:end] for end in range(step, len(path), step)]
+
+
+class Migrator:
+    """迁移执行器，屏蔽两种后端在DDL和元数据查询上的差异"""
+
+    def __init__(self, connection, backend: str):
+        self.connection = connection
+        self.backend = backend
+        self.types = COLUMN_TYPES[backend]
+
+    def execute(self, sql: str, params=()):
+        cursor = self.connection.cursor()
+        cursor.execute(sql.format(**self.types), params)
+        rows = cursor.fetchall() if cursor.description else []
+        cursor.close()
+        return rows
+
+    def table_exists(self, table: str) -> bool:
+        if self.backend == BACKEND_SQLITE:
+            rows = self.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+        else:
+            rows = self.execute("""
+                SELECT table_name FROM information_schema.tables
+                WHERE table_schema = DATABASE() AND table_name = %s
+            """, (table,))
+        return bool(rows)
+
+    def table_columns(self, table: str) -> List[str]:
+        if self.backend == BACKEND_SQLITE:
+            return [row[1] for row in self.execute(f"PRAGMA table_info({table})")]
+        rows = self.execute("""
+            SELECT column_name FROM information_schema.columns
+            WHERE table_schema = DATABASE() AND table_name = %s
+        """, (table,))
+        return [row[0] for row in rows]
+
+    def index_exists(self, table: str, index_name: str) -> bool:
+        if self.backend == BACKEND_SQLITE:
+            rows = self.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND name = ?", (index_name,))
+        else:
+            rows = self.execute("""
+                SELECT index_name FROM information_schema.statistics
+                WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+            """, (table, index_name))
+        return bool(rows)
+
+    def create_table(self, table: str, body: str):
+        self.execute(f"CREATE TABLE IF NOT EXISTS {table} ({body}){{table_options}}")
+
+    def add_column(self, table: str, column: str, definition: str):
+        if column not in self.table_columns(table):
+            self.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+    def create_index(self, table: str, index_name: str, columns: str, unique: bool = False):
+        """创建索引（已存在时跳过，MySQL 8不支持CREATE INDEX IF NOT EXISTS）"""
+        if not self.index_exists(table, index_name):
+            kind = 'UNIQUE INDEX' if unique else 'INDEX'
+            self.execute(f"CREATE {kind} {index_name} ON {table} ({columns})")
+
+
+def _migration_base_tables(m: Migrator):
+    """基础表：用户、会话、操作日志、卷宗、目录、PDF文件"""
+    m.create_table('users', """
+        id {pk},
+        username {key} NOT NULL,
+        password {key} NOT NULL,
+        full_name {key},
+        role {key} DEFAULT 'user',
+        status {key} DEFAULT 'active',
+        last_login {datetime},
+        created_at {datetime} DEFAULT CURRENT_TIMESTAMP
+    """)
+    m.create_table('user_sessions', """
+        id {pk},
+        user_id {int} NOT NULL,
+        session_token {key} NOT NULL,
+        expires_at {datetime} NOT NULL,
+        created_at {datetime} DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+    """)
+    m.create_table('operation_logs', """
+        id {pk},
+        user_id {int},
+        action {key} NOT NULL,
+        target_type {key},
+        target_id {int},
+        details {text},
+        created_at {datetime} DEFAULT CURRENT_TIMESTAMP
+    """)
+    m.create_table('cases', """
+        id {pk},
+        case_name {title} NOT NULL,
+        case_number {key},
+        case_type {key},
+        client_name {key},
+        opposing_party {key},
+        case_status {key},
+        description {text},
+        created_by {int},
+        status {key} DEFAULT 'active',
+        created_at {datetime} DEFAULT CURRENT_TIMESTAMP,
+        updated_at {datetime} DEFAULT CURRENT_TIMESTAMP
+    """)
+    m.create_table('case_directories', """
+        id {pk},
+        case_id {int} NOT NULL,
+        sequence_number {key},
+        file_name {title},
+        page_number {key},
+        end_page {key},
+        FOREIGN KEY (case_id) REFERENCES cases(id) ON DELETE CASCADE
+    """)
+    m.create_table('pdf_files', """
+        id {pk},
+        case_id {int} NOT NULL,
+        file_path {path} NOT NULL,
+        file_name {title},
+        file_size {int} DEFAULT 0,
+        page_count {int} DEFAULT 0,
+        upload_time {datetime},
+        FOREIGN KEY (case_id) REFERENCES cases(id) ON DELETE CASCADE
+    """)
+    m.create_table('pdf_directories', """
+        id {pk},
+        case_id {int} NOT NULL,
+        pdf_file_id {int} NOT NULL,
+        title {title},
+        page_number {int} DEFAULT 0,
+        level {int} DEFAULT 1,
+        parent_id {int},
+        created_at {datetime},
+        FOREIGN KEY (case_id) REFERENCES cases(id) ON DELETE CASCADE,
+        FOREIGN KEY (pdf_file_id) REFERENCES pdf_files(id) ON DELETE CASCADE
+    """)
+
+
+def _migration_pdf_blobs(m: Migrator):
+    """按内容哈希去重的PDF内容表"""
+    m.create_table('pdf_blobs', """
+        content_hash {key} PRIMARY KEY,
+        file_size {int} DEFAULT 0,
+        page_count {int} DEFAULT 0,
+        extracted_text {text},
+        ocr_text {text},
+        thumbnail_dir {path},
+        created_at {datetime},
+        updated_at {datetime}
+    """)
+    m.add_column('pdf_files', 'content_hash', m.types['key'])
+
+
+def _migration_query_indexes(m: Migrator):
+    """与管理器查询对应的组合索引和覆盖索引"""
+    # pdf_directories: WHERE case_id [AND pdf_file_id] ORDER BY page_number, level
+    m.create_index('pdf_directories', 'idx_pdf_dir_case_file_page',
+                   'case_id, pdf_file_id, page_number, level')
+    m.create_index('pdf_directories', 'idx_pdf_dir_case_page', 'case_id, page_number, level')
+    # 按文件删除/复制目录
+    m.create_index('pdf_directories', 'idx_pdf_dir_file', 'pdf_file_id')
+    # pdf_files: WHERE file_path / WHERE case_id ORDER BY upload_time / WHERE content_hash
+    m.create_index('pdf_files', 'idx_pdf_files_path', 'file_path')
+    m.create_index('pdf_files', 'idx_pdf_files_case_upload', 'case_id, upload_time')
+    m.create_index('pdf_files', 'idx_pdf_files_hash', 'content_hash')
+    # user_sessions: WHERE session_token (覆盖expires_at和user_id)
+    m.create_index('user_sessions', 'uq_user_sessions_token', 'session_token', unique=True)
+    m.create_index('user_sessions', 'idx_user_sessions_token_cover',
+                   'session_token, expires_at, user_id')
+    m.create_index('users', 'uq_users_username', 'username', unique=True)
+    # cases: WHERE created_by AND status ORDER BY updated_at / 全部卷宗按更新时间列出
+    m.create_index('cases', 'idx_cases_owner_status_updated', 'created_by, status, updated_at')
+    m.create_index('cases', 'idx_cases_updated', 'updated_at')
+    # case_directories: WHERE case_id ORDER BY id（InnoDB二级索引自带主键）
+    m.create_index('case_directories', 'idx_case_dir_case', 'case_id')
+    m.create_index('operation_logs', 'idx_operation_logs_user_time', 'user_id, created_at')
+
+
+def _migration_directory_stats(m: Migrator):
+    """按(卷宗, 文件, 层级)维护的目录数量统计，并回填已有数据"""
+    m.create_table('pdf_directory_stats', """
+        case_id {int} NOT NULL,
+        pdf_file_id {int} NOT NULL,
+        level {int} NOT NULL,
+        entry_count {int} NOT NULL DEFAULT 0,
+        PRIMARY KEY (case_id, pdf_file_id, level)
+    """)
+    m.create_index('pdf_directory_stats', 'idx_pdf_dir_stats_file', 'pdf_file_id')
+    m.execute("DELETE FROM pdf_directory_stats")
+    m.execute("""
+        INSERT INTO pdf_directory_stats (case_id, pdf_file_id, level, entry_count)
+        SELECT case_id, pdf_file_id, level, COUNT(*)
+        FROM pdf_directories
+        GROUP BY case_id, pdf_file_id, level
+    """)
+
+
+def _migration_change_log(m: Migrator):
+    """按卷宗递增版本的变更日志，供客户端增量同步"""
+    m.create_table('case_versions', """
+        case_id {int} PRIMARY KEY,
+        version {int} NOT NULL DEFAULT 0
+    """)
+    m.create_table('change_log', """
+        id {pk},
+        case_id {int} NOT NULL,
+        version {int} NOT NULL,
+        table_name {key} NOT NULL,
+        row_key {int},
+        operation {key} NOT NULL,
+        changed_at {datetime}
+    """)
+    m.create_index('change_log', 'idx_change_log_case_version', 'case_id, version')
+    m.create_index('change_log', 'idx_change_log_time', 'changed_at')
+
+
+def _migration_page_fingerprints(m: Migrator):
+    """按内容哈希保存的页面指纹（空白页、重复页）"""
+    m.create_table('pdf_page_fingerprints', """
+        content_hash {key} NOT NULL,
+        page_index {int} NOT NULL,
+        ahash {key},
+        dhash {key},
+        ink_ratio {real} DEFAULT 0,
+        is_blank {int} NOT NULL DEFAULT 0,
+        duplicate_of {int},
+        PRIMARY KEY (content_hash, page_index)
+    """)
+    # 指纹计算完成的时间，无页面的文件也据此判断已计算过
+    m.add_column('pdf_blobs', 'fingerprinted_at', m.types['datetime'])
+
+
+def _migration_annotations(m: Migrator):
+    """页面批注：矩形区域、颜色和备注，按(文件, 页)读取"""
+    m.create_table('pdf_annotations', """
+        id {pk},
+        case_id {int} NOT NULL,
+        pdf_file_id {int} NOT NULL,
+        page_index {int} NOT NULL,
+        x0 {real} NOT NULL,
+        y0 {real} NOT NULL,
+        x1 {real} NOT NULL,
+        y1 {real} NOT NULL,
+        color {key},
+        note {text},
+        created_by {int},
+        created_at {datetime},
+        updated_at {datetime},
+        FOREIGN KEY (case_id) REFERENCES cases(id) ON DELETE CASCADE,
+        FOREIGN KEY (pdf_file_id) REFERENCES pdf_files(id) ON DELETE CASCADE
+    """)
+    m.create_index('pdf_annotations', 'idx_pdf_annotations_file_page', 'pdf_file_id, page_index')
+    m.create_index('pdf_annotations', 'idx_pdf_annotations_case', 'case_id')
+
+
+def _migration_directory_paths(m: Migrator):
+    """目录的物化路径和深度，子树、祖先和折叠大纲查询为按索引的区间扫描，并回填已有目录"""
+    m.add_column('pdf_directories', 'path', m.types['path'])
+    m.add_column('pdf_directories', 'depth', f"{m.types['int']} DEFAULT 1")
+    m.create_index('pdf_directories', 'idx_pdf_dir_file_path', 'pdf_file_id, path')
+    m.create_index('pdf_directories', 'idx_pdf_dir_file_depth_path', 'pdf_file_id, depth, path')
+
+    # 已有目录按写入顺序（id）即书签顺序计算路径
+    rows = m.execute("SELECT id, pdf_file_id, level FROM pdf_directories ORDER BY pdf_file_id, id")
+    updates = []
+    start = 0
+    while start < len(rows):
+        end = start
+        while end < len(rows) and rows[end][1] == rows[start][1]:
+            end += 1
+        file_rows = rows[start:end]
+        for (directory_id, _, _), (path, depth) in zip(file_rows, outline_paths(row[2] for row in file_rows)):
+            updates.append((path, depth, directory_id))
+        start = end
+    if updates:
+        placeholder = '?' if m.backend == BACKEND_SQLITE else '%s'
+        cursor = m.connection.cursor()
+        cursor.executemany(f"UPDATE pdf_directories SET path = {placeholder}, depth = {placeholder} "
+                           f"WHERE id = {placeholder}", updates)
+        cursor.close()
+
+
+def _migration_case_archive(m: Migrator):
+    """冷存储归档：卷宗归档时间、文件的归档位置，以及归档卷宗的目录和批注表"""
+    m.add_column('cases', 'archived_at', m.types['datetime'])
+    m.add_column('pdf_files', 'archive_path', m.types['path'])
+    m.add_column('pdf_files', 'archive_member', m.types['path'])
+    # 与热表列相同，不设外键（卷宗清理时按case_id删除）
+    m.create_table('archived_pdf_directories', """
+        id {int} PRIMARY KEY,
+        case_id {int} NOT NULL,
+        pdf_file_id {int} NOT NULL,
+        title {title},
+        page_number {int} DEFAULT 0,
+        level {int} DEFAULT 1,
+        parent_id {int},
+        path {path},
+        depth {int} DEFAULT 1,
+        created_at {datetime}
+    """)
+    m.create_index('archived_pdf_directories', 'idx_archived_pdf_dir_file', 'pdf_file_id')
+    m.create_index('archived_pdf_directories', 'idx_archived_pdf_dir_case', 'case_id')
+    m.create_table('archived_pdf_annotations', """
+        id {int} PRIMARY KEY,
+        case_id {int} NOT NULL,
+        pdf_file_id {int} NOT NULL,
+        page_index {int} NOT NULL,
+        x0 {real} NOT NULL,
+        y0 {real} NOT NULL,
+        x1 {real} NOT NULL,
+        y1 {real} NOT NULL,
+        color {key},
+        note {text},
+        created_by {int},
+        created_at {datetime},
+        updated_at {datetime}
+    """)
+    m.create_index('archived_pdf_annotations', 'idx_archived_pdf_annotations_file', 'pdf_file_id')
+    m.create_index('archived_pdf_annotations', 'idx_archived_pdf_annotations_case', 'case_id')
+
+
+def _migration_table_toc(m: Migrator):
+    """按内容哈希缓存的表格式目录提取结果"""
+    m.create_table('pdf_table_toc', """
+        content_hash {key} NOT NULL,
+        row_index {int} NOT NULL,
+        sequence_number {key},
+        file_name {title},
+        page_number {key},
+        end_page {key},
+        PRIMARY KEY (content_hash, row_index)
+    """)
+    # 提取完成的时间，没有表格目录的文件也据此判断已提取过
+    m.add_column('pdf_blobs', 'table_toc_at', m.types['datetime'])
+
+
+def _migration_background_job_indexes(m: Migrator):
+    """后台清理（查找已删除卷宗）和归档（查找不活跃卷宗）按状态查询卷宗的索引"""
+    m.create_index('cases', 'idx_cases_status_archived_updated', 'status, archived_at, updated_at')
+
+
+# (版本号, 说明, 迁移函数)，只允许追加，不要修改已发布的迁移
+MIGRATIONS: List[Tuple[int, str, Callable[[Migrator], None]]] = [
+    (1, '基础表结构', _migration_base_tables),
+    (2, 'PDF内容去重表', _migration_pdf_blobs),
+    (3, '查询索引', _migration_query_indexes),
+    (4, '目录统计汇总表', _migration_directory_stats),
+    (5, '变更日志', _migration_change_log),
+    (6, '页面指纹', _migration_page_fingerprints),
+    (7, '页面批注', _migration_annotations),
+    (8, '目录物化路径', _migration_directory_paths),
+    (9, '卷宗冷存储归档', _migration_case_archive),
+    (10, '表格目录缓存', _migration_table_toc),
+    (11, '后台任务查询索引', _migration_background_job_indexes),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(connection, backend: str = BACKEND_SQLITE) -> int:
+    """获取数据库当前的结构版本"""
+    m = Migrator(connection, backend)
+    if not m.table_exists('schema_version'):
+        return 0
+    rows = m.execute("SELECT MAX(version) FROM schema_version")
+    return rows[0][0] or 0
+
+
+def apply_migrations(connection, backend: str = BACKEND_SQLITE) -> int:
+    """依次执行未应用的迁移，返回迁移后的版本号"""
+    m = Migrator(connection, backend)
+    m.create_table('schema_version', """
+        version {int} PRIMARY KEY,
+        description {title},
+        applied_at {datetime}
+    """)
+    current = get_schema_version(connection, backend)
+    placeholder = '?' if backend == BACKEND_SQLITE else '%s'
+
+    for version, description, migrate in MIGRATIONS:
+        if version <= current:
+            continue
+        try:
+            migrate(m)
+            m.execute(f"""
+                INSERT INTO schema_version (version, description, applied_at)
+                VALUES ({placeholder}, {placeholder}, {placeholder})
+            """, (version, description, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+            connection.commit()
+            current = version
+        except Exception as e:
+            print(f"数据库迁移失败 (版本 {version} {description}): {e}")
+            connection.rollback()
+            break
+
+    return current
+
+
+# ---- 查询计划检查 ----
+
+class _RecordingDatabaseManager:
+    """记录database_config中管理器发出的SQL，不实际执行"""
+
+    def __init__(self):
+        self.statements: List[Tuple[str, tuple]] = []
+
+    def execute_query(self, query, params=None):
+        self.statements.append((query, tuple(params or ())))
+        return []
+
+    def execute_update(self, query, params=None):
+        self.statements.append((query, tuple(params or ())))
+        return 0
+
+    def execute_insert(self, query, params=None):
+        self.statements.append((query, tuple(params or ())))
+        return 0
+
+
+def _seed_local_database(db):
+    """向本地数据库写入少量数据，使执行计划与真实数据一致"""
+    cursor = db.cursor
+    cursor.execute("INSERT INTO users (username, password, full_name) VALUES ('lawyer', 'x', '律师')")
+    for n in range(1, 4):
+        cursor.execute("""
+            INSERT INTO cases (case_name, case_number, created_by, status, created_at, updated_at)
+            VALUES (?, ?, 1, 'active', '2024-01-01 00:00:00', '2024-01-01 00:00:00')
+        """, (f"卷宗{n}", f"A{n}"))
+    db.connection.commit()
+
+
+def _collect_enhanced_statements(db) -> List[str]:
+    """运行database_config_enhanced中的管理器及后台归档、清理任务，通过trace回调收集实际执行的SQL"""
+    from database_config_enhanced import (EnhancedCaseManager, PDFFileManager, EnhancedDirectoryManager,
+                                          ChangeFeedManager, PageFingerprintManager, AnnotationManager,
+                                          TableTocManager)
+    from case_archive import CaseArchiver
+    from case_purge import _ChunkedPurger
+
+    statements = []
+    db.connection.set_trace_callback(statements.append)
+    try:
+        case_manager = EnhancedCaseManager(db)
+        file_manager = PDFFileManager(db)
+        directory_manager = EnhancedDirectoryManager(db)
+
+        file_id = file_manager.add_pdf_file(1, '/tmp/a.pdf', 'a.pdf', 10, 5, content_hash='h1')
+        file_manager.add_pdf_file(1, '/tmp/b.pdf', 'b.pdf', 10, 5, content_hash='h1')
+        directory_manager.save_pdf_directories(1, file_id, [{'title': '起诉状', 'page': 1, 'level': 1},
+                                                            {'title': '诉讼请求', 'page': 1, 'level': 2}])
+
+        case_manager.get_all_cases()
+        case_manager.get_case_by_id(1)
+        case_manager.update_case(1, {'case_name': '卷宗1'})
+        file_manager.get_pdf_files_by_case(1)
+        file_manager.get_pdf_file_by_id(file_id)
+        file_manager.get_pdf_file_by_path('/tmp/a.pdf')
+        file_manager.get_pdf_files_by_hash('h1')
+        file_manager.get_pdf_blob('h1')
+        file_manager.update_pdf_blob('h1', ocr_text='')
+        file_manager.update_pdf_file(file_id, file_name='a.pdf')
+        directory_manager.get_pdf_directories(1)
+        directory_manager.get_pdf_directories(1, file_id)
+        directory_manager.search_directories(1, '起诉')
+        top_entry = directory_manager.get_pdf_directories(1, file_id)[0]['id']
+        directory_manager.get_directory_subtree(top_entry)
+        directory_manager.get_directory_ancestors(top_entry + 1)
+        directory_manager.get_collapsed_outline(file_id, expanded_ids=[top_entry])
+        directory_manager.get_directory_statistics(1)
+        directory_manager.get_cached_directory_statistics(1)
+        directory_manager.get_all_directory_statistics()
+        change_feed = ChangeFeedManager(db)
+        change_feed.get_case_version(1)
+        change_feed.get_changes_since(1, 0)
+        change_feed.prune_change_log(30)
+        fingerprints = PageFingerprintManager(db)
+        fingerprints.save_page_fingerprints('h1', [{'page_index': 0, 'ahash': '0' * 64, 'dhash': '0' * 64,
+                                                    'ink_ratio': 0.0, 'is_blank': True, 'duplicate_of': None}])
+        fingerprints.has_page_fingerprints('h1')
+        fingerprints.get_page_fingerprints('h1')
+        fingerprints.get_skippable_pages('h1')
+        table_toc = TableTocManager(db)
+        table_toc.save_table_toc('h1', [{'sequence_number': '1', 'file_name': '起诉状',
+                                         'page_number': '1', 'end_page': '3'}])
+        table_toc.has_table_toc('h1')
+        table_toc.get_table_toc('h1')
+        annotations = AnnotationManager(db)
+        annotation_ids = annotations.apply_annotation_changes(
+            1, file_id, added=[{'page_index': 0, 'x0': 0, 'y0': 0, 'x1': 10, 'y1': 10}])
+        annotations.apply_annotation_changes(1, file_id, updated=[{'id': annotation_ids[0], 'note': '备注'}],
+                                             deleted_ids=annotation_ids)
+        annotations.get_page_annotations(file_id, [0, 1])
+        directory_manager.clear_pdf_directories(1, file_id)
+        directory_manager.clear_pdf_directories(1)
+        file_manager.delete_pdf_file(file_id)
+        case_manager.delete_case(3, remove_storage=False)
+        CaseArchiver(db).find_inactive_cases()
+        purger = _ChunkedPurger(db.connection, 500, 0, threading.Event())
+        for case_id in purger.deleted_case_ids(10) or [3]:
+            purger.case_content_hashes(case_id)
+            purger.delete_rows('pdf_directories', 'case_id', case_id)
+        purger.orphan_blobs(['h1'])
+        purger.delete_expired_changes('2024-01-01 00:00:00')
+    finally:
+        db.connection.set_trace_callback(None)
+    return statements
+
+
+def _collect_mysql_manager_statements() -> List[Tuple[str, tuple]]:
+    """收集database_config中管理器的SQL，并转换为SQLite占位符"""
+    from database_config import UserManager, CaseManager, DirectoryManager
+
+    recorder = _RecordingDatabaseManager()
+    users = UserManager(recorder)
+    cases = CaseManager(recorder)
+    directories = DirectoryManager(recorder)
+
+    users.authenticate_user('lawyer', 'x')
+    users.update_last_login(1)
+    users.validate_session('token')
+    users.logout_user('token')
+    cases.get_user_cases(1)
+    cases.get_case_by_id(1, 1)
+    cases.update_case(1, '卷宗1', 'A1', '', 1)
+    cases.delete_case(1, 1)
+    directories.get_case_directories(1)
+    directories.clear_case_directories(1)
+    directories.search_directories(1, '起诉')
+
+    converted = []
+    for query, params in recorder.statements:
+        params = tuple(str(p) if isinstance(p, datetime) else p for p in params)
+        converted.append((query.replace('%s', '?'), params))
+    return converted
+
+
+_FULL_SCAN = re.compile(r'\bSCAN (\w+)(?: AS \w+)?$')
+
+
+def find_full_scans(connection, query: str, params=()) -> List[str]:
+    """返回查询执行计划中的全表扫描步骤（按索引顺序扫描视为命中索引）"""
+    plan = connection.execute(f"EXPLAIN QUERY PLAN {query}", params).fetchall()
+    return [row[-1] for row in plan if _FULL_SCAN.search(row[-1])]
+
+
+def check_query_plans(db_path: str = ':memory:') -> List[Tuple[str, List[str]]]:
+    """在本地数据库上对所有管理器查询执行EXPLAIN，返回存在全表扫描的查询"""
+    from database_config_enhanced import LocalDatabaseManager
+
+    db = LocalDatabaseManager(db_path)
+    if not db.connect():
+        raise RuntimeError("无法连接本地数据库")
+
+    try:
+        _seed_local_database(db)
+        statements = [(sql, ()) for sql in _collect_enhanced_statements(db)]
+        statements += _collect_mysql_manager_statements()
+
+        failures = []
+        seen = set()
+        for query, params in statements:
+            normalized = ' '.join(query.split())
+            if not re.match(r'(SELECT|UPDATE|DELETE)\b', normalized, re.IGNORECASE):
+                continue
+            if normalized in seen or 'schema_version' in normalized or 'sqlite_master' in normalized:
+                continue
+            seen.add(normalized)
+            scans = find_full_scans(db.connection, query, params)
+            if scans:
+                failures.append((normalized, scans))
+        return failures
+    finally:
+        db.disconnect()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='数据库结构迁移与查询计划检查')
+    parser.add_argument('--db', help='要迁移的本地SQLite数据库文件')
+    parser.add_argument('--check-plans', action='store_true', help='检查所有管理器查询是否命中索引')
+    args = parser.parse_args()
+
+    if args.db:
+        connection = sqlite3.connect(args.db)
+        version = apply_migrations(connection, BACKEND_SQLITE)
+        connection.close()
+        print(f"数据库结构版本: {version}")
+
+    if args.check_plans:
+        failures = check_query_plans()
+        for query, scans in failures:
+            print(f"✗ 全表扫描: {', '.join(scans)}\n  {query}")
+        if failures:
+            sys.exit(1)
+        print("✓ 所有管理器查询均命中索引")
+
+
+if __name__ == "__main__":
+    main()
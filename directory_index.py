@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+目录标题即时检索
+按卷宗在内存中建立目录标题的倒排索引：中文按相邻两字（bigram）建索引，
+标题、序号和标题中的字母数字片段建前缀树，输入时直接在内存中求交集并排序，不访问数据库。
+候选集合的求交在集合运算中完成，取前N条用NumPy按预先计算的排序键选出，不逐条排序
+"""
+
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set
+
+import numpy as np
+
+# 默认返回的补全条数
+DEFAULT_LIMIT = 20
+
+# 标题中的字母数字片段（条款号、证据编号等），用于前缀匹配
+_TOKEN_PATTERN = re.compile(r'[0-9a-z]+(?:[-.][0-9a-z]+)*')
+
+# 排序等级：数值越小越靠前
+RANK_EXACT = 0
+RANK_PREFIX = 1
+RANK_SEQUENCE_PREFIX = 2
+RANK_TOKEN_PREFIX = 3
+RANK_SUBSTRING = 4
+
+
+def normalize(text) -> str:
+    """统一大小写并去掉空白，使"起诉 状"与"起诉状"都能命中"""
+    return re.sub(r'\s+', '', str(text or '')).lower()
+
+
+class PrefixTrie:
+    """前缀树，每个节点保存经过该节点的条目ID"""
+
+    def __init__(self):
+        self._root = {}
+
+    def insert(self, key: str, item_id: int):
+        node = self._root
+        for char in key:
+            node = node.setdefault(char, {})
+            node.setdefault(None, set()).add(item_id)
+
+    def remove(self, key: str, item_id: int):
+        node = self._root
+        for char in key:
+            node = node.get(char)
+            if node is None:
+                return
+            node.get(None, set()).discard(item_id)
+
+    def search(self, prefix: str) -> Set[int]:
+        node = self._root
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return set()
+        return node.get(None, set())
+
+
+class DirectoryIndex:
+    """单个卷宗的目录检索索引
+
+    条目来自 pdf_directories（书签目录）和 case_directories（卷宗目录），
+    返回结果中 source 为 'pdf' 或 'case'。
+    """
+
+    def __init__(self, case_id: int = None):
+        self.case_id = case_id
+        self.entries: Dict[int, Dict] = {}
+        self._keys: Dict[int, str] = {}  # 条目ID -> 归一化后的标题
+        self._tokens: Dict[int, List[str]] = {}  # 条目ID -> 前缀树中的键
+        self._by_file: Dict[Optional[int], Set[int]] = defaultdict(set)  # pdf_file_id -> 条目ID，卷宗目录为None
+        self._unigrams: Dict[str, Set[int]] = defaultdict(set)
+        self._bigrams: Dict[str, Set[int]] = defaultdict(set)
+        self._trie = PrefixTrie()  # 序号和字母数字片段
+        self._title_trie = PrefixTrie()  # 完整标题，用于标题前缀
+        self._exact: Dict[str, Set[int]] = defaultdict(set)
+        self._sort_keys = np.zeros(1024, dtype=np.int64)  # 条目ID -> 同等级内的排序键（标题越短、层级越高越靠前）
+        self._next_id = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    # ---------- 构建和更新 ----------
+
+    def build(self, pdf_directories: Iterable[Dict] = (), case_directories: Iterable[Dict] = ()):
+        """卷宗加载时全量构建"""
+        self.__init__(self.case_id)
+        for directory in pdf_directories:
+            self._add_pdf_directory(directory)
+        for directory in case_directories:
+            self._add_case_directory(directory)
+
+    def replace_pdf_file(self, pdf_file_id: int, directories: Iterable[Dict]):
+        """保存某个文件的目录后替换其条目"""
+        self.remove_pdf_file(pdf_file_id)
+        for directory in directories:
+            self._add_pdf_directory(dict(directory, pdf_file_id=pdf_file_id))
+
+    def remove_pdf_file(self, pdf_file_id: int):
+        for item_id in list(self._by_file.pop(pdf_file_id, ())):
+            self._remove(item_id)
+
+    def replace_case_directories(self, directories: Iterable[Dict]):
+        """卷宗目录保存后替换其条目"""
+        for item_id in list(self._by_file.pop(None, ())):
+            self._remove(item_id)
+        for directory in directories:
+            self._add_case_directory(directory)
+
+    def _add_pdf_directory(self, directory: Dict):
+        entry = {
+            'source': 'pdf',
+            'id': directory.get('id'),
+            'pdf_file_id': directory.get('pdf_file_id'),
+            'title': directory.get('title', ''),
+            'page': directory.get('page', 0),
+            'level': directory.get('level', 1)
+        }
+        self._add(entry, entry['title'], sequence='')
+
+    def _add_case_directory(self, directory: Dict):
+        entry = {
+            'source': 'case',
+            'pdf_file_id': None,
+            'sequence_number': directory.get('sequence_number', ''),
+            'title': directory.get('file_name', ''),
+            'page': directory.get('page_number', ''),
+            'end_page': directory.get('end_page', ''),
+            'level': 0
+        }
+        self._add(entry, entry['title'], sequence=normalize(entry['sequence_number']))
+
+    def _add(self, entry: Dict, title: str, sequence: str):
+        item_id = self._next_id
+        self._next_id += 1
+        key = normalize(title)
+        self.entries[item_id] = entry
+        self._keys[item_id] = key
+        self._by_file[entry['pdf_file_id']].add(item_id)
+        self._exact[key].add(item_id)
+        self._title_trie.insert(key, item_id)
+
+        if item_id >= len(self._sort_keys):
+            self._sort_keys = np.concatenate([self._sort_keys, np.zeros_like(self._sort_keys)])
+        level = entry['level'] if isinstance(entry['level'], int) else 0
+        # 标题长度优先，其次层级，最后按加入顺序
+        self._sort_keys[item_id] = (len(key) * 16 + min(max(level, 0), 15)) * (1 << 32) + item_id
+
+        for char in set(key):
+            self._unigrams[char].add(item_id)
+        for bigram in {key[i:i + 2] for i in range(len(key) - 1)}:
+            self._bigrams[bigram].add(item_id)
+
+        tokens = _TOKEN_PATTERN.findall(key)
+        if sequence:
+            tokens.append('#' + sequence)  # 序号单独成树枝，区分序号前缀和标题片段前缀
+        for token in tokens:
+            self._trie.insert(token, item_id)
+        self._tokens[item_id] = tokens
+
+    def _remove(self, item_id: int):
+        entry = self.entries.pop(item_id, None)
+        if entry is None:
+            return
+        key = self._keys.pop(item_id)
+        self._discard(self._exact, key, item_id)
+        self._title_trie.remove(key, item_id)
+        for char in set(key):
+            self._discard(self._unigrams, char, item_id)
+        for bigram in {key[i:i + 2] for i in range(len(key) - 1)}:
+            self._discard(self._bigrams, bigram, item_id)
+        for token in self._tokens.pop(item_id):
+            self._trie.remove(token, item_id)
+
+    @staticmethod
+    def _discard(postings: Dict[str, Set[int]], gram: str, item_id: int):
+        bucket = postings.get(gram)
+        if bucket is not None:
+            bucket.discard(item_id)
+            if not bucket:
+                del postings[gram]
+
+    # ---------- 查询 ----------
+
+    def search(self, query: str, limit: int = DEFAULT_LIMIT) -> List[Dict]:
+        """返回排序后的补全结果（条目字典的副本，附带 rank）
+
+        先按匹配等级（完全相同、标题前缀、序号前缀、片段前缀、包含）排序，同等级内标题短的在前。
+        """
+        text = normalize(query)
+        if not text:
+            return []
+
+        # 各等级的候选集合按需计算，前面的等级已凑满时不再计算后面的
+        groups = [
+            (RANK_EXACT, lambda: self._exact.get(text, set())),
+            (RANK_PREFIX, lambda: self._title_trie.search(text)),
+            (RANK_SEQUENCE_PREFIX, lambda: self._trie.search('#' + text)),
+            (RANK_TOKEN_PREFIX, lambda: self._trie.search(text) if _TOKEN_PATTERN.fullmatch(text) else set()),
+            (RANK_SUBSTRING, lambda: self._substring_matches(text)),
+        ]
+
+        results = []
+        taken: Set[int] = set()
+        for rank, candidates_of in groups:
+            remaining = limit - len(results)
+            if remaining <= 0:
+                break
+            item_ids = candidates_of()
+            candidates = item_ids - taken if taken else item_ids
+            for item_id in self._smallest(candidates, remaining):
+                results.append(dict(self.entries[item_id], rank=rank))
+                taken.add(item_id)
+        return results
+
+    def _smallest(self, item_ids: Set[int], count: int) -> List[int]:
+        """按排序键取前count个条目ID"""
+        if not item_ids:
+            return []
+        ids = np.fromiter(item_ids, dtype=np.int64, count=len(item_ids))
+        keys = self._sort_keys[ids]
+        if len(ids) > count:
+            keys = keys[np.argpartition(keys, count - 1)[:count]]
+        keys.sort()
+        return (keys & 0xFFFFFFFF).tolist()
+
+    def _substring_matches(self, text: str) -> Set[int]:
+        candidates = self._substring_candidates(text)
+        if len(text) > 2 and candidates:
+            # bigram全部命中但不一定连续，逐条确认
+            keys = self._keys
+            candidates = {item_id for item_id in candidates if text in keys[item_id]}
+        return candidates
+
+    def _substring_candidates(self, text: str) -> Set[int]:
+        if len(text) == 1:
+            return self._unigrams.get(text, set())
+        postings = []
+        for bigram in {text[i:i + 2] for i in range(len(text) - 1)}:
+            bucket = self._bigrams.get(bigram)
+            if not bucket:
+                return set()
+            postings.append(bucket)
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for bucket in postings[1:]:
+            candidates &= bucket
+            if not candidates:
+                break
+        return candidates
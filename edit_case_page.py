@@ -16,6 +16,7 @@ from PIL import Image, ImageTk
 import io
 from database_config import DatabaseManager, CaseManager, DirectoryManager
 from database_config_enhanced import EnhancedCaseManager, PDFFileManager, EnhancedDirectoryManager
+from pdf_document_pool import get_document_pool, HeldDocuments
 
 class ToolTip:
     """创建工具提示框"""
@@ -58,7 +59,8 @@ class EditCasePage:
     """编辑卷宗页面类"""
     
     def __init__(self, parent, case_id, case_info, current_user, case_manager, 
-                 pdf_file_manager=None, enhanced_pdf_manager=None, enhanced_directory_manager=None, on_save_callback=None):
+                 pdf_file_manager=None, enhanced_pdf_manager=None, enhanced_directory_manager=None, on_save_callback=None,
+                 document_pool=None):
         self.parent = parent
         self.case_id = case_id
         self.case_info = case_info
@@ -76,6 +78,9 @@ class EditCasePage:
         self.is_loading = False  # 加载状态标志
         self.pdf_cache = {}  # PDF预加载缓存
         self.pdf_images = []  # 初始化PDF图像引用列表
+        # 与主窗口共享的PDF句柄池，已打开的文件无需重新解析
+        self.document_pool = document_pool or get_document_pool()
+        self.held_documents = HeldDocuments(self.document_pool)  # 编辑窗口当前持有的句柄
         
         # 创建编辑窗口
         self.create_edit_window()
@@ -138,6 +143,19 @@ class EditCasePage:
                               cursor='hand2')
         cancel_btn.pack(side=tk.RIGHT, padx=(0, 5))
         
+    def acquire_pdf_document(self, file_path, backend='fitz'):
+        """从共享句柄池获取PDF文档（主窗口已打开时直接复用），编辑窗口打开PDF均经由此方法"""
+        return self.held_documents.acquire(file_path, backend)
+    
+    def release_pdf_documents(self):
+        """释放编辑窗口持有的所有PDF句柄"""
+        self.held_documents.release_all()
+    
+    def on_closing(self):
+        """关闭编辑窗口"""
+        self.release_pdf_documents()
+        self.edit_window.destroy()
+    
     def get_pdf_file_id_by_path(self, file_path):
         """根据文件路径获取PDF文件ID - 修复版本"""
         try:
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+渐变按钮
+按钮背景按(尺寸, 配色)预先渲染为PhotoImage并在所有按钮间共享，
+悬停时只切换图片和文字字体，不再重建画布元素
+"""
+
+import tkinter as tk
+from PIL import Image, ImageDraw, ImageTk
+
+# 按钮配色：主体色、底部圆角色、渐变起始RGB、渐变衰减量
+NORMAL_PALETTE = ('#FF8C00', '#E67E00', (255, 140), 20)
+HOVER_PALETTE = ('#FF7F00', '#CC6600', (255, 127), 15)
+
+NORMAL_FONT = ('Segoe UI Emoji', 20)
+HOVER_FONT = ('Segoe UI Emoji', 22)
+
+CANVAS_BG = '#f8f9fa'
+CORNER_RADIUS = 8
+
+# {(width, height, palette): PhotoImage}
+_image_cache = {}
+
+
+def render_gradient_image(width, height, palette, radius=CORNER_RADIUS):
+    """用PIL渲染圆角渐变背景（与原画布绘制效果一致）"""
+    body_color, bottom_color, (start_r, start_g), fade = palette
+    image = Image.new('RGB', (width, height), CANVAS_BG)
+    draw = ImageDraw.Draw(image)
+
+    # 主体矩形
+    draw.rectangle([radius, 0, width - radius, height], fill=body_color)
+    draw.rectangle([0, radius, width, height - radius], fill=body_color)
+
+    # 四个圆角
+    draw.ellipse([0, 0, radius * 2, radius * 2], fill=body_color)
+    draw.ellipse([width - radius * 2, 0, width, radius * 2], fill=body_color)
+    draw.ellipse([0, height - radius * 2, radius * 2, height], fill=bottom_color)
+    draw.ellipse([width - radius * 2, height - radius * 2, width, height], fill=bottom_color)
+
+    # 上半部分渐变
+    half = height // 2
+    for i in range(half):
+        alpha = i / half
+        r = int(start_r - alpha * fade)
+        g = int(start_g - alpha * fade)
+        draw.line([radius, i, width - radius - 1, i], fill=(r, g, 0))
+
+    return image
+
+
+def get_gradient_image(width, height, palette):
+    """获取缓存的背景图片，首次请求时渲染"""
+    key = (width, height, palette)
+    photo = _image_cache.get(key)
+    if photo is None:
+        photo = ImageTk.PhotoImage(render_gradient_image(width, height, palette))
+        _image_cache[key] = photo
+    return photo
+
+
+def clear_gradient_image_cache():
+    """清空背景图片缓存（Tk根窗口销毁后图片失效）"""
+    _image_cache.clear()
+
+
+def create_gradient_button(parent, text, command, width=60, height=45):
+    """创建带渐变效果的美观按钮
+
+    整个生命周期只创建两个画布元素：背景图片和文字。
+    """
+    canvas = tk.Canvas(parent, width=width, height=height,
+                       highlightthickness=0, bd=0, bg=CANVAS_BG)
+
+    normal_image = get_gradient_image(width, height, NORMAL_PALETTE)
+    hover_image = get_gradient_image(width, height, HOVER_PALETTE)
+
+    background = canvas.create_image(0, 0, image=normal_image, anchor='nw')
+    label = canvas.create_text(width // 2, height // 2, text=text,
+                               font=NORMAL_FONT, fill='white',
+                               anchor='center')
+
+    # 保持图片引用，避免被垃圾回收
+    canvas.gradient_images = (normal_image, hover_image)
+
+    def on_click(event):
+        command()
+
+    def on_enter(event):
+        canvas.itemconfigure(background, image=hover_image)
+        canvas.itemconfigure(label, font=HOVER_FONT)
+
+    def on_leave(event):
+        canvas.itemconfigure(background, image=normal_image)
+        canvas.itemconfigure(label, font=NORMAL_FONT)
+
+    canvas.bind('<Button-1>', on_click)
+    canvas.bind('<Enter>', on_enter)
+    canvas.bind('<Leave>', on_leave)
+    canvas.config(cursor='hand2')
+
+    return canvas
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多关键词命中高亮
+每次查询只构建一次Aho-Corasick自动机，在缓存的逐页单词框文本上一遍扫描找出所有关键词，
+并换算为页面坐标中的高亮矩形。可视页面立即计算，其余页面在空闲回调中逐页补齐
+"""
+
+from bisect import bisect_right
+from collections import OrderedDict, deque
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pdf_document_pool import get_document_pool
+
+# 缓存单词框的页面数上限
+DEFAULT_MAX_PAGES = 500
+# 各关键词的高亮颜色（按关键词顺序循环使用）
+HIGHLIGHT_COLORS = ('#FFEB3B', '#80DEEA', '#FFAB91', '#C5E1A5', '#CE93D8')
+
+
+class KeywordAutomaton:
+    """Aho-Corasick多模式匹配自动机"""
+
+    def __init__(self, terms: Iterable[str], case_sensitive: bool = False):
+        self.case_sensitive = case_sensitive
+        self.terms = [term for term in dict.fromkeys(t.strip() for t in terms) if term]
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[int]] = [[]]
+
+        for index, term in enumerate(self.terms):
+            state = 0
+            for char in self._normalize(term):
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                state = next_state
+            self._output[state].append(index)
+        self._lengths = [len(self._normalize(term)) for term in self.terms]
+        self._build_failure_links()
+
+    def _normalize(self, text: str) -> str:
+        """大小写归一，保持长度不变以便命中位置与原文对应"""
+        if self.case_sensitive:
+            return text
+        lowered = text.lower()
+        if len(lowered) == len(text):
+            return lowered
+        # 少数字符（如'İ'）小写后变长，逐字处理
+        return ''.join(char if len(char.lower()) != 1 else char.lower() for char in text)
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def find_all(self, text: str) -> Iterator[Tuple[int, int, int]]:
+        """一遍扫描返回所有命中 (起始位置, 结束位置, 关键词序号)，允许重叠"""
+        goto, fail, output, lengths = self._goto, self._fail, self._output, self._lengths
+        state = 0
+        for position, char in enumerate(self._normalize(text)):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for index in output[state]:
+                yield position + 1 - lengths[index], position + 1, index
+
+
+class PageWords:
+    """一页的单词框及拼接后的页面文本
+
+    同一行的单词以空格连接，行之间以换行连接，word_starts[i]是第i个单词在文本中的起始位置。
+    """
+
+    def __init__(self, words: List[Tuple]):
+        self.boxes: List[Tuple[float, float, float, float]] = []
+        self.lines: List[Tuple[int, int]] = []
+        self.word_starts: List[int] = []
+        parts = []
+        position = 0
+        previous_line = None
+        for x0, y0, x1, y1, word, block_no, line_no, _ in words:
+            line = (block_no, line_no)
+            if previous_line is not None:
+                parts.append(' ' if line == previous_line else '\n')
+                position += 1
+            previous_line = line
+            self.word_starts.append(position)
+            self.boxes.append((x0, y0, x1, y1))
+            self.lines.append(line)
+            parts.append(word)
+            position += len(word)
+        self.text = ''.join(parts)
+        self.words = [word[4] for word in words]
+
+    def match_rects(self, start: int, end: int) -> List[Tuple[float, float, float, float]]:
+        """文本区间 [start, end) 对应的矩形，同一行内相邻的单词合并为一个矩形
+
+        命中只覆盖单词的一部分时（中文单词框常是整段文字），按字符比例截取单词框。
+        """
+        rects = []
+        current_line = None
+        first = max(bisect_right(self.word_starts, start) - 1, 0)
+        for index in range(first, len(self.word_starts)):
+            word_start = self.word_starts[index]
+            if word_start >= end:
+                break
+            word_length = len(self.words[index])
+            covered_from = max(start - word_start, 0)
+            covered_to = min(end - word_start, word_length)
+            if covered_to <= covered_from:
+                continue
+            x0, y0, x1, y1 = self.boxes[index]
+            char_width = (x1 - x0) / max(word_length, 1)
+            rect = (x0 + covered_from * char_width, y0, x0 + covered_to * char_width, y1)
+            if rects and self.lines[index] == current_line:
+                last = rects[-1]
+                rects[-1] = (min(last[0], rect[0]), min(last[1], rect[1]),
+                             max(last[2], rect[2]), max(last[3], rect[3]))
+            else:
+                rects.append(rect)
+            current_line = self.lines[index]
+        return rects
+
+
+class WordBoxCache:
+    """按 (文件, 页) 缓存单词框，多次查询共享"""
+
+    def __init__(self, document_pool=None, max_pages: int = DEFAULT_MAX_PAGES):
+        self.document_pool = document_pool or get_document_pool()
+        self.max_pages = max_pages
+        self._pages: OrderedDict = OrderedDict()
+
+    def get(self, file_path: str, page_index: int) -> PageWords:
+        key = (file_path, page_index)
+        page_words = self._pages.get(key)
+        if page_words is not None:
+            self._pages.move_to_end(key)
+            return page_words
+
+        with self.document_pool.open_document(file_path, 'fitz') as document:
+            page_words = PageWords(document[page_index].get_text('words'))
+        self._pages[key] = page_words
+        while len(self._pages) > self.max_pages:
+            self._pages.popitem(last=False)
+        return page_words
+
+    def invalidate(self, file_path: str):
+        """文件内容变化后丢弃其缓存"""
+        for key in [key for key in self._pages if key[0] == file_path]:
+            del self._pages[key]
+
+
+class HitHighlighter:
+    """查询命中高亮
+
+    结果为 {页序号: [(x0, y0, x1, y1, 颜色, 关键词)]}，坐标为未缩放的页面坐标。
+    on_page_ready(file_path, page_index, rects) 在每页计算完成后调用。
+    """
+
+    def __init__(self, root, word_cache: WordBoxCache = None,
+                 on_page_ready: Optional[Callable] = None):
+        self.root = root
+        self.word_cache = word_cache or WordBoxCache()
+        self.on_page_ready = on_page_ready
+        self.automaton: Optional[KeywordAutomaton] = None
+        self.file_path = None
+        self.results: Dict[int, List[Tuple]] = {}
+        self._pending: List[int] = []
+        self._job = None
+
+    def set_query(self, terms: Iterable[str], file_path: str, page_count: int,
+                  visible_pages: Iterable[int] = ()):
+        """开始新的查询：可视页面立即计算，其余页面排队在空闲时计算"""
+        self.cancel()
+        self.automaton = KeywordAutomaton(terms)
+        self.file_path = file_path
+        self.results = {}
+        if not self.automaton.terms:
+            return
+
+        visible = [page for page in visible_pages if 0 <= page < page_count]
+        for page_index in visible:
+            self._highlight_page(page_index)
+        # 其余页面按与可视页面的距离排序，邻近页面先算好
+        anchor = visible[0] if visible else 0
+        self._pending = sorted((page for page in range(page_count) if page not in self.results),
+                               key=lambda page: abs(page - anchor))
+        self._schedule()
+
+    def prioritize(self, page_index: int):
+        """翻到尚未计算的页面时立即计算该页"""
+        if self.automaton and page_index in self._pending:
+            self._pending.remove(page_index)
+            self._highlight_page(page_index)
+
+    def get_page_highlights(self, file_path: str, page_index: int) -> Optional[List[Tuple]]:
+        """获取页面的高亮矩形，尚未计算时返回None"""
+        if file_path != self.file_path or not self.automaton:
+            return None
+        if page_index not in self.results:
+            self.prioritize(page_index)
+        return self.results.get(page_index)
+
+    def hit_counts(self) -> Dict[str, int]:
+        """已计算页面中各关键词的命中数"""
+        counts = {term: 0 for term in (self.automaton.terms if self.automaton else [])}
+        for rects in self.results.values():
+            for *_, term in rects:
+                counts[term] += 1
+        return counts
+
+    def cancel(self):
+        """取消未完成的后台计算"""
+        if self._job:
+            self.root.after_cancel(self._job)
+            self._job = None
+        self._pending = []
+
+    def clear(self):
+        """清除查询和高亮"""
+        self.cancel()
+        self.automaton = None
+        self.results = {}
+
+    def _highlight_page(self, page_index: int):
+        page_words = self.word_cache.get(self.file_path, page_index)
+        rects = []
+        for start, end, term_index in self.automaton.find_all(page_words.text):
+            color = HIGHLIGHT_COLORS[term_index % len(HIGHLIGHT_COLORS)]
+            term = self.automaton.terms[term_index]
+            rects.extend((*rect, color, term) for rect in page_words.match_rects(start, end))
+        self.results[page_index] = rects
+        if self.on_page_ready:
+            self.on_page_ready(self.file_path, page_index, rects)
+
+    def _schedule(self):
+        if self._pending and self._job is None:
+            self._job = self.root.after_idle(self._process_next)
+
+    def _process_next(self):
+        """每次空闲回调只计算一页，保持界面响应"""
+        self._job = None
+        if not self._pending or not self.automaton:
+            return
+        page_index = self._pending.pop(0)
+        try:
+            self._highlight_page(page_index)
+        except Exception as e:
+            print(f"计算命中高亮失败: {e}")
+        self._schedule()
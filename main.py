@@ -7,8 +7,31 @@ import pdfplumber
 import fitz  # PyMuPDF
 from PIL import Image, ImageTk
 import io
-from database_config import DatabaseManager, CaseManager, DirectoryManager
-from database_config_enhanced import EnhancedCaseManager, PDFFileManager, EnhancedDirectoryManager
+import threading
+from database_config import DatabaseManager, UserManager, CaseManager, DirectoryManager
+from database_config_enhanced import (EnhancedCaseManager, PDFFileManager, EnhancedDirectoryManager,
+                                      ChangeFeedManager, PageFingerprintManager, AnnotationManager,
+                                      TableTocManager)
+from pdf_document_pool import get_document_pool, HeldDocuments
+from gradient_button import create_gradient_button
+from page_preprocess import preprocess_page
+from page_fingerprint import fingerprint_pdf, skippable_pages
+from pdf_tile_renderer import TiledPageViewer, TileCache
+from hit_highlighter import HitHighlighter, WordBoxCache
+from annotation_index import AnnotationStore
+from directory_index import DirectoryIndex
+from case_export import build_export_plan, export_order, CaseBundleExporter
+from table_toc import extract_table_toc
+from preload_scheduler import PreloadScheduler
+from case_purge import CasePurgeJob
+from case_archive import CaseArchiver
+from write_behind import WriteBehindQueue
+from change_feed import ChangeFeedPoller
+from stall_watchdog import StallWatchdog
+from warm_start import (save_snapshot, load_snapshot, is_snapshot_current, clear_snapshot,
+                        render_snapshot_pages, SNAPSHOT_ZOOM)
+from edit_case_page import EditCasePage
+from api_client import ApiClient, RemoteCaseManager, RemotePDFFileManager, RemoteDirectoryManager
 from page_manager import PageManager, UIComponents, FileManager, ChatManager, TOCManager
 
 class ToolTip:
@@ -51,7 +74,7 @@ class ToolTip:
 # CaseInfoDialog类已删除，功能已整合到页面上的卷宗信息框中
 
 class PDFChatApp:
-    def __init__(self, root, current_user=None, session_token=None, db_manager=None):
+    def __init__(self, root, current_user=None, session_token=None, db_manager=None, api_base_url=None):
         self.root = root
         self.root.title("律师办案智能助手")
         self.root.geometry("1200x800")
@@ -68,18 +91,72 @@ class PDFChatApp:
             self.db_manager = DatabaseManager()
             self.db_manager.connect()
         
+        # 登录时间、操作日志等非关键写入由后台线程批量写入（使用独立连接）
+        self.write_behind = WriteBehindQueue(self._create_background_db_manager)
+        self.write_behind.start()
+        self.user_manager = UserManager(self.db_manager, write_behind=self.write_behind)
         self.case_manager = CaseManager(self.db_manager)
         self.directory_manager = DirectoryManager(self.db_manager)
-        # 初始化增强版管理器
-        self.enhanced_case_manager = EnhancedCaseManager(self.db_manager)
-        self.pdf_file_manager = PDFFileManager(self.db_manager)
-        self.enhanced_directory_manager = EnhancedDirectoryManager(self.db_manager)
+        # 初始化增强版管理器；配置了服务地址时改用共享服务端（共享缓存和连接池）
+        self.api_client = ApiClient(api_base_url) if api_base_url else None
+        if self.api_client:
+            self.enhanced_case_manager = RemoteCaseManager(self.api_client)
+            self.pdf_file_manager = RemotePDFFileManager(self.api_client)
+            self.enhanced_directory_manager = RemoteDirectoryManager(self.api_client)
+        else:
+            self.enhanced_case_manager = EnhancedCaseManager(self.db_manager)
+            self.pdf_file_manager = PDFFileManager(self.db_manager)
+            self.enhanced_directory_manager = EnhancedDirectoryManager(self.db_manager)
+        # 变更订阅：其他客户端修改卷宗后只失效受影响的缓存（服务模式由服务端共享缓存负责）
+        self.change_feed_manager = None if self.api_client else ChangeFeedManager(self.db_manager)
+        self.change_feed_poller = None
+        if self.change_feed_manager:
+            self.change_feed_poller = ChangeFeedPoller(self.root, self.change_feed_manager)
+            self.change_feed_poller.subscribe('pdf_directories', self._on_directories_changed)
+            self.change_feed_poller.subscribe('cases', self._on_case_changed)
+        # 页面指纹（空白页、重复页）按内容哈希保存在本地库，服务模式下不使用
+        self.page_fingerprint_manager = None if self.api_client else PageFingerprintManager(self.db_manager)
+        # 尚无指纹的文件在预加载完成后由低优先级任务逐个计算，不推迟首屏预览
+        self.fingerprint_pending = []
+        self._fingerprint_thread = None
+        self._fingerprint_stop = threading.Event()
+        # 表格式目录的提取结果同样按内容哈希缓存
+        self.table_toc_manager = None if self.api_client else TableTocManager(self.db_manager)
+        # 页面批注（服务模式下暂不支持）
+        self.annotation_manager = None if self.api_client else AnnotationManager(self.db_manager)
+        self.annotation_store = None  # 当前文件的批注缓存和空间索引
+        self.unsaved_annotation_stores = []  # 关闭时未能写入的批注缓存，保留到后台重试成功
+        self.directory_index = DirectoryIndex()  # 当前卷宗目录标题的内存检索索引
+        self.case_exporter = None  # 正在进行的卷宗合并导出
+        # 已归档卷宗的文件在首次打开时逐个恢复（服务模式由服务端管理存储）
+        self.case_archiver = None if self.api_client else CaseArchiver(self.db_manager)
         self.current_case_id = None  # 当前选中的卷宗ID
+        self.current_case_info = None  # 当前卷宗详情
         self.current_batch_case_id = None  # 当前批量上传的卷宗ID
         self.current_pdf_file_id = None  # 当前加载的PDF文件ID
         self.is_loading = False  # 加载状态标志
-        self.pdf_cache = {}  # PDF预加载缓存 {file_name: {case_id, images, toc_data}}
+        # PDF预加载缓存 {file_name: {case_id, pdf_file_id, images, page_indexes, crop_boxes, zoom, toc_data}}
+        # 图像像素 (x, y) 对应页面坐标 ((x + 裁边left) / zoom, (y + 裁边top) / zoom)，未裁边时crop_box为None
+        self.pdf_cache = {}
         self.all_files_loaded = False  # 所有文件是否已预加载完成
+        # 预加载调度器：按当前文件→目录相邻文件→其余文件的顺序后台加载
+        self.preload_scheduler = PreloadScheduler(self.root, self._preload_pdf_file,
+                                                  on_loaded=self._on_pdf_preloaded,
+                                                  on_progress=self._on_preload_progress)
+        self.document_pool = get_document_pool()  # 进程级PDF句柄池，编辑窗口共享同一句柄
+        self.held_documents = HeldDocuments(self.document_pool)  # 主窗口当前持有的句柄
+        self.tile_cache = TileCache()  # 分块渲染的图块缓存，跨页面和文件共享
+        self.tiled_viewer = None  # 当前的分块页面查看器
+        self.page_canvas = None  # 阅卷页面显示PDF页面的画布（由页面布局创建，打开分块查看器时记录）
+        self.current_page_index = 0  # 当前文件显示的页序号
+        self.warm_start_state = None  # 启动快照中恢复的状态（卷宗、文件、页码、目录和页面图像）
+        # 搜索命中高亮：单词框按页缓存，多次查询共享
+        self.hit_highlighter = HitHighlighter(self.root, WordBoxCache(self.document_pool),
+                                              on_page_ready=self._on_highlights_ready)
+        
+        # 后台分批清理软删除的卷宗（使用独立连接）
+        self.case_purge_job = CasePurgeJob(self._create_background_db_manager)
+        self.case_purge_job.start()
         
         # 页面管理
         self.current_page = "case_list"  # 当前页面：case_list(阅卷) 或 add_case(添加案件)
@@ -95,6 +172,10 @@ class PDFChatApp:
         # 设置窗口关闭协议
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
         
+        # 主线程卡顿监测：界面无响应时记录调用栈，退出时导出报告
+        self.stall_watchdog = StallWatchdog(self.root)
+        self.stall_watchdog.start()
+        
         # 设置窗口图标和样式
         self.setup_styles()
         
@@ -107,96 +188,514 @@ class PDFChatApp:
         # 初始化PDF图像引用列表
         self.pdf_images = []
         
+        # 先按上次关闭时的快照恢复界面，再在后台核对最新数据
+        self.root.after_idle(self.restore_warm_start)
+        
     def create_gradient_button(self, parent, text, command, width=60, height=45):
-        """创建带渐变效果的美观按钮"""
-        # 创建Canvas作为按钮背景
-        canvas = tk.Canvas(parent, width=width, height=height, 
-                          highlightthickness=0, bd=0, bg='#f8f9fa')
-        
-        # 绘制渐变背景
-        def draw_gradient():
-            canvas.delete("all")
-            
-            # 绘制圆角矩形背景
-            radius = 8
-            # 主体矩形
-            canvas.create_rectangle(radius, 0, width-radius, height, 
-                                  fill='#FF8C00', outline='#FF8C00')
-            canvas.create_rectangle(0, radius, width, height-radius, 
-                                  fill='#FF8C00', outline='#FF8C00')
-            
-            # 四个圆角
-            canvas.create_oval(0, 0, radius*2, radius*2, 
-                             fill='#FF8C00', outline='#FF8C00')
-            canvas.create_oval(width-radius*2, 0, width, radius*2, 
-                             fill='#FF8C00', outline='#FF8C00')
-            canvas.create_oval(0, height-radius*2, radius*2, height, 
-                             fill='#E67E00', outline='#E67E00')
-            canvas.create_oval(width-radius*2, height-radius*2, width, height, 
-                             fill='#E67E00', outline='#E67E00')
-            
-            # 添加渐变效果
-            for i in range(height//2):
-                alpha = i / (height//2)
-                r = int(255 - alpha * 20)
-                g = int(140 - alpha * 20)
-                color = f"#{r:02x}{g:02x}00"
-                canvas.create_line(radius, i, width-radius, i, fill=color, width=1)
-            
-            # 添加文字 - 使用更大的字体确保完整显示
-            canvas.create_text(width//2, height//2, text=text, 
-                             font=('Segoe UI Emoji', 20), fill='white',
-                             anchor='center')
-        
-        draw_gradient()
-        
-        # 绑定点击事件
-        def on_click(event):
-            command()
-        
-        # 绑定悬停效果
-        def on_enter(event):
-            canvas.delete("all")
-            
-            # 悬停时的圆角矩形背景
-            radius = 8
-            canvas.create_rectangle(radius, 0, width-radius, height, 
-                                  fill='#FF7F00', outline='#FF7F00')
-            canvas.create_rectangle(0, radius, width, height-radius, 
-                                  fill='#FF7F00', outline='#FF7F00')
-            
-            # 四个圆角 - 悬停效果
-            canvas.create_oval(0, 0, radius*2, radius*2, 
-                             fill='#FF7F00', outline='#FF7F00')
-            canvas.create_oval(width-radius*2, 0, width, radius*2, 
-                             fill='#FF7F00', outline='#FF7F00')
-            canvas.create_oval(0, height-radius*2, radius*2, height, 
-                             fill='#CC6600', outline='#CC6600')
-            canvas.create_oval(width-radius*2, height-radius*2, width, height, 
-                             fill='#CC6600', outline='#CC6600')
-            
-            # 添加高亮渐变
-            for i in range(height//2):
-                alpha = i / (height//2)
-                r = int(255 - alpha * 15)
-                g = int(127 - alpha * 15)
-                color = f"#{r:02x}{g:02x}00"
-                canvas.create_line(radius, i, width-radius, i, fill=color, width=1)
-            
-            # 文字稍微放大
-            canvas.create_text(width//2, height//2, text=text, 
-                             font=('Segoe UI Emoji', 22), fill='white',
-                             anchor='center')
-        
-        def on_leave(event):
-            draw_gradient()
-        
-        canvas.bind('<Button-1>', on_click)
-        canvas.bind('<Enter>', on_enter)
-        canvas.bind('<Leave>', on_leave)
-        canvas.config(cursor='hand2')
-        
-        return canvas
+        """创建带渐变效果的美观按钮（背景图片按尺寸缓存共享，悬停只切换图片）"""
+        return create_gradient_button(parent, text, command, width=width, height=height)
+
+    def acquire_pdf_document(self, file_path, backend='fitz'):
+        """从共享句柄池获取PDF文档，窗口关闭或切换文件时统一释放"""
+        return self.held_documents.acquire(file_path, backend)
+
+    def open_edit_case_page(self, case_id, case_info=None, on_save_callback=None):
+        """打开编辑卷宗窗口，与主窗口共用句柄池，主窗口已打开的文件无需重新解析"""
+        return EditCasePage(self.root, case_id, case_info or self.enhanced_case_manager.get_case_by_id(case_id),
+                            self.current_user, self.case_manager,
+                            pdf_file_manager=self.pdf_file_manager,
+                            enhanced_pdf_manager=self.pdf_file_manager,
+                            enhanced_directory_manager=self.enhanced_directory_manager,
+                            on_save_callback=on_save_callback,
+                            document_pool=self.document_pool)
+
+    def release_pdf_documents(self):
+        """释放当前窗口持有的所有PDF句柄"""
+        self.held_documents.release_all()
+
+    def open_tiled_page_view(self, canvas, file_path, page_index=0, zoom=1.0, preview=None, preview_zoom=None):
+        """以分块方式显示大幅页面，缩放和滚动只渲染可视区域"""
+        if self.tiled_viewer:
+            self.tiled_viewer.close()
+        self.page_canvas = canvas
+        self.current_page_index = page_index
+        options = {'preview': preview, 'preview_zoom': preview_zoom} if preview is not None else {}
+        self.tiled_viewer = TiledPageViewer(canvas, file_path, page_index=page_index, zoom=zoom,
+                                            document_pool=self.document_pool,
+                                            tile_cache=self.tile_cache,
+                                            highlight_provider=self.hit_highlighter.get_page_highlights,
+                                            **options)
+        return self.tiled_viewer
+
+    def highlight_search_terms(self, terms):
+        """高亮当前文件中所有关键词的命中：当前页立即显示，其余页面空闲时补齐"""
+        if not self.tiled_viewer:
+            return
+        viewer = self.tiled_viewer
+        self.hit_highlighter.set_query(terms, viewer.file_path, len(viewer.document),
+                                       visible_pages=[viewer.page_index])
+        viewer.set_highlights(self.hit_highlighter.results.get(viewer.page_index))
+
+    def clear_search_highlights(self):
+        """清除搜索高亮"""
+        self.hit_highlighter.clear()
+        if self.tiled_viewer:
+            self.tiled_viewer.set_highlights(None)
+
+    def open_annotations(self, case_id, pdf_file_id, visible_pages):
+        """切换文件时加载可视页面的批注，写入上一个文件未保存的修改"""
+        if not self.annotation_manager:
+            return None
+        self.unsaved_annotation_stores = [store for store in self.unsaved_annotation_stores
+                                          if store.has_pending_changes()]
+        if self.annotation_store and self.annotation_store.pdf_file_id != pdf_file_id:
+            if not self.annotation_store.close():
+                self.unsaved_annotation_stores.append(self.annotation_store)
+                messagebox.showwarning("提示", "上一个文件的批注修改未能保存，将在后台继续重试")
+            self.annotation_store = None
+        if self.annotation_store is None:
+            # 重新打开仍有未保存修改的文件时沿用原缓存，避免读到不含这些修改的旧批注
+            unsaved = [store for store in self.unsaved_annotation_stores if store.pdf_file_id == pdf_file_id]
+            if unsaved:
+                self.annotation_store = unsaved[0]
+                self.unsaved_annotation_stores.remove(unsaved[0])
+            else:
+                user_id = self.current_user['id'] if self.current_user else None
+                self.annotation_store = AnnotationStore(self.root, self.annotation_manager, case_id,
+                                                        pdf_file_id, user_id=user_id)
+        self.annotation_store.load_pages(visible_pages)
+        return self.annotation_store
+
+    def annotation_at(self, page_index, x, y):
+        """点击/悬停位置（页面坐标）处的批注"""
+        if not self.annotation_store:
+            return None
+        return self.annotation_store.hit_test(page_index, x, y)
+
+    def _on_highlights_ready(self, file_path, page_index, rects):
+        """某页命中计算完成，正在显示该页时立即绘制"""
+        viewer = self.tiled_viewer
+        if viewer and viewer.file_path == file_path and viewer.page_index == page_index:
+            viewer.set_highlights(rects)
+
+    def start_case_preload(self, case_id, pdf_files, current_file=None):
+        """切换卷宗时启动预加载，取消上一个卷宗的任务
+
+        pdf_files 可按任意顺序传入（get_pdf_files_by_case 按上传时间倒序），调度前按卷宗目录顺序
+        （与合并导出相同的 export_order）排列，"相邻文件"才是目录上的相邻文件。
+        """
+        pdf_files = export_order(pdf_files)
+        self.pdf_cache = {}
+        self.all_files_loaded = False
+        self.watch_case_changes(case_id)
+        self.log_operation('open_case', 'case', case_id)
+        if self.directory_index.case_id != case_id:
+            self.load_directory_index(case_id)
+        if current_file and current_file.get('archived'):
+            self.ensure_file_available(current_file, case_id)
+        self.fingerprint_pending = []
+        if self.page_fingerprint_manager:
+            for file_info in pdf_files:
+                content_hash = file_info.get('content_hash')
+                if content_hash and self.page_fingerprint_manager.has_page_fingerprints(content_hash):
+                    file_info['skip_pages'] = self.page_fingerprint_manager.get_skippable_pages(content_hash)
+        # 其余已归档文件不预加载，打开时再恢复
+        self.preload_scheduler.start_case(case_id, [f for f in pdf_files if not f.get('archived')],
+                                          current_file)
+
+    def select_pdf_file(self, file_info):
+        """用户切换到某个文件：已归档时先恢复，预加载队列改为以该文件为中心，返回可打开的路径"""
+        file_path = self.ensure_file_available(file_info)
+        if file_path is None:
+            return None
+        self.current_pdf_file_id = file_info['id']
+        self.preload_scheduler.prioritize(file_info)
+        return file_path
+
+    def ensure_file_available(self, file_info, case_id=None):
+        """打开文件前调用：已归档的文件解压恢复并移回目录和批注，返回可打开的路径"""
+        if not file_info.get('archived') or not self.case_archiver:
+            return file_info['file_path']
+        file_path = self.case_archiver.rehydrate_file(file_info['id'])
+        if file_path is None:
+            messagebox.showerror("错误", f"恢复已归档文件失败: {file_info.get('file_name')}")
+            return None
+        file_info['file_path'] = file_path
+        file_info['archived'] = False
+        case_id = case_id or self.current_case_id
+        if self.directory_index.case_id == case_id:
+            self.directory_index.replace_pdf_file(
+                file_info['id'], self.enhanced_directory_manager.get_pdf_directories(case_id, file_info['id']))
+        return file_path
+
+    def _preload_pdf_file(self, file_info, max_pages=3, zoom=0.5):
+        """后台线程：渲染文件前几页的低分辨率图像（独立句柄，不与主线程共享）
+
+        黑白扫描页降为灰度或二值图像并裁掉空白边距后再缓存；已有页面指纹时不预取空白页和重复页。
+        """
+        payload = {'images': [], 'page_indexes': [], 'crop_boxes': [], 'zoom': zoom}
+        skip_pages = file_info.get('skip_pages')
+        skipped = set(skip_pages['blank']) | set(skip_pages['duplicates']) if skip_pages else set()
+
+        size = 0
+        with fitz.open(file_info['file_path']) as doc:
+            for page_index in range(doc.page_count):
+                if len(payload['images']) >= max_pages:
+                    break
+                if page_index in skipped:
+                    continue
+                pix = doc[page_index].get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+                image, info = preprocess_page(Image.frombytes('RGB', (pix.width, pix.height), pix.samples))
+                payload['images'].append(image)
+                payload['page_indexes'].append(page_index)
+                # 裁边位置（渲染像素），用于将缓存图像上的位置换算回页面坐标
+                payload['crop_boxes'].append(info['crop_box'])
+                size += info['memory_after']
+        return payload, size
+
+    def _on_pdf_preloaded(self, file_info, payload):
+        """主线程：写入预加载缓存并补充目录数据，尚无页面指纹的文件排入指纹任务"""
+        if (file_info.get('skip_pages') is None and self.page_fingerprint_manager
+                and file_info.get('content_hash')):
+            self.fingerprint_pending.append(file_info)
+        toc_data = self.enhanced_directory_manager.get_pdf_directories(
+            self.preload_scheduler.case_id, file_info.get('id'))
+        self.pdf_cache[file_info['file_name']] = {
+            'case_id': self.preload_scheduler.case_id,
+            'pdf_file_id': file_info.get('id'),
+            'images': payload['images'],
+            'page_indexes': payload['page_indexes'],
+            'crop_boxes': payload['crop_boxes'],
+            'zoom': payload['zoom'],
+            'toc_data': toc_data
+        }
+
+    def cached_image_to_page(self, file_name, position, x, y):
+        """预加载缓存中第 position 张图像上的像素位置换算为页面坐标，返回 (页序号, x, y)"""
+        entry = self.pdf_cache[file_name]
+        crop_box = entry['crop_boxes'][position]
+        left, top = (crop_box[0], crop_box[1]) if crop_box else (0, 0)
+        return entry['page_indexes'][position], (x + left) / entry['zoom'], (y + top) / entry['zoom']
+
+    def _on_preload_progress(self, progress):
+        """预加载进度回调"""
+        self.is_loading = progress['loading'] > 0
+        self.all_files_loaded = progress['done']
+        if self.all_files_loaded:
+            self._start_fingerprint_job()
+
+    def _start_fingerprint_job(self):
+        """预加载全部完成后，在后台逐个计算尚无页面指纹的文件（切换卷宗或关闭窗口时停止）"""
+        if not self.fingerprint_pending or (self._fingerprint_thread and self._fingerprint_thread.is_alive()):
+            return
+        files, self.fingerprint_pending = self.fingerprint_pending, []
+        case_id = self.preload_scheduler.case_id
+
+        def run():
+            for file_info in files:
+                if self._fingerprint_stop.is_set() or self.preload_scheduler.case_id != case_id:
+                    break
+                try:
+                    fingerprints = fingerprint_pdf(file_info['file_path'])
+                except Exception as e:
+                    print(f"计算页面指纹失败: {e}")
+                    continue
+                self.root.after(0, self._on_fingerprints_ready, file_info, fingerprints)
+            if not self._fingerprint_stop.is_set():
+                # 计算期间新排入的文件
+                self.root.after(0, self._start_fingerprint_job)
+
+        self._fingerprint_thread = threading.Thread(target=run, name='page-fingerprint', daemon=True)
+        self._fingerprint_thread.start()
+
+    def _on_fingerprints_ready(self, file_info, fingerprints):
+        """主线程：保存页面指纹，之后的预取跳过空白页和重复页"""
+        if self._fingerprint_stop.is_set():
+            return
+        self.page_fingerprint_manager.save_page_fingerprints(file_info['content_hash'], fingerprints)
+        file_info['skip_pages'] = skippable_pages(fingerprints)
+
+    def is_file_loading(self, file_info):
+        """指定文件是否正在后台加载"""
+        return self.preload_scheduler.is_loading(file_info)
+
+    def log_operation(self, action, target_type=None, target_id=None, details=None):
+        """记录当前用户的操作日志（异步写入，不阻塞界面）"""
+        user_id = self.current_user['id'] if self.current_user else None
+        self.user_manager.log_operation(user_id, action, target_type, target_id, details)
+
+    def export_case_bundle(self, case_id, output_path, on_progress=None, on_done=None):
+        """后台合并导出卷宗PDF；on_progress(done, total, file_name)和on_done(report)在主线程回调"""
+        if self.case_exporter:
+            messagebox.showwarning("提示", "已有卷宗正在导出，请稍候")
+            return False
+        # 导出计划在主线程查询，导出线程只读写文件；已归档的文件先恢复，目录移回后才有书签
+        pdf_files = export_order(self.pdf_file_manager.get_pdf_files_by_case(case_id))
+        for file_info in pdf_files:
+            if file_info.get('archived') and self.ensure_file_available(file_info, case_id) is None:
+                return False
+        plan = build_export_plan(pdf_files, self.enhanced_directory_manager.get_pdf_directories(case_id))
+        case_info = self.enhanced_case_manager.get_case_by_id(case_id) or {}
+
+        def report_progress(done, total, file_name):
+            if on_progress:
+                self.root.after(0, on_progress, done, total, file_name)
+
+        self.case_exporter = CaseBundleExporter(plan, output_path, on_progress=report_progress,
+                                                title=case_info.get('case_name'))
+
+        def run():
+            report = self.case_exporter.export()
+            self.root.after(0, finish, report)
+
+        def finish(report):
+            self.case_exporter = None
+            self.log_operation('export_case', 'case', case_id,
+                               f"{report['pages']} 页, {report['elapsed']:.1f} 秒")
+            if on_done:
+                on_done(report)
+
+        threading.Thread(target=run, name='case-export', daemon=True).start()
+        return True
+
+    def detect_table_toc(self, file_info, on_done):
+        """后台提取文件中的表格式卷宗目录，完成后在主线程调用 on_done(目录行)
+
+        已缓存的结果直接返回；目录行可交给 save_case_directories 保存。
+        """
+        content_hash = file_info.get('content_hash')
+        if self.table_toc_manager and content_hash and self.table_toc_manager.has_table_toc(content_hash):
+            on_done(self.table_toc_manager.get_table_toc(content_hash))
+            return
+
+        def run():
+            entries = extract_table_toc(file_info['file_path'])
+            self.root.after(0, lambda: finish(entries))
+
+        def finish(entries):
+            # 缓存在主线程写入（与界面共用数据库连接），提取失败时不缓存
+            if entries is not None and self.table_toc_manager and content_hash:
+                self.table_toc_manager.save_table_toc(content_hash, entries)
+            on_done(entries or [])
+
+        threading.Thread(target=run, name='table-toc', daemon=True).start()
+
+    def watch_case_changes(self, case_id):
+        """关注当前卷宗的变更，取消对上一个卷宗的关注"""
+        if not self.change_feed_poller:
+            return
+        for watched_id in list(self.change_feed_poller.versions):
+            if watched_id != case_id:
+                self.change_feed_poller.unwatch(watched_id)
+        if case_id not in self.change_feed_poller.versions:
+            self.change_feed_poller.watch(case_id)
+
+    def load_directory_index(self, case_id):
+        """卷宗加载时构建目录标题索引，之后的输入检索不再访问数据库"""
+        self.directory_index = DirectoryIndex(case_id)
+        self.directory_index.build(self.enhanced_directory_manager.get_pdf_directories(case_id),
+                                   self.directory_manager.get_case_directories(case_id) or [])
+
+    def search_directory_titles(self, keyword, limit=20):
+        """目录搜索框的即时补全"""
+        return self.directory_index.search(keyword, limit=limit)
+
+    def save_pdf_directories(self, case_id, pdf_file_id, directories):
+        """保存文件目录并同步更新目录标题索引"""
+        success = self.enhanced_directory_manager.save_pdf_directories(case_id, pdf_file_id, directories)
+        if success:
+            self._mark_own_change(case_id, self.enhanced_directory_manager)
+        if success and self.directory_index.case_id == case_id:
+            self.directory_index.replace_pdf_file(
+                pdf_file_id, self.enhanced_directory_manager.get_pdf_directories(case_id, pdf_file_id))
+        return success
+
+    def update_case(self, case_id, case_data):
+        """更新卷宗信息，本客户端的修改不再经变更订阅回来重新加载"""
+        success = self.enhanced_case_manager.update_case(case_id, case_data)
+        if success:
+            self._mark_own_change(case_id, self.enhanced_case_manager)
+            if case_id == self.current_case_id:
+                self.current_case_info = self.enhanced_case_manager.get_case_by_id(case_id)
+        return success
+
+    def _mark_own_change(self, case_id, manager):
+        """本地写入后的版本号标记为已看到，避免轮询到自己的写入时失效本客户端的缓存"""
+        if self.change_feed_poller:
+            self.change_feed_poller.mark_seen(case_id, getattr(manager, 'last_change_version', None))
+
+    def save_case_directories(self, case_id, directory_data):
+        """保存卷宗目录并同步更新目录标题索引"""
+        success_count = self.directory_manager.save_directory(case_id, directory_data)
+        if self.directory_index.case_id == case_id:
+            self.directory_index.replace_case_directories(
+                self.directory_manager.get_case_directories(case_id) or [])
+        return success_count
+
+    def _on_directories_changed(self, case_id, pdf_file_id, operation):
+        """目录变更：只重新读取受影响文件的目录（pdf_file_id为None时为整个卷宗）"""
+        if self.directory_index.case_id == case_id:
+            if pdf_file_id is None:
+                self.load_directory_index(case_id)
+            else:
+                self.directory_index.replace_pdf_file(
+                    pdf_file_id, self.enhanced_directory_manager.get_pdf_directories(case_id, pdf_file_id))
+        for entry in self.pdf_cache.values():
+            if entry['case_id'] != case_id:
+                continue
+            if pdf_file_id is not None and entry.get('pdf_file_id') != pdf_file_id:
+                continue
+            entry['toc_data'] = self.enhanced_directory_manager.get_pdf_directories(
+                case_id, entry.get('pdf_file_id'))
+
+    def _on_case_changed(self, case_id, row_key, operation):
+        """卷宗信息变更：刷新当前卷宗详情"""
+        if case_id == self.current_case_id:
+            self.current_case_info = self.enhanced_case_manager.get_case_by_id(case_id)
+
+    def save_warm_start(self):
+        """关闭窗口时保存当前卷宗、文件、页码、目录和可视页面的低分辨率图像"""
+        if not self.current_case_id or not self.current_case_info:
+            clear_snapshot()
+            return
+        file_info, toc_data = None, []
+        for file_name, entry in self.pdf_cache.items():
+            if entry.get('pdf_file_id') == self.current_pdf_file_id:
+                file_info = {'id': self.current_pdf_file_id, 'file_name': file_name}
+                toc_data = entry.get('toc_data') or []
+                break
+        page_index, images = 0, {}
+        viewer = self.tiled_viewer
+        if viewer and viewer.document is not None:
+            file_info = dict(file_info or {'id': self.current_pdf_file_id,
+                                           'file_name': os.path.basename(viewer.file_path)},
+                             file_path=viewer.file_path)
+            page_index = viewer.page_index
+            images = render_snapshot_pages(viewer.document, page_index)
+        state = {
+            'user_id': self.current_user['id'] if self.current_user else None,
+            'saved_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'case': {'id': self.current_case_id,
+                     'case_name': self.current_case_info.get('case_name'),
+                     'updated_at': self.current_case_info.get('updated_at'),
+                     'version': self._get_case_version(self.current_case_id)},
+            'file': file_info,
+            'page_index': page_index,
+            'toc_data': toc_data
+        }
+        save_snapshot(state, images)
+
+    def _get_case_version(self, case_id):
+        """卷宗变更版本号（目录、文件、批注的写入都会递增）；服务模式下不可用，返回None"""
+        if not self.change_feed_manager:
+            return None
+        return self.change_feed_manager.get_case_version(case_id)
+
+    def restore_warm_start(self):
+        """启动后立即按快照恢复上次的卷宗、文件和页面，稍后核对卷宗是否已被修改"""
+        user_id = self.current_user['id'] if self.current_user else None
+        state = load_snapshot(user_id)
+        if not state or self.current_case_id:
+            return
+        self.warm_start_state = state
+        self.current_case_id = state['case']['id']
+        self.current_case_info = dict(state['case'])
+        file_info = state.get('file')
+        if file_info:
+            self.current_pdf_file_id = file_info.get('id')
+            page_indexes = sorted(state['images'])
+            self.pdf_cache[file_info['file_name']] = {
+                'case_id': self.current_case_id,
+                'pdf_file_id': file_info.get('id'),
+                'images': [state['images'][index] for index in page_indexes],
+                'page_indexes': page_indexes,
+                'crop_boxes': [None] * len(page_indexes),
+                'zoom': SNAPSHOT_ZOOM,
+                'toc_data': state.get('toc_data') or []
+            }
+        self.current_page_index = state.get('page_index') or 0
+        self._paint_warm_start(state)
+        # 让快照内容先绘制出来，再查询数据库
+        self.root.after(50, self._validate_warm_start)
+
+    def _paint_warm_start(self, state):
+        """在上次的页码打开查看器，快照中的低分辨率图像直接作为占位图显示，高清图块随后在空闲时渲染"""
+        file_path = (state.get('file') or {}).get('file_path')
+        image = state['images'].get(self.current_page_index)
+        if self.page_canvas is None or image is None or not file_path:
+            return
+        try:
+            self.open_tiled_page_view(self.page_canvas, file_path, page_index=self.current_page_index,
+                                      preview=ImageTk.PhotoImage(image), preview_zoom=SNAPSHOT_ZOOM)
+        except Exception as e:
+            print(f"恢复上次页面失败: {e}")
+
+    def _validate_warm_start(self):
+        """快照仍有效时按最新数据开始预加载，卷宗已被修改或删除时丢弃快照中的状态"""
+        state = self.warm_start_state
+        if not state or self.current_case_id != state['case']['id']:
+            return
+        case_info = self.enhanced_case_manager.get_case_by_id(self.current_case_id)
+        if not is_snapshot_current(state, case_info, self._get_case_version(self.current_case_id)):
+            clear_snapshot()
+            self.warm_start_state = None
+            self.pdf_cache = {}
+            self.current_pdf_file_id = None
+            self.current_page_index = 0
+            if self.tiled_viewer:
+                self.tiled_viewer.close()
+                self.tiled_viewer = None
+            if not case_info:
+                self.current_case_id = None
+                self.current_case_info = None
+                return
+        self.current_case_info = case_info
+        pdf_files = self.pdf_file_manager.get_pdf_files_by_case(self.current_case_id)
+        current_file = next((f for f in pdf_files if f['id'] == self.current_pdf_file_id), None)
+        snapshot_cache = self.pdf_cache
+        self.start_case_preload(self.current_case_id, pdf_files, current_file)
+        # 预加载完成前继续使用快照中的页面图像
+        for file_name, entry in snapshot_cache.items():
+            self.pdf_cache.setdefault(file_name, entry)
+
+    @staticmethod
+    def _create_background_db_manager():
+        """为后台任务创建独立的数据库连接"""
+        db_manager = DatabaseManager()
+        return db_manager if db_manager.connect() else None
+
+    def on_closing(self):
+        """关闭主窗口"""
+        stores = self.unsaved_annotation_stores + ([self.annotation_store] if self.annotation_store else [])
+        failed = [store for store in stores if not store.close()]
+        if failed and not messagebox.askyesno(
+                "批注未保存", f"{len(failed)} 个文件的批注修改未能写入数据库，退出将丢失这些修改。\n仍要退出吗？"):
+            return
+        self.stall_watchdog.stop()
+        report_path = self.stall_watchdog.export_report()
+        if report_path:
+            print(f"界面卡顿 {self.stall_watchdog.stall_count} 次，报告已保存: {report_path}")
+        self.case_purge_job.stop()
+        if self.case_exporter:
+            self.case_exporter.cancel()
+        if self.change_feed_poller:
+            self.change_feed_poller.stop()
+        self.preload_scheduler.shutdown()
+        self._fingerprint_stop.set()
+        self.hit_highlighter.cancel()
+        self.save_warm_start()
+        if self.tiled_viewer:
+            self.tiled_viewer.close()
+        self.release_pdf_documents()
+        self.document_pool.close_all()
+        if self.api_client:
+            self.api_client.close()
+        # 写入剩余的登录时间和操作日志
+        self.write_behind.stop()
+        metrics = self.write_behind.get_metrics()
+        print(f"后写队列: 写入 {metrics['written']} 条，丢弃 {metrics['dropped']} 条，丢失 {metrics['lost']} 条，"
+              f"平均延迟 {metrics['avg_latency'] * 1000:.0f} ms")
+        self.root.destroy()
 
     # 注意：这是main.py文件的前半部分
     # 完整的文件包含更多方法和功能
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+页面指纹：空白页和重复页检测
+对每页的低分辨率灰度渲染计算16x16的均值哈希(aHash)和差值哈希(dHash)，
+墨迹极少的页面标记为空白页，与前面某页哈希距离很近的页面标记为重复页。
+结果按文件内容哈希保存，每份内容只计算一次；预加载、OCR和全文索引据此跳过或共享工作
+"""
+
+from typing import Dict, List, Optional
+
+import numpy as np
+from PIL import Image
+
+# 计算指纹时的渲染宽度（像素）
+RENDER_WIDTH = 256
+# 判定为墨迹的最大灰度值
+INK_THRESHOLD = 160
+# 墨迹像素占比低于该值视为空白页（分隔页、背面空白）
+BLANK_INK_RATIO = 0.002
+# 哈希网格边长；8x8对版式相同的正文页区分不开，16x16时不同正文页的距离在35以上
+HASH_SIZE = 16
+# aHash+dHash共512位，汉明距离不超过该值视为重复页（覆盖重新扫描的轻微噪声和偏移）
+DUPLICATE_DISTANCE = 24
+# 分块比较时每块的页数，距离矩阵只保留 块大小 x 页数，避免页数平方的内存占用
+DISTANCE_BLOCK_PAGES = 256
+
+
+def render_page_thumbnails(file_path: str, width: int = RENDER_WIDTH) -> List[np.ndarray]:
+    """以灰度低分辨率渲染所有页面"""
+    import fitz  # PyMuPDF
+
+    thumbnails = []
+    with fitz.open(file_path) as doc:
+        for page in doc:
+            zoom = width / max(page.rect.width, 1)
+            pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY, alpha=False)
+            thumbnails.append(np.frombuffer(pix.samples, dtype=np.uint8)
+                              .reshape(pix.height, pix.stride)[:, :pix.width])
+    return thumbnails
+
+
+def _resize_all(thumbnails: List[np.ndarray], size) -> np.ndarray:
+    """把所有页面缩放到同一尺寸并堆叠为 (页数, 高, 宽) 数组"""
+    return np.stack([np.asarray(Image.fromarray(thumb).resize(size, Image.BILINEAR), dtype=np.int16)
+                     for thumb in thumbnails])
+
+
+def hash_bits(thumbnails: List[np.ndarray]) -> np.ndarray:
+    """计算所有页面的aHash和dHash，返回 (页数, 2 * HASH_SIZE²) 的0/1数组"""
+    bit_count = HASH_SIZE * HASH_SIZE
+    small = _resize_all(thumbnails, (HASH_SIZE, HASH_SIZE)).reshape(len(thumbnails), bit_count)
+    average_bits = small > small.mean(axis=1, keepdims=True)
+    wide = _resize_all(thumbnails, (HASH_SIZE + 1, HASH_SIZE))
+    difference_bits = (wide[:, :, 1:] > wide[:, :, :-1]).reshape(len(thumbnails), bit_count)
+    return np.concatenate([average_bits, difference_bits], axis=1).astype(np.uint8)
+
+
+def ink_ratios(thumbnails: List[np.ndarray]) -> np.ndarray:
+    """每页墨迹像素占比"""
+    return np.array([np.count_nonzero(thumb < INK_THRESHOLD) / max(thumb.size, 1)
+                     for thumb in thumbnails])
+
+
+def hamming_distances(bits: np.ndarray, other: np.ndarray = None) -> np.ndarray:
+    """bits 各行与 other（默认为 bits 本身）各行之间的汉明距离
+
+    矩阵乘法一次算出，float32走BLAS且对整数计数精确。
+    """
+    ones = bits.astype(np.float32)
+    other_ones = ones if other is None else other.astype(np.float32)
+    return (ones @ (1 - other_ones).T + (1 - ones) @ other_ones.T).astype(np.int32)
+
+
+def _bits_to_hex(bits: np.ndarray) -> str:
+    return np.packbits(bits).tobytes().hex()
+
+
+def fingerprint_thumbnails(thumbnails: List[np.ndarray]) -> List[Dict]:
+    """根据页面渲染计算指纹并标记空白页和重复页
+
+    返回每页一项: page_index, ahash, dhash, ink_ratio, is_blank,
+    duplicate_of（重复页对应的最早原始页序号，否则为None）
+    """
+    if not thumbnails:
+        return []
+
+    bits = hash_bits(thumbnails)
+    ratios = ink_ratios(thumbnails)
+    blank = ratios < BLANK_INK_RATIO
+
+    bit_count = HASH_SIZE * HASH_SIZE
+    pages = []
+    duplicate_of: List[Optional[int]] = [None] * len(thumbnails)
+    for index in range(len(thumbnails)):
+        if index % DISTANCE_BLOCK_PAGES == 0:
+            # 本块各页与其之前（含本块）所有页面的距离
+            block_end = min(index + DISTANCE_BLOCK_PAGES, len(thumbnails))
+            distances = hamming_distances(bits[index:block_end], bits[:block_end])
+        if not blank[index] and index:
+            # 与前面非空白页比较，指向最早的原始页
+            row = distances[index % DISTANCE_BLOCK_PAGES, :index]
+            candidates = np.flatnonzero((row <= DUPLICATE_DISTANCE) & ~blank[:index])
+            if candidates.size:
+                original = int(candidates[0])
+                duplicate_of[index] = duplicate_of[original] if duplicate_of[original] is not None else original
+        pages.append({
+            'page_index': index,
+            'ahash': _bits_to_hex(bits[index, :bit_count]),
+            'dhash': _bits_to_hex(bits[index, bit_count:]),
+            'ink_ratio': round(float(ratios[index]), 5),
+            'is_blank': bool(blank[index]),
+            'duplicate_of': duplicate_of[index]
+        })
+    return pages
+
+
+def fingerprint_pdf(file_path: str) -> List[Dict]:
+    """计算PDF文件所有页面的指纹"""
+    return fingerprint_thumbnails(render_page_thumbnails(file_path))
+
+
+def skippable_pages(fingerprints: List[Dict]) -> Dict:
+    """可跳过的页面: {'blank': {页序号}, 'duplicates': {页序号: 原始页序号}}
+
+    渲染预取和OCR可跳过空白页；重复页直接复用原始页的OCR和索引结果。
+    """
+    return {
+        'blank': {page['page_index'] for page in fingerprints if page['is_blank']},
+        'duplicates': {page['page_index']: page['duplicate_of'] for page in fingerprints
+                       if page['duplicate_of'] is not None}
+    }
+
+
+def ensure_file_fingerprints(fingerprint_manager, file_info: Dict) -> List[Dict]:
+    """获取文件的页面指纹，尚未计算过时计算并保存（按内容哈希，每份内容只计算一次）"""
+    content_hash = file_info.get('content_hash')
+    if content_hash and fingerprint_manager.has_page_fingerprints(content_hash):
+        return fingerprint_manager.get_page_fingerprints(content_hash)
+
+    try:
+        fingerprints = fingerprint_pdf(file_info['file_path'])
+    except Exception as e:
+        print(f"计算页面指纹失败: {e}")
+        return []
+    if content_hash:
+        fingerprint_manager.save_page_fingerprints(content_hash, fingerprints)
+    return fingerprints
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PDF文档句柄池
+进程内共享已打开的PDF文档，避免主窗口、编辑窗口和提取器重复解析同一文件
+"""
+
+import os
+import mmap
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+# 空闲句柄的默认上限，超出后按LRU顺序关闭
+DEFAULT_MAX_IDLE = 8
+
+
+class _PooledDocument:
+    """池中的单个文档句柄"""
+
+    def __init__(self, key: Tuple[str, str], document, file_obj=None, mapped=None, mtime: float = 0):
+        self.key = key
+        self.document = document
+        self.file_obj = file_obj
+        self.mapped = mapped
+        self.mtime = mtime
+        self.ref_count = 0
+        self.last_used = time.monotonic()
+
+    def close(self):
+        """关闭文档及其底层映射"""
+        for resource in (self.document, self.mapped, self.file_obj):
+            close = getattr(resource, 'close', None)
+            if close is None:
+                continue
+            try:
+                close()
+            except Exception as e:
+                print(f"关闭PDF句柄失败: {e}")
+        self.document = None
+        self.mapped = None
+        self.file_obj = None
+
+
+class PDFDocumentPool:
+    """PDF文档句柄池
+
+    - fitz: MuPDF按路径打开，本身即按需从文件读取，不复制整个文件
+    - pdfplumber / pypdf2: 通过mmap映射文件后作为流传入，避免读入内存副本
+
+    句柄按引用计数管理，引用归零后进入空闲LRU队列，超过max_idle时关闭最久未用的句柄。
+    注意：同一句柄并非线程安全，跨线程渲染时调用方需自行串行化。
+    """
+
+    BACKENDS = ('fitz', 'pdfplumber', 'pypdf2')
+
+    def __init__(self, max_idle: int = DEFAULT_MAX_IDLE):
+        self.max_idle = max_idle
+        self._lock = threading.RLock()
+        self._entries: Dict[Tuple[str, str], _PooledDocument] = {}
+        self._idle: "OrderedDict[Tuple[str, str], None]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _make_key(file_path: str, backend: str) -> Tuple[str, str]:
+        return (os.path.normcase(os.path.abspath(file_path)), backend)
+
+    def acquire(self, file_path: str, backend: str = 'fitz'):
+        """获取文档句柄（引用计数+1），使用完毕后必须调用release"""
+        if backend not in self.BACKENDS:
+            raise ValueError(f"不支持的PDF后端: {backend}")
+
+        key = self._make_key(file_path, backend)
+        mtime = os.path.getmtime(key[0])
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry.mtime != mtime and entry.ref_count == 0:
+                # 文件已被修改，丢弃旧句柄
+                self._discard(key)
+                entry = None
+
+            if entry:
+                self.hits += 1
+            else:
+                self.misses += 1
+                entry = self._open(key, mtime)
+                self._entries[key] = entry
+
+            entry.ref_count += 1
+            entry.last_used = time.monotonic()
+            self._idle.pop(key, None)
+            return entry.document
+
+    def release(self, file_path: str, backend: str = 'fitz'):
+        """释放文档句柄（引用计数-1），归零后进入空闲队列"""
+        key = self._make_key(file_path, backend)
+        with self._lock:
+            entry = self._entries.get(key)
+            if not entry:
+                return
+            entry.ref_count = max(0, entry.ref_count - 1)
+            entry.last_used = time.monotonic()
+            if entry.ref_count == 0:
+                self._idle[key] = None
+                self._idle.move_to_end(key)
+                self._evict_idle()
+
+    @contextmanager
+    def open_document(self, file_path: str, backend: str = 'fitz'):
+        """以上下文管理器方式使用池中的文档句柄"""
+        document = self.acquire(file_path, backend)
+        try:
+            yield document
+        finally:
+            self.release(file_path, backend)
+
+    def is_open(self, file_path: str, backend: str = 'fitz') -> bool:
+        """文档是否已有打开的句柄"""
+        with self._lock:
+            return self._make_key(file_path, backend) in self._entries
+
+    def close_idle(self):
+        """关闭所有空闲句柄"""
+        with self._lock:
+            for key in list(self._idle):
+                self._discard(key)
+
+    def close_all(self) -> int:
+        """关闭全部未被引用的句柄（程序退出时调用），返回仍被引用而未关闭的句柄数
+
+        仍被引用的句柄说明有窗口或后台任务未调用release，关闭会使其后续访问崩溃，只打印警告。
+        """
+        with self._lock:
+            in_use = []
+            for key, entry in list(self._entries.items()):
+                if entry.ref_count > 0:
+                    in_use.append(f"{os.path.basename(key[0])}({key[1]}, 引用 {entry.ref_count})")
+                    continue
+                self._discard(key)
+        if in_use:
+            print(f"⚠️ 仍有 {len(in_use)} 个PDF句柄被引用，未关闭: {', '.join(in_use)}")
+        return len(in_use)
+
+    def get_statistics(self) -> Dict:
+        """获取句柄池统计信息"""
+        with self._lock:
+            return {
+                'open_handles': len(self._entries),
+                'idle_handles': len(self._idle),
+                'in_use_handles': len(self._entries) - len(self._idle),
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+    def _open(self, key: Tuple[str, str], mtime: float) -> _PooledDocument:
+        file_path, backend = key
+
+        if backend == 'fitz':
+            import fitz  # PyMuPDF
+            return _PooledDocument(key, fitz.open(file_path), mtime=mtime)
+
+        file_obj = open(file_path, 'rb')
+        try:
+            mapped = mmap.mmap(file_obj.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            # 空文件或不支持映射的文件系统，退回普通文件流
+            mapped = None
+        stream = mapped if mapped is not None else file_obj
+
+        try:
+            if backend == 'pdfplumber':
+                import pdfplumber
+                document = pdfplumber.open(stream)
+            else:
+                import PyPDF2
+                document = PyPDF2.PdfReader(stream)
+        except Exception:
+            if mapped is not None:
+                mapped.close()
+            file_obj.close()
+            raise
+
+        return _PooledDocument(key, document, file_obj=file_obj, mapped=mapped, mtime=mtime)
+
+    def _discard(self, key: Tuple[str, str]):
+        entry = self._entries.pop(key, None)
+        self._idle.pop(key, None)
+        if entry:
+            entry.close()
+
+    def _evict_idle(self):
+        while len(self._idle) > self.max_idle:
+            oldest_key = next(iter(self._idle))
+            self._discard(oldest_key)
+
+
+class HeldDocuments:
+    """窗口持有的句柄列表：从共享池获取，窗口关闭或切换文件时统一释放"""
+
+    def __init__(self, document_pool: PDFDocumentPool):
+        self.document_pool = document_pool
+        self._held = []  # [(file_path, backend)]
+
+    def acquire(self, file_path: str, backend: str = 'fitz'):
+        document = self.document_pool.acquire(file_path, backend)
+        self._held.append((file_path, backend))
+        return document
+
+    def release_all(self):
+        while self._held:
+            file_path, backend = self._held.pop()
+            self.document_pool.release(file_path, backend)
+
+    def __len__(self):
+        return len(self._held)
+
+
+_document_pool: Optional[PDFDocumentPool] = None
+_document_pool_lock = threading.Lock()
+
+
+def get_document_pool() -> PDFDocumentPool:
+    """获取进程级共享的文档句柄池"""
+    global _document_pool
+    with _document_pool_lock:
+        if _document_pool is None:
+            _document_pool = PDFDocumentPool()
+        return _document_pool
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分块缩放渲染
+将页面按固定尺寸切块、按离散缩放级别渲染，只生成可视区域内的图块，
+缩放和滚动的开销与视口大小成正比，而不是与整页大小成正比
+"""
+
+import math
+import tkinter as tk
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import fitz  # PyMuPDF
+
+from pdf_document_pool import get_document_pool
+
+# 离散缩放级别，任意缩放值都吸附到最近的级别以提高缓存命中率
+ZOOM_LEVELS = (0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 4.0)
+# 图块边长（像素）
+TILE_SIZE = 256
+# 占位图使用的低分辨率缩放级别
+PREVIEW_ZOOM = 0.25
+# 缓存的高清图块上限
+DEFAULT_MAX_TILES = 256
+
+
+def snap_zoom(zoom: float) -> float:
+    """将缩放值吸附到最近的离散级别"""
+    return min(ZOOM_LEVELS, key=lambda level: abs(math.log(level / zoom)))
+
+
+def pixmap_to_photo(pixmap) -> tk.PhotoImage:
+    """将PyMuPDF像素图转换为Tk图片（PPM格式，无需经过PIL）"""
+    return tk.PhotoImage(data=pixmap.tobytes('ppm'))
+
+
+class TileCache:
+    """按(页码, 缩放级别, 列, 行)缓存已渲染图块的LRU缓存"""
+
+    def __init__(self, max_tiles: int = DEFAULT_MAX_TILES):
+        self.max_tiles = max_tiles
+        self._tiles: "OrderedDict[Tuple, tk.PhotoImage]" = OrderedDict()
+
+    def get(self, key: Tuple) -> Optional[tk.PhotoImage]:
+        photo = self._tiles.get(key)
+        if photo is not None:
+            self._tiles.move_to_end(key)
+        return photo
+
+    def put(self, key: Tuple, photo: tk.PhotoImage):
+        self._tiles[key] = photo
+        self._tiles.move_to_end(key)
+        while len(self._tiles) > self.max_tiles:
+            self._tiles.popitem(last=False)
+
+    def clear(self):
+        self._tiles.clear()
+
+    def __len__(self):
+        return len(self._tiles)
+
+
+class TiledPageViewer:
+    """在Canvas上分块显示单页PDF
+
+    可视图块先显示由低分辨率整页预览裁剪放大的占位图，随后在空闲回调中
+    逐块渲染高清图块替换占位图，不阻塞主循环。
+    highlight_provider(file_path, page_index) 返回页面坐标中的高亮矩形
+    [(x0, y0, x1, y1, 颜色, ...)]，尚未计算时返回None。
+    preview 为起始页已有的低分辨率整页图像（如启动快照，缩放比例 preview_zoom），
+    提供时直接用作该页的占位图，不再渲染预览。
+    """
+
+    def __init__(self, canvas: tk.Canvas, file_path: str, page_index: int = 0,
+                 zoom: float = 1.0, document_pool=None, tile_cache: TileCache = None,
+                 highlight_provider=None, preview=None, preview_zoom: float = PREVIEW_ZOOM):
+        self.canvas = canvas
+        self.file_path = file_path
+        self.document_pool = document_pool or get_document_pool()
+        self.document = self.document_pool.acquire(file_path, 'fitz')
+        self.tile_cache = tile_cache or TileCache()
+        self.highlight_provider = highlight_provider
+        self.highlights = []  # 当前页的高亮矩形（页面坐标）
+
+        self.page_index = page_index
+        self.zoom = snap_zoom(zoom)
+
+        self._tile_items: Dict[Tuple[int, int], int] = {}  # (列, 行) -> 画布元素ID
+        self._placeholders: Dict[Tuple[int, int], tk.PhotoImage] = {}
+        self._preview: Optional[tk.PhotoImage] = None  # 低分辨率整页预览
+        self._preview_zoom = PREVIEW_ZOOM
+        self._seed_preview = (page_index, preview, preview_zoom) if preview is not None else None
+        self._pending = []  # 等待渲染的图块 [(列, 行)]
+        self._render_job = None
+        self._generation = 0
+
+        self._configure_binding = self.canvas.bind('<Configure>', lambda event: self.refresh(), add='+')
+        self.set_page(page_index)
+
+    def set_page(self, page_index: int):
+        """切换页面"""
+        self.page_index = page_index
+        self._preview, self._preview_zoom = None, PREVIEW_ZOOM
+        if self._seed_preview and self._seed_preview[0] == page_index:
+            _, self._preview, self._preview_zoom = self._seed_preview
+        self._reset_view()
+        self.highlights = []
+        if self.highlight_provider:
+            self.highlights = self.highlight_provider(self.file_path, page_index) or []
+        self.refresh()
+        self._draw_highlights()
+
+    def set_zoom(self, zoom: float):
+        """切换缩放级别，保持视口中心位置不变"""
+        new_zoom = snap_zoom(zoom)
+        if new_zoom == self.zoom:
+            return
+
+        center_x, center_y = self._viewport_center()
+        ratio = new_zoom / self.zoom
+        self.zoom = new_zoom
+        self._reset_view()
+
+        width, height = self.page_size()
+        view_w = self.canvas.winfo_width()
+        view_h = self.canvas.winfo_height()
+        if width > view_w:
+            self.canvas.xview_moveto(max(0, center_x * ratio - view_w / 2) / width)
+        if height > view_h:
+            self.canvas.yview_moveto(max(0, center_y * ratio - view_h / 2) / height)
+        self.refresh()
+        self._draw_highlights()
+
+    def zoom_in(self):
+        higher = [level for level in ZOOM_LEVELS if level > self.zoom]
+        if higher:
+            self.set_zoom(higher[0])
+
+    def zoom_out(self):
+        lower = [level for level in ZOOM_LEVELS if level < self.zoom]
+        if lower:
+            self.set_zoom(lower[-1])
+
+    def xview(self, *args):
+        """水平滚动条回调"""
+        self.canvas.xview(*args)
+        self.refresh()
+
+    def yview(self, *args):
+        """垂直滚动条回调"""
+        self.canvas.yview(*args)
+        self.refresh()
+
+    def set_highlights(self, highlights):
+        """设置当前页的高亮矩形（页面坐标），None或空列表清除高亮"""
+        self.highlights = highlights or []
+        self._draw_highlights()
+
+    def page_size(self) -> Tuple[int, int]:
+        """当前缩放级别下页面的像素尺寸"""
+        rect = self.document[self.page_index].rect
+        return int(math.ceil(rect.width * self.zoom)), int(math.ceil(rect.height * self.zoom))
+
+    def refresh(self):
+        """根据当前视口放置可视图块，移除不可见图块"""
+        if self.document is None:
+            return
+        width, height = self.page_size()
+        self.canvas.configure(scrollregion=(0, 0, width, height))
+
+        visible = set(self._visible_tiles(width, height))
+
+        for tile in list(self._tile_items):
+            if tile not in visible:
+                self.canvas.delete(self._tile_items.pop(tile))
+                self._placeholders.pop(tile, None)
+
+        pending = []
+        for col, row in sorted(visible, key=lambda t: (t[1], t[0])):
+            photo = self.tile_cache.get(self._cache_key(col, row))
+            if photo is None:
+                pending.append((col, row))
+                if (col, row) in self._tile_items:
+                    continue
+                photo = self._placeholder(col, row)
+                self._placeholders[(col, row)] = photo
+            self._show_tile(col, row, photo)
+
+        self._pending = pending
+        self._schedule_render()
+
+    def close(self):
+        """释放句柄和画布元素"""
+        if self._render_job:
+            self.canvas.after_cancel(self._render_job)
+            self._render_job = None
+        self.canvas.delete('pdf_tile')
+        self.canvas.delete('pdf_highlight')
+        self._tile_items.clear()
+        self._placeholders.clear()
+        if self._configure_binding:
+            self._unbind_configure()
+        if self.document is not None:
+            self.document_pool.release(self.file_path, 'fitz')
+            self.document = None
+
+    def _unbind_configure(self):
+        """只移除本查看器的<Configure>绑定（Canvas.unbind带funcid时会清掉同一事件的全部绑定）"""
+        funcid, self._configure_binding = self._configure_binding, None
+        try:
+            script = self.canvas.bind('<Configure>')
+            remaining = '\n'.join(line for line in script.split('\n') if funcid not in line)
+            self.canvas.bind('<Configure>', remaining)
+            self.canvas.deletecommand(funcid)
+        except tk.TclError:
+            pass
+
+    def _reset_view(self):
+        # 取消旧视图排队中的渲染回调，否则refresh()会因_render_job非空而不再调度新图块
+        if self._render_job:
+            self.canvas.after_cancel(self._render_job)
+            self._render_job = None
+        self._generation += 1
+        self._pending = []
+        self.canvas.delete('pdf_tile')
+        self._tile_items.clear()
+        self._placeholders.clear()
+
+    def _cache_key(self, col: int, row: int) -> Tuple:
+        return (self.file_path, self.page_index, self.zoom, col, row)
+
+    def _viewport_center(self) -> Tuple[float, float]:
+        return (self.canvas.canvasx(self.canvas.winfo_width() / 2),
+                self.canvas.canvasy(self.canvas.winfo_height() / 2))
+
+    def _visible_tiles(self, width: int, height: int):
+        left = max(0, self.canvas.canvasx(0))
+        top = max(0, self.canvas.canvasy(0))
+        right = min(width, left + self.canvas.winfo_width())
+        bottom = min(height, top + self.canvas.winfo_height())
+
+        for row in range(int(top // TILE_SIZE), int(math.ceil(bottom / TILE_SIZE))):
+            for col in range(int(left // TILE_SIZE), int(math.ceil(right / TILE_SIZE))):
+                yield col, row
+
+    def _tile_clip(self, col: int, row: int) -> fitz.Rect:
+        """图块在页面坐标系（未缩放）中的区域"""
+        page_rect = self.document[self.page_index].rect
+        x0 = col * TILE_SIZE / self.zoom
+        y0 = row * TILE_SIZE / self.zoom
+        x1 = min(page_rect.width, (col + 1) * TILE_SIZE / self.zoom)
+        y1 = min(page_rect.height, (row + 1) * TILE_SIZE / self.zoom)
+        return fitz.Rect(x0, y0, x1, y1)
+
+    def _placeholder(self, col: int, row: int) -> tk.PhotoImage:
+        """从低分辨率整页预览中取出对应区域并放大作为占位图"""
+        if self._preview is not None and (self.zoom / self._preview_zoom) % 1:
+            # 传入的预览与当前缩放级别不成整数倍时改用自行渲染的预览
+            self._preview = None
+        if self._preview is None:
+            page = self.document[self.page_index]
+            pixmap = page.get_pixmap(matrix=fitz.Matrix(PREVIEW_ZOOM, PREVIEW_ZOOM), alpha=False)
+            self._preview = pixmap_to_photo(pixmap)
+            self._preview_zoom = PREVIEW_ZOOM
+
+        # 缩放级别均为PREVIEW_ZOOM的整数倍
+        factor = max(1, int(round(self.zoom / self._preview_zoom)))
+        # 按实际比例取整到预览像素，避免逐列累积偏移（factor为3、6时不能整除）
+        preview_tile = TILE_SIZE / factor
+        x0 = min(int(round(col * preview_tile)), self._preview.width() - 1)
+        y0 = min(int(round(row * preview_tile)), self._preview.height() - 1)
+        x1 = max(x0 + 1, min(int(round((col + 1) * preview_tile)), self._preview.width()))
+        y1 = max(y0 + 1, min(int(round((row + 1) * preview_tile)), self._preview.height()))
+
+        photo = tk.PhotoImage(width=(x1 - x0) * factor, height=(y1 - y0) * factor)
+        photo.tk.call(photo, 'copy', self._preview,
+                      '-from', x0, y0, x1, y1, '-zoom', factor, factor)
+        return photo
+
+    def _show_tile(self, col: int, row: int, photo: tk.PhotoImage):
+        item = self._tile_items.get((col, row))
+        if item is None:
+            self._tile_items[(col, row)] = self.canvas.create_image(
+                col * TILE_SIZE, row * TILE_SIZE, image=photo, anchor='nw', tags=('pdf_tile',))
+            if self.highlights:
+                self.canvas.tag_raise('pdf_highlight')
+        else:
+            self.canvas.itemconfigure(item, image=photo)
+
+    def _draw_highlights(self):
+        """按当前缩放级别绘制高亮（Canvas不支持半透明，用点画填充透出底下的文字）"""
+        self.canvas.delete('pdf_highlight')
+        for x0, y0, x1, y1, color, *_ in self.highlights:
+            self.canvas.create_rectangle(x0 * self.zoom, y0 * self.zoom, x1 * self.zoom, y1 * self.zoom,
+                                         fill=color, stipple='gray50', outline=color,
+                                         tags=('pdf_highlight',))
+
+    def _schedule_render(self):
+        if self._pending and self._render_job is None:
+            generation = self._generation
+            self._render_job = self.canvas.after_idle(lambda: self._render_next(generation))
+
+    def _render_next(self, generation: int):
+        """每次空闲回调只渲染一个图块，保持界面响应"""
+        self._render_job = None
+        if generation != self._generation:
+            self._schedule_render()
+            return
+        if not self._pending or self.document is None:
+            return
+
+        col, row = self._pending.pop(0)
+        if (col, row) in self._tile_items:
+            page = self.document[self.page_index]
+            pixmap = page.get_pixmap(matrix=fitz.Matrix(self.zoom, self.zoom),
+                                     clip=self._tile_clip(col, row), alpha=False)
+            photo = pixmap_to_photo(pixmap)
+            self.tile_cache.put(self._cache_key(col, row), photo)
+            self._placeholders.pop((col, row), None)
+            self._show_tile(col, row, photo)
+
+        self._schedule_render()
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+卷宗预加载调度器
+按访问可能性排序后台预加载卷宗内的PDF文件：当前文件优先，其次是目录顺序上的相邻文件，
+最后是其余文件。支持暂停、切换卷宗时取消、内存压力下限流，并提供逐文件的加载状态和进度
+"""
+
+import heapq
+import itertools
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+try:
+    import psutil
+except ImportError:  # psutil为可选依赖，缺失时只按缓存预算限流
+    psutil = None
+
+# 文件加载状态
+STATE_PENDING = 'pending'
+STATE_LOADING = 'loading'
+STATE_LOADED = 'loaded'
+STATE_FAILED = 'failed'
+STATE_CANCELLED = 'cancelled'
+
+# 预加载结果占用内存的默认预算
+DEFAULT_MEMORY_BUDGET = 512 * 1024 * 1024
+# 系统可用内存低于该值时暂停预加载（需要psutil）
+DEFAULT_MIN_FREE_MEMORY = 256 * 1024 * 1024
+# 主线程轮询结果队列的间隔（毫秒）
+POLL_INTERVAL_MS = 100
+# 内存压力下的退避间隔（秒）
+THROTTLE_SLEEP = 0.5
+
+
+class PreloadScheduler:
+    """卷宗预加载调度器
+
+    loader在后台线程中执行，签名为 loader(file_info) -> (payload, size_bytes)，不得访问Tk控件；
+    on_loaded(file_info, payload) 与 on_progress(progress) 通过root.after在主线程回调。
+    """
+
+    def __init__(self, root, loader: Callable, on_loaded: Callable = None,
+                 on_progress: Callable = None, key_func: Callable = None,
+                 memory_budget: int = DEFAULT_MEMORY_BUDGET,
+                 min_free_memory: int = DEFAULT_MIN_FREE_MEMORY):
+        self.root = root
+        self.loader = loader
+        self.on_loaded = on_loaded
+        self.on_progress = on_progress
+        self.key_func = key_func or (lambda file_info: file_info['file_name'])
+        self.memory_budget = memory_budget
+        self.min_free_memory = min_free_memory
+
+        self.case_id = None
+        self.states: Dict[str, str] = {}
+        self.loaded_sizes: Dict[str, int] = {}
+        self.memory_used = 0
+
+        self._lock = threading.Condition()
+        self._heap = []
+        self._counter = itertools.count()
+        self._file_infos: Dict[str, Dict] = {}
+        self._order: List[str] = []
+        self._generation = 0
+        self._paused = False
+        self._stopped = False
+        self._results = queue.Queue()
+        self._poll_job = None
+
+        self._worker = threading.Thread(target=self._run, name='pdf-preload', daemon=True)
+        self._worker.start()
+
+    # ---- 调度控制 ----
+
+    def start_case(self, case_id, files: List[Dict], current_file: Dict = None):
+        """开始预加载一个卷宗（files按目录顺序排列），取消上一个卷宗的剩余任务"""
+        with self._lock:
+            self._cancel_locked()
+            self.case_id = case_id
+            # 调用方会清空上一个卷宗的缓存，内存预算随之归零
+            self.states = {}
+            self.loaded_sizes = {}
+            self.memory_used = 0
+            self._order = [self.key_func(f) for f in files]
+            self._file_infos = {self.key_func(f): f for f in files}
+            for key in self._order:
+                self.states[key] = STATE_PENDING
+            current_key = self.key_func(current_file) if current_file else None
+            self._reprioritize_locked(current_key)
+            self._lock.notify_all()
+        self._ensure_polling()
+        self._report_progress()
+
+    def prioritize(self, file_info: Dict):
+        """用户切换到某个文件时，以该文件为中心重新排序待加载队列（不在本卷宗队列中的文件忽略）"""
+        with self._lock:
+            key = self.key_func(file_info)
+            if key not in self._file_infos:
+                return
+            self._reprioritize_locked(key)
+            self._lock.notify_all()
+        self._ensure_polling()
+
+    def pause(self):
+        """暂停预加载（正在加载的文件会完成）"""
+        with self._lock:
+            self._paused = True
+
+    def resume(self):
+        """恢复预加载"""
+        with self._lock:
+            self._paused = False
+            self._lock.notify_all()
+        self._ensure_polling()
+
+    def cancel(self):
+        """取消当前卷宗的所有待加载任务"""
+        with self._lock:
+            self._cancel_locked()
+        self._report_progress()
+
+    def release(self, file_info: Dict):
+        """调用方从缓存移除文件后调用，归还内存预算"""
+        key = self.key_func(file_info)
+        with self._lock:
+            self.memory_used -= self.loaded_sizes.pop(key, 0)
+            if self.states.get(key) == STATE_LOADED:
+                self.states[key] = STATE_PENDING
+            self._lock.notify_all()
+
+    def shutdown(self):
+        """停止后台线程"""
+        with self._lock:
+            self._stopped = True
+            self._cancel_locked()
+            self._lock.notify_all()
+        if self._poll_job:
+            self.root.after_cancel(self._poll_job)
+            self._poll_job = None
+
+    # ---- 状态查询 ----
+
+    def get_state(self, file_info: Dict) -> Optional[str]:
+        """获取文件的加载状态"""
+        return self.states.get(self.key_func(file_info))
+
+    def is_loading(self, file_info: Dict = None) -> bool:
+        """指定文件是否正在加载；不指定时返回是否有任何文件在加载"""
+        if file_info is not None:
+            return self.get_state(file_info) == STATE_LOADING
+        with self._lock:
+            return STATE_LOADING in self.states.values()
+
+    def get_progress(self) -> Dict:
+        """获取当前卷宗的预加载进度"""
+        with self._lock:
+            counts = {STATE_PENDING: 0, STATE_LOADING: 0, STATE_LOADED: 0,
+                      STATE_FAILED: 0, STATE_CANCELLED: 0}
+            for key in self._order:
+                counts[self.states.get(key, STATE_PENDING)] += 1
+            total = len(self._order)
+            finished = counts[STATE_LOADED] + counts[STATE_FAILED]
+            return {
+                'case_id': self.case_id,
+                'total': total,
+                'loaded': counts[STATE_LOADED],
+                'loading': counts[STATE_LOADING],
+                'pending': counts[STATE_PENDING],
+                'failed': counts[STATE_FAILED],
+                'done': total > 0 and finished == total,
+                'paused': self._paused,
+                'throttled': self._memory_pressure(),
+                'memory_used': self.memory_used
+            }
+
+    # ---- 内部实现 ----
+
+    def _cancel_locked(self):
+        self._generation += 1
+        self._heap = []
+        for key, state in self.states.items():
+            if state in (STATE_PENDING, STATE_LOADING):
+                self.states[key] = STATE_CANCELLED
+
+    def _reprioritize_locked(self, current_key: Optional[str]):
+        """优先级 = 与当前文件在目录顺序上的距离"""
+        center = self._order.index(current_key) if current_key in self._order else 0
+        self._heap = []
+        for index, key in enumerate(self._order):
+            if self.states.get(key) in (STATE_PENDING, STATE_CANCELLED):
+                self.states[key] = STATE_PENDING
+                priority = abs(index - center)
+                heapq.heappush(self._heap, (priority, next(self._counter), key))
+
+    def _memory_pressure(self) -> bool:
+        if self.memory_used >= self.memory_budget:
+            return True
+        if psutil is not None:
+            try:
+                return psutil.virtual_memory().available < self.min_free_memory
+            except Exception:
+                return False
+        return False
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._stopped and (self._paused or not self._heap):
+                    self._lock.wait()
+                if self._stopped:
+                    return
+                if self._memory_pressure():
+                    self._lock.wait(THROTTLE_SLEEP)
+                    continue
+
+                _, _, key = heapq.heappop(self._heap)
+                if self.states.get(key) != STATE_PENDING:
+                    continue
+                generation = self._generation
+                file_info = self._file_infos[key]
+                self.states[key] = STATE_LOADING
+
+            started = time.perf_counter()
+            try:
+                payload, size = self.loader(file_info)
+                error = None
+            except Exception as e:
+                payload, size, error = None, 0, e
+            elapsed = time.perf_counter() - started
+
+            with self._lock:
+                if generation != self._generation:
+                    # 加载期间卷宗已切换，丢弃结果
+                    continue
+                if error is None:
+                    self.states[key] = STATE_LOADED
+                    self.loaded_sizes[key] = size
+                    self.memory_used += size
+                else:
+                    self.states[key] = STATE_FAILED
+            self._results.put((generation, file_info, payload, error, elapsed))
+
+    def _ensure_polling(self):
+        if self._poll_job is None and not self._stopped:
+            self._poll_job = self.root.after(POLL_INTERVAL_MS, self._poll_results)
+
+    def _poll_results(self):
+        """在主线程中分发加载结果"""
+        self._poll_job = None
+        delivered = False
+        while True:
+            try:
+                generation, file_info, payload, error, elapsed = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if generation != self._generation:
+                continue
+            delivered = True
+            if error is not None:
+                print(f"预加载文件失败 {self.key_func(file_info)}: {error}")
+            elif self.on_loaded:
+                self.on_loaded(file_info, payload)
+
+        if delivered:
+            self._report_progress()
+        with self._lock:
+            active = bool(self._heap) or STATE_LOADING in self.states.values()
+        if active or not self._results.empty():
+            self._ensure_polling()
+
+    def _report_progress(self):
+        if self.on_progress:
+            self.on_progress(self.get_progress())
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+界面主线程卡顿监测
+主线程通过 root.after 定时发送心跳，监测线程发现心跳超时后抓取主线程的Python调用栈，
+卡顿期间持续采样；心跳恢复后按卡顿时长计入直方图，并按调用位置汇总，导出卡顿最严重的代码路径
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from cache_paths import CACHE_ROOT
+
+# 心跳间隔（毫秒）
+DEFAULT_HEARTBEAT_MS = 100
+# 心跳晚到超过该时长（毫秒）视为卡顿
+DEFAULT_THRESHOLD_MS = 250
+# 卡顿期间的调用栈采样间隔（秒）
+DEFAULT_SAMPLE_INTERVAL = 0.05
+# 卡顿时长直方图的桶上界（毫秒）；只使用大于卡顿阈值的上界，第一个桶从阈值起
+HISTOGRAM_BUCKETS_MS = (500, 1000, 2000, 5000, 10000, float('inf'))
+# 汇总调用位置时保留的栈帧数（从最内层的本项目代码算起）
+SIGNATURE_DEPTH = 4
+# 每个调用位置保留的示例调用栈
+MAX_STACK_LINES = 40
+
+# 卡顿报告目录
+REPORT_DIR = os.path.join(os.path.dirname(CACHE_ROOT), 'stall_reports')
+
+_PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class StallWatchdog:
+    """主线程卡顿监测
+
+    start()/stop() 须在主线程调用；监测线程只读取心跳时间和主线程的栈帧，不访问Tk。
+    """
+
+    def __init__(self, root, heartbeat_ms: int = DEFAULT_HEARTBEAT_MS,
+                 threshold_ms: int = DEFAULT_THRESHOLD_MS,
+                 sample_interval: float = DEFAULT_SAMPLE_INTERVAL):
+        self.root = root
+        self.heartbeat_ms = heartbeat_ms
+        self.threshold_ms = threshold_ms
+        self.sample_interval = sample_interval
+
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._heartbeat_job = None
+        self._main_thread_id = threading.main_thread().ident
+        self._last_beat = time.monotonic()
+        self._samples: Counter = Counter()  # 当前卡顿期间：调用位置 -> 采样次数
+        self._sample_stacks: Dict[tuple, List[str]] = {}
+
+        self.buckets_ms = tuple(upper for upper in HISTOGRAM_BUCKETS_MS if upper > threshold_ms)
+        self.histogram = [0] * len(self.buckets_ms)
+        self.offenders: Dict[tuple, Dict] = {}  # 调用位置 -> {count, total_ms, max_ms, stack}
+        self.stall_count = 0
+        self.total_stall_ms = 0.0
+        self.started_at = None
+
+    # ---------- 启停 ----------
+
+    def start(self):
+        """开始发送心跳并启动监测线程"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._main_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self.started_at = datetime.now()
+        self._heartbeat_job = self.root.after(self.heartbeat_ms, self._heartbeat)
+        self._thread = threading.Thread(target=self._monitor, name='stall-watchdog', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2):
+        """停止监测"""
+        self._stop_event.set()
+        if self._heartbeat_job:
+            try:
+                self.root.after_cancel(self._heartbeat_job)
+            except Exception:
+                pass
+            self._heartbeat_job = None
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    # ---------- 主线程 ----------
+
+    def _heartbeat(self):
+        now = time.monotonic()
+        with self._lock:
+            late_ms = (now - self._last_beat) * 1000 - self.heartbeat_ms
+            self._last_beat = now
+            if late_ms >= self.threshold_ms:
+                self._record_stall(late_ms)
+            self._samples.clear()
+            self._sample_stacks.clear()
+        if not self._stop_event.is_set():
+            self._heartbeat_job = self.root.after(self.heartbeat_ms, self._heartbeat)
+
+    # ---------- 监测线程 ----------
+
+    def _monitor(self):
+        threshold = self.threshold_ms / 1000
+        expected = self.heartbeat_ms / 1000
+        while not self._stop_event.wait(self.sample_interval):
+            # 锁内只取栈帧；解析调用栈要读取源码行，放在锁外，避免主线程的心跳等待
+            with self._lock:
+                beat = self._last_beat
+                if time.monotonic() - beat - expected < threshold:
+                    continue
+                frame = sys._current_frames().get(self._main_thread_id)
+            if frame is None:
+                continue
+            stack = traceback.extract_stack(frame)
+            del frame
+            signature = _signature(stack)
+            with self._lock:
+                if self._last_beat != beat:
+                    # 解析期间心跳已恢复，该采样不属于下一次卡顿
+                    continue
+                self._samples[signature] += 1
+                if signature not in self._sample_stacks:
+                    self._sample_stacks[signature] = traceback.format_list(stack[-MAX_STACK_LINES:])
+
+    def _record_stall(self, stall_ms: float):
+        """心跳恢复时记录一次卡顿，时长归入采样最多的调用位置（持有锁时调用）"""
+        self.stall_count += 1
+        self.total_stall_ms += stall_ms
+        for bucket, upper in enumerate(self.buckets_ms):
+            if stall_ms < upper:
+                self.histogram[bucket] += 1
+                break
+
+        if self._samples:
+            signature = self._samples.most_common(1)[0][0]
+            stack = self._sample_stacks[signature]
+        else:
+            # 卡顿在第一次采样前结束，无法确定位置
+            signature, stack = ('(未采样到调用栈)',), []
+        offender = self.offenders.setdefault(signature, {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                                                         'stack': stack})
+        offender['count'] += 1
+        offender['total_ms'] += stall_ms
+        if stall_ms > offender['max_ms']:
+            offender['max_ms'] = stall_ms
+            offender['stack'] = stack
+
+    # ---------- 报告 ----------
+
+    def _bucket_label(self, index: int) -> str:
+        upper = self.buckets_ms[index]
+        lower = self.buckets_ms[index - 1] if index else self.threshold_ms
+        return f"≥{lower:.0f} ms" if upper == float('inf') else f"{lower:.0f}-{upper:.0f} ms"
+
+    def get_report(self, top: int = 10) -> Dict:
+        """卡顿统计：直方图和按总卡顿时长排序的调用位置"""
+        with self._lock:
+            ranked = sorted(self.offenders.items(), key=lambda item: item[1]['total_ms'], reverse=True)
+            histogram = {self._bucket_label(index): count for index, count in enumerate(self.histogram)}
+            return {
+                'started_at': self.started_at.strftime('%Y-%m-%d %H:%M:%S') if self.started_at else None,
+                'threshold_ms': self.threshold_ms,
+                'stall_count': self.stall_count,
+                'total_stall_ms': round(self.total_stall_ms, 1),
+                'histogram': histogram,
+                'offenders': [{
+                    'location': ' <- '.join(signature),
+                    'count': offender['count'],
+                    'total_ms': round(offender['total_ms'], 1),
+                    'max_ms': round(offender['max_ms'], 1),
+                    'stack': ''.join(offender['stack'])
+                } for signature, offender in ranked[:top]]
+            }
+
+    def format_report(self, top: int = 10) -> str:
+        """可读的卡顿报告文本"""
+        report = self.get_report(top)
+        lines = [f"界面卡顿报告（阈值 {report['threshold_ms']} ms，自 {report['started_at']} 起）",
+                 f"卡顿 {report['stall_count']} 次，累计 {report['total_stall_ms'] / 1000:.1f} 秒", '',
+                 '卡顿时长分布:']
+        for label, count in report['histogram'].items():
+            lines.append(f"  {label:>14}: {count}")
+        for rank, offender in enumerate(report['offenders'], 1):
+            lines += ['', f"#{rank} 累计 {offender['total_ms']:.0f} ms，{offender['count']} 次，"
+                          f"最长 {offender['max_ms']:.0f} ms",
+                      f"  位置: {offender['location']}", offender['stack'].rstrip()]
+        return '\n'.join(lines)
+
+    def export_report(self, report_dir: str = REPORT_DIR, top: int = 20) -> Optional[str]:
+        """将报告写入文本和JSON文件，没有卡顿时不写入；返回文本报告路径"""
+        if not self.stall_count:
+            return None
+        try:
+            os.makedirs(report_dir, exist_ok=True)
+            base = os.path.join(report_dir, f"stalls_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+            with open(base + '.txt', 'w', encoding='utf-8') as f:
+                f.write(self.format_report(top))
+            with open(base + '.json', 'w', encoding='utf-8') as f:
+                json.dump(self.get_report(top), f, ensure_ascii=False, indent=2)
+            return base + '.txt'
+        except Exception as e:
+            print(f"导出卡顿报告失败: {e}")
+            return None
+
+
+def _signature(stack: traceback.StackSummary) -> tuple:
+    """调用位置：最内层的若干个本项目栈帧（跳过Tk和标准库内部），不含行内容"""
+    frames = [frame for frame in stack if frame.filename.startswith(_PROJECT_DIR)
+              and not frame.filename.endswith('stall_watchdog.py')]
+    if not frames:
+        frames = list(stack)
+    return tuple(f"{os.path.basename(frame.filename)}:{frame.lineno} {frame.name}"
+                 for frame in reversed(frames[-SIGNATURE_DEPTH:]))
+
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+表格式卷宗目录提取
+卷内目录常排成带框线的表格，按行匹配正文的方式会把跨行的文件名称和页号读错。
+提取分两步：先用PyMuPDF读取每页文字和矢量线条，找出含目录表头且有足够横竖框线的候选页
+（以及紧随其后、同样有框线的续页）；再只对这些候选页调用pdfplumber的extract_tables，
+按表头识别序号、文件名称、页号列，转换为 save_directory 的目录行。
+结果按文件内容哈希缓存，相同内容的文件只提取一次
+"""
+
+import re
+from typing import Dict, List, Optional, Tuple
+
+# 目录标题关键字
+TITLE_KEYWORDS = ('卷内目录', '目录')
+# 表头关键字 -> 列
+HEADER_KEYWORDS = {
+    'sequence_number': ('序号', '顺序号', '编号'),
+    'file_name': ('文件名称', '文书名称', '材料名称', '题名', '名称', '内容'),
+    'page_number': ('页号', '页码', '页次', '起止页', '起页'),
+    'end_page': ('止页', '终止页', '终页'),
+}
+# 没有目录标题时，至少命中的表头关键字数
+MIN_HEADER_HITS = 2
+# 视为表格所需的最少横线、竖线数（线段或细长矩形）
+MIN_HORIZONTAL_RULES = 4
+MIN_VERTICAL_RULES = 3
+# 细长矩形的最大厚度（点），超过的视为色块而非框线
+RULE_THICKNESS = 2.0
+# 线段最短长度（点），排除下划线、勾选框等短线
+MIN_RULE_LENGTH = 20.0
+
+_PAGE_RANGE = re.compile(r'(\d+)\s*(?:[-—–~～至]\s*(\d+))?')
+
+
+def _count_rules(page) -> Dict[str, int]:
+    """统计页面矢量绘图中的横线和竖线"""
+    horizontal = vertical = 0
+    for drawing in page.get_drawings():
+        for item in drawing['items']:
+            if item[0] == 'l':
+                p1, p2 = item[1], item[2]
+                if abs(p1.y - p2.y) < 1 and abs(p1.x - p2.x) >= MIN_RULE_LENGTH:
+                    horizontal += 1
+                elif abs(p1.x - p2.x) < 1 and abs(p1.y - p2.y) >= MIN_RULE_LENGTH:
+                    vertical += 1
+            elif item[0] == 're':
+                rect = item[1]
+                if rect.height <= RULE_THICKNESS and rect.width >= MIN_RULE_LENGTH:
+                    horizontal += 1
+                elif rect.width <= RULE_THICKNESS and rect.height >= MIN_RULE_LENGTH:
+                    vertical += 1
+                elif rect.width >= MIN_RULE_LENGTH and rect.height >= MIN_RULE_LENGTH and not drawing.get('fill'):
+                    # 描边矩形（单元格边框）按四条边计
+                    horizontal += 2
+                    vertical += 2
+    return {'horizontal': horizontal, 'vertical': vertical}
+
+
+def _is_ruled(rules: Dict[str, int]) -> bool:
+    return rules['horizontal'] >= MIN_HORIZONTAL_RULES and rules['vertical'] >= MIN_VERTICAL_RULES
+
+
+def _header_hits(text: str) -> int:
+    compact = re.sub(r'\s+', '', text)
+    return sum(1 for keywords in HEADER_KEYWORDS.values() if any(k in compact for k in keywords))
+
+
+def find_candidate_pages(file_path: str, max_pages: Optional[int] = None) -> List[int]:
+    """第一步：用文字和矢量线条找出可能是表格目录的页面（页序号从0开始）
+
+    只读取页面文字（不做版面分析），命中目录关键字的页面才读取矢量绘图；
+    候选页之后连续的有框线页面视为目录续页。
+    """
+    import fitz  # PyMuPDF
+
+    candidates = []
+    with fitz.open(file_path) as doc:
+        page_count = doc.page_count if max_pages is None else min(doc.page_count, max_pages)
+        for page_index in range(page_count):
+            page = doc[page_index]
+            text = page.get_text()
+            compact = re.sub(r'\s+', '', text)
+            is_continuation = bool(candidates) and candidates[-1] == page_index - 1
+            has_keywords = (_header_hits(text) >= MIN_HEADER_HITS
+                            or (any(k in compact for k in TITLE_KEYWORDS) and _header_hits(text) >= 1))
+            if not has_keywords and not is_continuation:
+                continue
+            if _is_ruled(_count_rules(page)):
+                candidates.append(page_index)
+    return candidates
+
+
+def _parse_page_range(value: str):
+    """'12'、'12-15'、'12～15' -> (起始页, 终止页或None)"""
+    match = _PAGE_RANGE.search(value or '')
+    if not match:
+        return None, None
+    return match.group(1), match.group(2)
+
+
+def _match_header(row: List[Optional[str]]) -> Optional[Dict[str, int]]:
+    """识别表头行，返回 {列: 列序号}；不是表头时返回None"""
+    columns = {}
+    for index, cell in enumerate(row):
+        compact = re.sub(r'\s+', '', cell or '')
+        if not compact:
+            continue
+        # 页号先于止页匹配（'起止页'同时包含'止页'）
+        for column in ('sequence_number', 'page_number', 'end_page', 'file_name'):
+            if column not in columns and any(k in compact for k in HEADER_KEYWORDS[column]):
+                columns[column] = index
+                break
+    if 'file_name' in columns and ('page_number' in columns or 'sequence_number' in columns):
+        return columns
+    return None
+
+
+def _cell(row: List[Optional[str]], index: Optional[int]) -> str:
+    if index is None or index >= len(row):
+        return ''
+    return re.sub(r'\s+', ' ', row[index] or '').strip()
+
+
+def tables_to_directories(tables: List[Tuple[int, List[List[Optional[str]]]]], page_count: int = 0) -> List[Dict]:
+    """将按页顺序排列的 (页序号, 表格) 转换为目录行 {sequence_number, file_name, page_number, end_page}
+
+    紧接下一页的表格没有表头时视为续页，沿用上一张表的列；未给出终止页的行取下一行起始页的前一页，
+    最后一行取文件页数（未知时留空）。
+    """
+    entries = []
+    columns = None
+    last_page = None
+    for page_index, table in tables:
+        if last_page is not None and page_index > last_page + 1:
+            columns = None
+        last_page = page_index
+        for row in table:
+            header = _match_header(row)
+            if header:
+                columns = header
+                continue
+            if not columns:
+                continue
+            file_name = _cell(row, columns.get('file_name'))
+            start, end = _parse_page_range(_cell(row, columns.get('page_number')))
+            if columns.get('end_page') is not None:
+                end = _parse_page_range(_cell(row, columns['end_page']))[0] or end
+            if not file_name:
+                # 文件名称跨行时pdfplumber会拆成没有序号和页号的行，并入上一行
+                if entries and not start:
+                    continuation = ' '.join(c for c in (_cell(row, i) for i in range(len(row))) if c)
+                    if continuation:
+                        entries[-1]['file_name'] += continuation
+                continue
+            entries.append({
+                'sequence_number': _cell(row, columns.get('sequence_number')),
+                'file_name': file_name,
+                'page_number': start or '',
+                'end_page': end or ''
+            })
+
+    for index, entry in enumerate(entries):
+        if entry['end_page'] or not entry['page_number']:
+            continue
+        next_start = next((e['page_number'] for e in entries[index + 1:] if e['page_number']), None)
+        if next_start:
+            entry['end_page'] = str(max(int(next_start) - 1, int(entry['page_number'])))
+        elif page_count:
+            entry['end_page'] = str(max(page_count, int(entry['page_number'])))
+    return entries
+
+
+def extract_tables(file_path: str, pages: Optional[List[int]] = None) -> List[Tuple[int, List[List[Optional[str]]]]]:
+    """第二步：用pdfplumber提取指定页面（None为全部页面）的表格，返回 [(页序号, 表格)]"""
+    import pdfplumber
+
+    tables = []
+    with pdfplumber.open(file_path) as pdf:
+        page_indexes = range(len(pdf.pages)) if pages is None else pages
+        for page_index in page_indexes:
+            page = pdf.pages[page_index]
+            tables.extend((page_index, table) for table in page.extract_tables())
+            page.flush_cache()
+    return tables
+
+
+def extract_table_toc(file_path: str, content_hash: Optional[str] = None, cache_manager=None,
+                      max_pages: Optional[int] = None) -> List[Dict]:
+    """提取表格式目录，返回 save_directory 的目录行；没有表格目录时返回空列表，提取失败时返回None
+
+    cache_manager 为 TableTocManager 时按 content_hash 读写缓存（失败的结果不缓存）。
+    """
+    if cache_manager and content_hash and cache_manager.has_table_toc(content_hash):
+        return cache_manager.get_table_toc(content_hash)
+
+    try:
+        import fitz  # PyMuPDF
+
+        candidates = find_candidate_pages(file_path, max_pages)
+        entries = []
+        if candidates:
+            with fitz.open(file_path) as doc:
+                page_count = doc.page_count
+            entries = tables_to_directories(extract_tables(file_path, candidates), page_count)
+    except Exception as e:
+        print(f"提取表格目录失败: {e}")
+        return None
+
+    if cache_manager and content_hash:
+        cache_manager.save_table_toc(content_hash, entries)
+    return entries
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+启动快照
+关闭窗口时保存最后打开的卷宗、文件、页码、目录列表和可视页面的低分辨率图像，
+下次启动时先按快照绘制界面，再在后台读取最新数据；卷宗的 updated_at、变更版本号或文件的大小、
+修改时间与快照不一致时丢弃快照，以数据库中的数据为准
+"""
+
+import json
+import os
+import shutil
+from typing import Dict, List, Optional
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+from cache_paths import CACHE_ROOT
+
+# 快照目录
+SNAPSHOT_DIR = os.path.join(os.path.dirname(CACHE_ROOT), 'warm_start')
+# 快照格式版本，格式变化时旧快照直接忽略
+SNAPSHOT_VERSION = 1
+# 保存的低分辨率页面图像数（当前页及其后几页）
+MAX_SNAPSHOT_PAGES = 2
+# 页面图像的缩放比例
+SNAPSHOT_ZOOM = 0.5
+
+_STATE_FILE = 'snapshot.json'
+
+
+def file_signature(file_path: str) -> Optional[List]:
+    """文件的大小和修改时间，用于判断快照中的页面图像是否仍然有效"""
+    try:
+        stat = os.stat(file_path)
+        return [stat.st_size, int(stat.st_mtime)]
+    except (OSError, TypeError):
+        return None
+
+
+def render_snapshot_pages(document, page_index: int, zoom: float = SNAPSHOT_ZOOM) -> Dict[int, Image.Image]:
+    """渲染当前页及其后几页的低分辨率图像（document 为已打开的 fitz 文档）"""
+    images = {}
+    try:
+        for index in range(page_index, min(page_index + MAX_SNAPSHOT_PAGES, document.page_count)):
+            pix = document[index].get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+            images[index] = Image.frombytes('RGB', (pix.width, pix.height), pix.samples)
+    except Exception as e:
+        print(f"渲染快照页面失败: {e}")
+    return images
+
+
+def save_snapshot(state: Dict, images: Dict[int, Image.Image], snapshot_dir: str = SNAPSHOT_DIR) -> bool:
+    """写入快照（先写临时目录再整体替换，中途退出不会留下不完整的快照）
+
+    state 至少包含 user_id、case（含 id、updated_at 和变更版本号 version）、file（含 id 和 file_path）和 page_index，
+    images 为 {页序号: 低分辨率图像}。
+    """
+    temp_dir = snapshot_dir + '.tmp'
+    try:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        os.makedirs(temp_dir)
+        pages = []
+        for page_index, image in sorted(images.items())[:MAX_SNAPSHOT_PAGES]:
+            name = f"page_{page_index}.png"
+            image.save(os.path.join(temp_dir, name), optimize=False)
+            pages.append({'page_index': page_index, 'image': name})
+
+        file_info = dict(state.get('file') or {})
+        file_info['signature'] = file_signature(file_info.get('file_path'))
+        data = dict(state, version=SNAPSHOT_VERSION, file=file_info, pages=pages)
+        with open(os.path.join(temp_dir, _STATE_FILE), 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, default=str)
+
+        old_dir = snapshot_dir + '.old'
+        shutil.rmtree(old_dir, ignore_errors=True)
+        if os.path.exists(snapshot_dir):
+            os.replace(snapshot_dir, old_dir)
+        os.replace(temp_dir, snapshot_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+        return True
+
+    except Exception as e:
+        print(f"保存启动快照失败: {e}")
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        return False
+
+
+def load_snapshot(user_id=None, snapshot_dir: str = SNAPSHOT_DIR) -> Optional[Dict]:
+    """读取快照，返回状态和 images {页序号: 图像}；不存在、版本不符或属于其他用户时返回None
+
+    文件已被修改时不返回页面图像（目录和页码仍可用于恢复位置）。
+    """
+    try:
+        state_path = os.path.join(snapshot_dir, _STATE_FILE)
+        if not os.path.exists(state_path):
+            return None
+        with open(state_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        if state.get('version') != SNAPSHOT_VERSION or state.get('user_id') != user_id:
+            return None
+
+        state['images'] = {}
+        file_info = state.get('file') or {}
+        if file_info.get('signature') and file_info['signature'] == file_signature(file_info.get('file_path')):
+            for page in state.get('pages', []):
+                with Image.open(os.path.join(snapshot_dir, page['image'])) as image:
+                    image.load()
+                    state['images'][page['page_index']] = image.copy()
+        return state
+
+    except Exception as e:
+        print(f"读取启动快照失败: {e}")
+        return None
+
+
+def is_snapshot_current(state: Dict, case_info: Optional[Dict], case_version: Optional[int] = None) -> bool:
+    """快照中的卷宗是否仍存在且未被修改
+
+    updated_at 只随卷宗信息变化；目录、文件和批注的写入只递增变更版本号（case_versions），
+    因此两者都须与快照一致。版本号不可用（服务模式）时只比较 updated_at。
+    """
+    if not case_info:
+        return False
+    snapshot_case = state.get('case') or {}
+    if str(case_info.get('updated_at')) != str(snapshot_case.get('updated_at')):
+        return False
+    return case_version is None or case_version == snapshot_case.get('version')
+
+
+def clear_snapshot(snapshot_dir: str = SNAPSHOT_DIR):
+    """删除快照（快照已过期时）"""
+    shutil.rmtree(snapshot_dir, ignore_errors=True)
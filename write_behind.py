@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+非关键写入的后写队列
+登录时间和操作日志不影响业务结果，先放入内存队列立即返回，
+由后台线程按批用多行语句写入数据库，写入失败的数据放回队列下次重试，退出时统一刷新
+"""
+
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Callable, Dict
+
+# 队列中最多保留的待写入操作日志条数，超出后丢弃新日志
+DEFAULT_MAX_PENDING = 10000
+# 后台刷新间隔（秒）
+DEFAULT_FLUSH_INTERVAL = 2.0
+# 每条多行语句包含的最大行数
+DEFAULT_BATCH_SIZE = 200
+
+
+class WriteBehindQueue:
+    """登录时间和操作日志的后写缓冲
+
+    db_factory() 返回已连接的数据库管理器（DatabaseManager或LocalDatabaseManager），
+    后台线程使用独立连接。同一用户的多次登录只保留最后一次时间。
+    """
+
+    def __init__(self, db_factory: Callable, max_pending: int = DEFAULT_MAX_PENDING,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.db_factory = db_factory
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._db = None
+        self._logs = deque()  # [(行数据, 入队时间)]
+        self._logins: Dict[int, tuple] = {}  # user_id -> (登录时间, 入队时间)
+
+        self.metrics = {
+            'enqueued': 0,
+            'written': 0,
+            'coalesced': 0,   # 被同一用户后续登录覆盖的更新
+            'dropped': 0,     # 队列已满丢弃的日志
+            'lost': 0,        # 重试时超出队列上限或退出时未能写入的条数
+            'flushes': 0,
+            'max_latency': 0.0,
+            'total_latency': 0.0
+        }
+
+    # ---------- 入队（调用方线程） ----------
+
+    def record_login(self, user_id: int, login_time: datetime = None):
+        """记录用户最后登录时间"""
+        with self._lock:
+            self.metrics['enqueued'] += 1
+            if user_id in self._logins:
+                self.metrics['coalesced'] += 1
+            self._logins[user_id] = (login_time or datetime.now(), time.perf_counter())
+
+    def log_operation(self, user_id: int, action: str, target_type: str = None,
+                      target_id: int = None, details: str = None) -> bool:
+        """记录操作日志，队列已满时丢弃并返回False"""
+        with self._lock:
+            if len(self._logs) >= self.max_pending:
+                self.metrics['dropped'] += 1
+                return False
+            self.metrics['enqueued'] += 1
+            self._logs.append(((user_id, action, target_type, target_id, details, datetime.now()),
+                               time.perf_counter()))
+            if len(self._logs) >= self.batch_size:
+                self._wakeup.set()
+        return True
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._logs) + len(self._logins)
+
+    # ---------- 后台线程 ----------
+
+    def start(self):
+        """启动后台刷新线程"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        """停止后台线程，退出前写入所有待写数据"""
+        self._stop_event.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        # 线程未能写完的部分计为丢失
+        with self._lock:
+            remaining = len(self._logs) + len(self._logins)
+            self._logs.clear()
+            self._logins.clear()
+            self.metrics['lost'] += remaining
+
+    def flush(self) -> int:
+        """立即写入当前所有待写数据，返回写入条数；失败时未写入的部分放回队列"""
+        with self._lock:
+            logs = list(self._logs)
+            logins = list(self._logins.items())
+            self._logs.clear()
+            self._logins.clear()
+        if not logs and not logins:
+            return 0
+
+        # 每批单独提交，失败时只有之后的批次需要重试
+        written_logins = written_logs = 0
+        try:
+            db = self._connection()
+            for start in range(0, len(logins), self.batch_size):
+                written_logins += self._write_logins(db.connection, logins[start:start + self.batch_size])
+            for start in range(0, len(logs), self.batch_size):
+                written_logs += self._write_logs(db.connection, logs[start:start + self.batch_size])
+        except Exception as e:
+            print(f"后写队列写入失败，稍后重试: {e}")
+            self._close_connection()
+            self._requeue(logins[written_logins:], logs[written_logs:])
+
+        written = written_logins + written_logs
+        if not written:
+            return 0
+        now = time.perf_counter()
+        latencies = ([now - enqueued for _, enqueued in logs[:written_logs]]
+                     + [now - item[1][1] for item in logins[:written_logins]])
+        self.metrics['written'] += written
+        self.metrics['flushes'] += 1
+        self.metrics['total_latency'] += sum(latencies)
+        self.metrics['max_latency'] = max(self.metrics['max_latency'], max(latencies))
+        return written
+
+    def _requeue(self, logins, logs):
+        """未写入的数据放回队列头部，超出队列上限时丢弃最早的日志并计为丢失"""
+        with self._lock:
+            for user_id, item in logins:
+                # 重试前同一用户又登录过，保留较新的登录时间
+                if user_id in self._logins:
+                    self.metrics['coalesced'] += 1
+                else:
+                    self._logins[user_id] = item
+            overflow = max(len(logs) + len(self._logs) - self.max_pending, 0)
+            self.metrics['lost'] += overflow
+            self._logs.extendleft(reversed(logs[overflow:]))
+
+    def get_metrics(self) -> Dict:
+        """返回写入统计（延迟为从入队到提交的秒数）"""
+        metrics = dict(self.metrics)
+        metrics['pending'] = self.pending_count()
+        metrics['avg_latency'] = metrics['total_latency'] / metrics['written'] if metrics['written'] else 0.0
+        return metrics
+
+    def _run(self):
+        try:
+            while not self._stop_event.is_set():
+                self._wakeup.wait(self.flush_interval)
+                self._wakeup.clear()
+                self.flush()
+            self.flush()
+        finally:
+            self._close_connection()
+
+    def _connection(self):
+        if self._db is None or self._db.connection is None:
+            self._db = self.db_factory()
+            if self._db is None or self._db.connection is None:
+                self._db = None
+                raise RuntimeError("无法连接数据库")
+        return self._db
+
+    def _close_connection(self):
+        if self._db is not None:
+            self._db.disconnect()
+            self._db = None
+
+    # ---------- 多行语句 ----------
+
+    def _write_logins(self, connection, logins) -> int:
+        """用一条 UPDATE ... CASE 语句更新一批用户的登录时间并提交"""
+        placeholder = '?' if isinstance(connection, sqlite3.Connection) else '%s'
+        cursor = connection.cursor()
+        try:
+            cases = ' '.join(f"WHEN {placeholder} THEN {placeholder}" for _ in logins)
+            ids = ', '.join(placeholder for _ in logins)
+            params = [value for user_id, (login_time, _) in logins for value in (user_id, login_time)]
+            params += [user_id for user_id, _ in logins]
+            cursor.execute(f"UPDATE users SET last_login = CASE id {cases} END WHERE id IN ({ids})",
+                           params)
+            connection.commit()
+        finally:
+            cursor.close()
+        return len(logins)
+
+    def _write_logs(self, connection, logs) -> int:
+        """用一条多行 INSERT 写入一批操作日志并提交"""
+        placeholder = '?' if isinstance(connection, sqlite3.Connection) else '%s'
+        row_placeholders = '(' + ', '.join([placeholder] * 6) + ')'
+        cursor = connection.cursor()
+        try:
+            values = ', '.join([row_placeholders] * len(logs))
+            params = [value for row, _ in logs for value in row]
+            cursor.execute(f"""
+                INSERT INTO operation_logs (user_id, action, target_type, target_id, details, created_at)
+                VALUES {values}
+            """, params)
+            connection.commit()
+        finally:
+            cursor.close()
+        return len(logs)